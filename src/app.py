@@ -0,0 +1,123 @@
+"""
+Application factory: builds settings, database, catalog and dispatcher on demand.
+
+Module-level singletons (``src.config.settings``, ``src.services.database.database``,
+``src.services.utm_manager.utm_manager``, the message editor and the conversation
+stores) are lazy proxies. An :class:`Application` owns its own instances and,
+while activated, binds them to those proxies, so several isolated bots (or tests)
+can share a process. Handlers read the proxies when they run, so updates must be
+served through :meth:`Application.feed_update` or :meth:`Application.start_polling`,
+which keep the application active meanwhile.
+"""
+from contextlib import ExitStack, contextmanager
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional
+
+from src.config import Settings, settings as settings_proxy
+from src.services.database import DatabaseManager, database as database_proxy
+from src.services.utm_manager import UTMManager, utm_manager as utm_manager_proxy
+
+if TYPE_CHECKING:
+    from aiogram import Bot, Dispatcher
+    from aiogram.types import Update
+
+    from src.services.message_editor import MessageEditor
+    from src.state.storage import PersistentUserDict
+
+
+DEFAULT_CATALOG_PATH = "data/utm_data.json"
+
+
+class Application:
+    def __init__(self, settings: Optional[Settings] = None, catalog_path: str = DEFAULT_CATALOG_PATH) -> None:
+        self._settings = settings
+        self.catalog_path = catalog_path
+
+    @cached_property
+    def settings(self) -> Settings:
+        return self._settings or Settings()
+
+    @cached_property
+    def database(self) -> DatabaseManager:
+        return DatabaseManager(self.settings.database_path)
+
+    @cached_property
+    def catalog(self) -> UTMManager:
+        return UTMManager(self.catalog_path)
+
+    @cached_property
+    def message_editor(self) -> "MessageEditor":
+        from src.services.message_editor import MessageEditor
+
+        return MessageEditor()
+
+    @cached_property
+    def conversation_stores(self) -> Dict[str, "PersistentUserDict"]:
+        from src.state.storage import PersistentUserDict
+        from src.state.user_state import CONVERSATION_NAMESPACES
+
+        return {
+            namespace: PersistentUserDict(
+                self.database, namespace, self.settings.state_ttl_seconds, self.settings.state_cache_size
+            )
+            for namespace in CONVERSATION_NAMESPACES
+        }
+
+    @contextmanager
+    def activate(self) -> Iterator["Application"]:
+        """
+        Route the module-level singletons to this application's instances for
+        the current context and every asyncio task started inside it.
+        """
+        from src.services.message_editor import message_editor
+        from src.state import user_state
+
+        proxies = {
+            "user_data": user_state.user_data,
+            "utm_editing": user_state.utm_editing_data,
+            "pending_action": user_state.pending_actions,
+        }
+        with ExitStack() as stack:
+            stack.enter_context(settings_proxy.bind(self.settings))
+            stack.enter_context(database_proxy.bind(self.database))
+            stack.enter_context(utm_manager_proxy.bind(self.catalog))
+            stack.enter_context(message_editor.bind(self.message_editor))
+            for namespace, store in self.conversation_stores.items():
+                stack.enter_context(proxies[namespace].bind(store))
+            yield self
+
+    def build_bot(self, **kwargs: Any) -> "Bot":
+        from src.bot import build_bot
+
+        with self.activate():
+            return build_bot(**kwargs)
+
+    def build_dispatcher(self) -> "Dispatcher":
+        from src.bot import build_dispatcher
+
+        with self.activate():
+            return build_dispatcher()
+
+    @cached_property
+    def dispatcher(self) -> "Dispatcher":
+        return self.build_dispatcher()
+
+    async def feed_update(self, bot: "Bot", update: "Update") -> Any:
+        """
+        Process one update with this application's instances bound.
+        """
+        with self.activate():
+            return await self.dispatcher.feed_update(bot, update)
+
+    async def start_polling(self, bot: "Bot") -> None:
+        # Tasks started for each update inherit the bindings.
+        with self.activate():
+            await self.dispatcher.start_polling(bot)
+
+
+def create_app(catalog_path: str = DEFAULT_CATALOG_PATH, **overrides: Any) -> Application:
+    """
+    ``overrides`` replace values from the environment, e.g.
+    ``create_app(database_path="/tmp/test.sqlite3")``.
+    """
+    return Application(Settings(**overrides) if overrides else None, catalog_path=catalog_path)
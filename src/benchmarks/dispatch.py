@@ -0,0 +1,77 @@
+"""
+Per-update dispatch cost: chain of ``F.data.startswith`` handlers vs DispatchIndex.
+
+Run with ``python -m src.benchmarks.dispatch``. No network access is needed:
+handlers do nothing, so the timings are pure routing overhead.
+"""
+import asyncio
+import time
+from typing import Any, List
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.types import Update
+
+from src.handlers.dispatch_index import DispatchIndex
+
+
+HANDLER_COUNTS = (10, 50, 200, 500)
+ITERATIONS = 500
+
+
+async def _noop(*args: Any, **kwargs: Any) -> None:
+    return None
+
+
+def _callback_update(update_id: int, data: str) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "chat_instance": "bench",
+                "from": {"id": 1, "is_bot": False, "first_name": "bench"},
+                "data": data,
+            },
+        }
+    )
+
+
+def _chain_dispatcher(count: int) -> Dispatcher:
+    dp = Dispatcher()
+    router = Router()
+    for index in range(count):
+        router.callback_query.register(_noop, F.data.startswith(f"action{index}:"))
+    dp.include_router(router)
+    return dp
+
+
+def _index_dispatcher(count: int) -> Dispatcher:
+    dp = Dispatcher()
+    index = DispatchIndex()
+    for number in range(count):
+        index.callback(f"action{number}:")(_noop)
+    dp.include_router(index.build_router())
+    return dp
+
+
+async def _measure(dp: Dispatcher, bot: Bot, updates: List[Update]) -> float:
+    started = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / len(updates) * 1_000_000
+
+
+async def main() -> None:
+    bot = Bot(token="123456:benchmark")
+    print(f"{'handlers':>8} | {'chain, us/update':>17} | {'index, us/update':>17}")
+    for count in HANDLER_COUNTS:
+        # The worst case for the chain: every update matches the last handler.
+        updates = [_callback_update(i, f"action{count - 1}:value") for i in range(ITERATIONS)]
+        chain = await _measure(_chain_dispatcher(count), bot, updates)
+        indexed = await _measure(_index_dispatcher(count), bot, updates)
+        print(f"{count:>8} | {chain:>17.1f} | {indexed:>17.1f}")
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
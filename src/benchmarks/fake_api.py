@@ -0,0 +1,273 @@
+"""
+Local stand-in for the Telegram Bot API, for full-stack benchmarks.
+
+Start it with ``python -m src.benchmarks.fake_api --users 500 --latency-ms 20``
+and run the bot with ``TELEGRAM_API_BASE_URL=http://127.0.0.1:8081`` (any
+``BOT_TOKEN`` works). The server feeds scripted updates through ``getUpdates``
+or, once ``setWebhook`` is called, POSTs them to the webhook. Every call is
+recorded; ``GET /_fake/stats`` returns call counts and throughput.
+
+Optional latency and 429 injection exercise the retry and pacing paths of the
+real aiohttp client. Outbound pacing still applies, so raise
+``OUTBOUND_GLOBAL_RATE`` and ``OUTBOUND_PRIVATE_CHAT_RATE`` to measure the bot
+rather than the pacing limits.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from aiohttp import ClientSession, web
+
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+
+
+@dataclass
+class RecordedCall:
+    method: str
+    params: Dict[str, Any]
+    received_at: float
+
+
+@dataclass
+class FakeBotAPI:
+    """
+    State of the fake server: the pending update stream and recorded calls.
+    """
+
+    latency: float = 0.0
+    rate_limit_probability: float = 0.0
+    retry_after: int = 1
+    calls: List[RecordedCall] = field(default_factory=list)
+    counts: Counter = field(default_factory=Counter)
+    webhook_url: Optional[str] = None
+    webhook_secret: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        self._updates: List[Dict[str, Any]] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        self._first_update_at: Optional[float] = None
+        self._last_call_at: Optional[float] = None
+        self._webhook_task: Optional[asyncio.Task] = None
+
+    def enqueue(self, update: Dict[str, Any]) -> None:
+        update = dict(update, update_id=next(self._update_ids))
+        self._updates.append(update)
+        self._new_updates.set()
+
+    def enqueue_many(self, updates: Iterable[Dict[str, Any]]) -> None:
+        for update in updates:
+            self.enqueue(update)
+
+    def stats(self) -> Dict[str, Any]:
+        replies = sum(count for method, count in self.counts.items() if method not in ("getUpdates", "getMe"))
+        elapsed = (self._last_call_at or 0) - (self._first_update_at or 0)
+        return {
+            "calls": dict(self.counts),
+            "pending_updates": len(self._updates),
+            "replies": replies,
+            "elapsed_seconds": round(elapsed, 3),
+            "replies_per_second": round(replies / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await _read_params(request)
+        now = time.perf_counter()
+        self.calls.append(RecordedCall(method, params, now))
+        self.counts[method] += 1
+        if method not in ("getUpdates", "getMe"):
+            self._last_call_at = now
+
+        if self.latency:
+            await asyncio.sleep(random.uniform(0, 2 * self.latency))
+        if method != "getUpdates" and random.random() < self.rate_limit_probability:
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                },
+                status=429,
+            )
+
+        handler = getattr(self, f"_method_{method}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    async def _method_getMe(self, params: Dict[str, Any]) -> Any:
+        return BOT_USER
+
+    async def _method_getUpdates(self, params: Dict[str, Any]) -> Any:
+        offset = int(params.get("offset") or 0)
+        if offset:
+            self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates and self.webhook_url is None:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout=float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        batch = self._updates[: int(params.get("limit") or 100)]
+        if batch and self._first_update_at is None:
+            self._first_update_at = time.perf_counter()
+        return batch
+
+    async def _method_setWebhook(self, params: Dict[str, Any]) -> Any:
+        self.webhook_url = params.get("url") or None
+        self.webhook_secret = params.get("secret_token")
+        if self.webhook_url and self._webhook_task is None:
+            self._webhook_task = asyncio.create_task(self._push_updates())
+        return True
+
+    async def _method_deleteWebhook(self, params: Dict[str, Any]) -> Any:
+        self.webhook_url = None
+        if self._webhook_task is not None:
+            self._webhook_task.cancel()
+            self._webhook_task = None
+        return True
+
+    async def _method_sendMessage(self, params: Dict[str, Any]) -> Any:
+        return self._message(params, next(self._message_ids))
+
+    async def _method_editMessageText(self, params: Dict[str, Any]) -> Any:
+        return self._message(params, int(params.get("message_id") or 0))
+
+    async def _method_editMessageReplyMarkup(self, params: Dict[str, Any]) -> Any:
+        return self._message(params, int(params.get("message_id") or 0))
+
+    def _message(self, params: Dict[str, Any], message_id: int) -> Dict[str, Any]:
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text") or "",
+        }
+        if isinstance(params.get("reply_markup"), dict) and "inline_keyboard" in params["reply_markup"]:
+            message["reply_markup"] = params["reply_markup"]
+        return message
+
+    async def _push_updates(self) -> None:
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret} if self.webhook_secret else {}
+        async with ClientSession(headers=headers) as session:
+            while self.webhook_url:
+                if not self._updates:
+                    self._new_updates.clear()
+                    await self._new_updates.wait()
+                    continue
+                update = self._updates.pop(0)
+                if self._first_update_at is None:
+                    self._first_update_at = time.perf_counter()
+                try:
+                    async with session.post(self.webhook_url, json=update) as response:
+                        if response.status != 200:
+                            logger.warning("Webhook answered %s for update %s", response.status, update["update_id"])
+                except Exception as exc:
+                    logger.warning("Webhook delivery failed: %s", exc)
+                    self._updates.insert(0, update)
+                    await asyncio.sleep(1)
+
+
+async def _read_params(request: web.Request) -> Dict[str, Any]:
+    if request.content_type == "application/json":
+        return await request.json()
+    params: Dict[str, Any] = {}
+    for key, value in (await request.post()).items():
+        if not isinstance(value, str):
+            continue
+        # aiogram sends nested objects (reply_markup, allowed_updates) as JSON strings.
+        if value[:1] in ("{", "["):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        params[key] = value
+    return params
+
+
+def build_fake_api_app(api: FakeBotAPI) -> web.Application:
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    app.router.add_get("/bot{token}/{method}", api.handle)
+
+    async def handle_stats(request: web.Request) -> web.Response:
+        return web.json_response(api.stats())
+
+    app.router.add_get("/_fake/stats", handle_stats)
+    return app
+
+
+def scripted_updates(users: int, password: str, links_per_user: int) -> Iterable[Dict[str, Any]]:
+    """
+    Text-only sessions: start, password, a few links and the history, per user.
+    """
+    texts = ["/start", password]
+    texts += [f"https://gorbilet.com/actions/fake-{number}/" for number in range(links_per_user)]
+    texts.append("Посмотреть историю")
+    for text in texts:
+        for user_id in range(1, users + 1):
+            user = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+            yield {
+                "message": {
+                    "message_id": 1,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": user,
+                    "text": text,
+                }
+            }
+
+
+async def main(arguments: argparse.Namespace) -> None:
+    api = FakeBotAPI(
+        latency=arguments.latency_ms / 1000,
+        rate_limit_probability=arguments.rate_limit,
+        retry_after=arguments.retry_after,
+    )
+    if arguments.script:
+        with open(arguments.script, encoding="utf-8") as script:
+            api.enqueue_many(json.loads(line) for line in script if line.strip())
+    else:
+        api.enqueue_many(scripted_updates(arguments.users, arguments.password, arguments.links))
+
+    runner = web.AppRunner(build_fake_api_app(api))
+    await runner.setup()
+    await web.TCPSite(runner, host=arguments.host, port=arguments.port).start()
+    print(f"Fake Bot API on http://{arguments.host}:{arguments.port}, {api.stats()['pending_updates']} updates queued")
+    try:
+        while True:
+            await asyncio.sleep(5)
+            print(json.dumps(api.stats(), ensure_ascii=False))
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--script", help="JSON-lines file of raw updates (update_id is assigned)")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--links", type=int, default=3, help="links sent per scripted user")
+    parser.add_argument("--password", default="password", help="BOT_ACCESS_PASSWORD of the bot under test")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean injected latency per call")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="probability of answering 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
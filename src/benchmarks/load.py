@@ -0,0 +1,290 @@
+"""
+End-to-end load test: simulated users drive the real dispatcher.
+
+Run with ``python -m src.benchmarks.load --users 2000 --concurrency 200``.
+
+Every simulated user authorizes, walks the full UTM generation flow, opens the
+history and, for every ``--manage-every``-th user, adds and removes a catalog
+item. Updates go through ``build_dispatcher()`` (storage, middlewares and all
+routers) while a recording session stands in for the Bot API, so nothing
+leaves the process. The database and the catalog are temporary copies.
+
+Latencies are measured per update around ``feed_update``, so with
+``--concurrency`` above 1 they include time spent waiting behind other users.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+PASSWORD = "load-test"
+_WORKDIR = tempfile.mkdtemp(prefix="utm-bot-load-")
+# Must be set before the settings singleton is created, so the run never touches real data.
+os.environ.update(
+    BOT_TOKEN="123456:load-test",
+    BOT_ACCESS_PASSWORD=PASSWORD,
+    DATABASE_PATH=os.path.join(_WORKDIR, "load.sqlite3"),
+)
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Under load every update is "slow"; latencies are reported below instead.
+os.environ.setdefault("TRACE_SLOW_UPDATE_MS", "60000")
+
+from aiogram import BaseMiddleware, Bot  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.methods import EditMessageReplyMarkup, EditMessageText, SendMessage, TelegramMethod  # noqa: E402
+from aiogram.types import InlineKeyboardMarkup, Message, TelegramObject, Update  # noqa: E402
+
+from src.bot import build_dispatcher  # noqa: E402
+from src.middlewares.metrics import handler_name  # noqa: E402
+from src.app import DEFAULT_CATALOG_PATH  # noqa: E402
+from src.services.utm_manager import UTMManager, utm_manager  # noqa: E402
+
+
+@dataclass
+class Text:
+    """A text message from the user."""
+
+    text: str
+
+
+@dataclass
+class Press:
+    """A tap on the first inline button whose label contains ``label`` (any button if empty)."""
+
+    label: str = ""
+
+
+Step = Union[Text, Press]
+
+AUTH_FLOW: Sequence[Step] = (Text("/start"), Text(PASSWORD))
+UTM_FLOW: Sequence[Step] = (
+    Text("https://gorbilet.com/actions/load-test/"),
+    Press(),  # source
+    Press(),  # medium
+    Press(),  # campaign group
+    Press(),  # campaign
+    Press("Без даты"),
+)
+HISTORY_FLOW: Sequence[Step] = (Text("Посмотреть историю"),)
+
+
+def manage_flow(user_id: int) -> Sequence[Step]:
+    name = f"load{user_id}"
+    return (
+        Text("Настройки"),
+        Press("Управление UTM"),
+        Press(),  # first category
+        Press("Добавить"),
+        Text(name),
+        Text(f"{name}_value"),
+        Press(),  # back to the same category
+        Press("Удалить"),
+        Press(name),
+    )
+
+
+class RecordingSession(BaseSession):
+    """
+    Bot session that answers every call locally and remembers, per chat, the
+    last message with an inline keyboard so simulated users can press it.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: Counter = Counter()
+        self.keyboards: Dict[int, Tuple[int, str, InlineKeyboardMarkup]] = {}
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: Optional[int] = None) -> Any:
+        self.calls[method.__api_method__] += 1
+        if isinstance(method, SendMessage):
+            message_id = self.next_message_id()
+            self._remember(method.chat_id, message_id, method.text, method.reply_markup)
+            return self._message(bot, method.chat_id, message_id, method.text)
+        if isinstance(method, (EditMessageText, EditMessageReplyMarkup)):
+            text = getattr(method, "text", None)
+            if text is None:
+                text = self.keyboards.get(method.chat_id, (0, "", None))[1]
+            self._remember(method.chat_id, method.message_id, text, method.reply_markup)
+            return self._message(bot, method.chat_id, method.message_id, text)
+        return True
+
+    def next_message_id(self) -> int:
+        return next(self._message_ids)
+
+    def _remember(self, chat_id: Any, message_id: Any, text: str, markup: Any) -> None:
+        if isinstance(markup, InlineKeyboardMarkup):
+            self.keyboards[int(chat_id)] = (int(message_id), text, markup)
+
+    @staticmethod
+    def _message(bot: Bot, chat_id: Any, message_id: Any, text: str) -> Message:
+        return Message.model_validate(
+            {"message_id": message_id, "date": 0, "chat": {"id": chat_id, "type": "private"}, "text": text},
+            context={"bot": bot},
+        )
+
+    async def close(self) -> None:
+        return None
+
+    async def stream_content(self, *args: Any, **kwargs: Any) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+
+class HandlerRecorder(BaseMiddleware):
+    """
+    Innermost middleware noting which handler processed each update.
+    """
+
+    def __init__(self) -> None:
+        self.names: Dict[int, str] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        self.names[data["event_update"].update_id] = handler_name(data)
+        return await handler(event, data)
+
+
+class LoadTest:
+    def __init__(self, dp: Any, bot: Bot, session: RecordingSession, recorder: HandlerRecorder) -> None:
+        self.dp = dp
+        self.bot = bot
+        self.session = session
+        self.recorder = recorder
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.failed_steps = 0
+        self._update_ids = itertools.count(1)
+
+    def _build_update(self, user_id: int, step: Step) -> Optional[Update]:
+        user = {"id": user_id, "is_bot": False, "first_name": f"load{user_id}"}
+        update_id = next(self._update_ids)
+        if isinstance(step, Text):
+            message = {
+                "message_id": self.session.next_message_id(),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": user,
+                "text": step.text,
+            }
+            return Update.model_validate({"update_id": update_id, "message": message})
+
+        keyboard = self.session.keyboards.get(user_id)
+        if keyboard is None:
+            return None
+        message_id, text, markup = keyboard
+        button = next(
+            (
+                button
+                for row in markup.inline_keyboard
+                for button in row
+                if button.callback_data and step.label in button.text
+            ),
+            None,
+        )
+        if button is None:
+            return None
+        callback = {
+            "id": str(update_id),
+            "chat_instance": str(user_id),
+            "from": user,
+            "data": button.callback_data,
+            "message": {
+                "message_id": message_id,
+                "date": 0,
+                "chat": {"id": user_id, "type": "private"},
+                "text": text,
+                "reply_markup": markup.model_dump(exclude_none=True),
+            },
+        }
+        return Update.model_validate({"update_id": update_id, "callback_query": callback})
+
+    async def run_user(self, user_id: int, flows: int, manage: bool) -> None:
+        steps: List[Step] = list(AUTH_FLOW)
+        for _ in range(flows):
+            steps.extend(UTM_FLOW)
+        steps.extend(HISTORY_FLOW)
+        if manage:
+            steps.extend(manage_flow(user_id))
+
+        for step in steps:
+            update = self._build_update(user_id, step)
+            if update is None:
+                self.failed_steps += 1
+                continue
+            started = time.perf_counter()
+            await self.dp.feed_update(self.bot, update)
+            elapsed = time.perf_counter() - started
+            name = self.recorder.names.pop(update.update_id, "unhandled")
+            self.latencies[name].append(elapsed)
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(test: LoadTest, elapsed: float) -> None:
+    total = sum(len(values) for values in test.latencies.values())
+    print(f"updates: {total}, wall time: {elapsed:.2f}s, throughput: {total / elapsed:.0f} updates/s")
+    if test.failed_steps:
+        print(f"steps without a matching button: {test.failed_steps}")
+    print(f"{'handler':<32} {'count':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    rows = sorted(test.latencies.items(), key=lambda item: sum(item[1]), reverse=True)
+    for name, values in rows:
+        print(
+            f"{name:<32} {len(values):>7} {percentile(values, 0.5) * 1000:>8.2f} "
+            f"{percentile(values, 0.9) * 1000:>8.2f} {percentile(values, 0.99) * 1000:>8.2f} "
+            f"{max(values) * 1000:>8.2f}"
+        )
+    print("Bot API calls: " + ", ".join(f"{method}={count}" for method, count in test.session.calls.most_common()))
+
+
+async def main(users: int, concurrency: int, flows: int, manage_every: int) -> None:
+    catalog = os.path.join(_WORKDIR, "utm_data.json")
+    if os.path.exists(DEFAULT_CATALOG_PATH):
+        shutil.copyfile(DEFAULT_CATALOG_PATH, catalog)
+    # Bound before anything resolves the proxy: the real catalog is only copied, never loaded or saved.
+    with utm_manager.bind(UTMManager(catalog)):
+        await _run(users, concurrency, flows, manage_every)
+
+
+async def _run(users: int, concurrency: int, flows: int, manage_every: int) -> None:
+    session = RecordingSession()
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = build_dispatcher()
+    recorder = HandlerRecorder()
+    for observer in (dp.message, dp.callback_query):
+        observer.middleware.register(recorder)
+    test = LoadTest(dp, bot, session, recorder)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def simulate(user_id: int) -> None:
+        async with semaphore:
+            await test.run_user(user_id, flows, manage=bool(manage_every) and user_id % manage_every == 0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate(user_id) for user_id in range(1, users + 1)))
+    report(test, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100, help="users active at the same time")
+    parser.add_argument("--flows", type=int, default=2, help="UTM generation flows per user")
+    parser.add_argument("--manage-every", type=int, default=50, help="every N-th user edits the catalog; 0 disables")
+    arguments = parser.parse_args()
+    try:
+        asyncio.run(main(arguments.users, arguments.concurrency, arguments.flows, arguments.manage_every))
+    finally:
+        shutil.rmtree(_WORKDIR, ignore_errors=True)
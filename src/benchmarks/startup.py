@@ -0,0 +1,62 @@
+"""
+Cold start cost: import and construction time of each layer, each measured
+in a fresh interpreter.
+
+Run with ``python -m src.benchmarks.startup``.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+
+RUNS = 5
+
+# (label, code to time) — every phase runs in its own process, so it includes
+# the imports it pulls in but nothing cached by earlier phases.
+PHASES: Tuple[Tuple[str, str], ...] = (
+    ("import src.config", "import src.config"),
+    ("import src.services.database", "import src.services.database"),
+    ("import src.state.user_state", "import src.state.user_state"),
+    ("import src.bot", "import src.bot"),
+    ("create_app().database", "from src.app import create_app; create_app().database"),
+    ("create_app().build_dispatcher()", "from src.app import create_app; create_app().build_dispatcher()"),
+)
+
+TIMER = """
+import time
+started = time.perf_counter()
+{code}
+print(time.perf_counter() - started)
+"""
+
+
+def measure(code: str, env: Dict[str, str]) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", TIMER.format(code=code)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            BOT_TOKEN="123456:startup",
+            BOT_ACCESS_PASSWORD="startup",
+            DATABASE_PATH=os.path.join(workdir, "startup.sqlite3"),
+        )
+        print(f"{'phase':<34} {'median ms':>10} {'min ms':>8}")
+        for label, code in PHASES:
+            timings: List[float] = [measure(code, env) for _ in range(RUNS)]
+            print(f"{label:<34} {statistics.median(timings) * 1000:>10.1f} {min(timings) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
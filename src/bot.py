@@ -1,28 +1,165 @@
 import asyncio
 import logging
+import tracemalloc
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
 
 from src.config import settings
+from src.core.lazy import unwrap
 from src.core.logging_config import setup_logging
+from src.core.loop_watchdog import LoopWatchdog
+from src.core.memory import memory
+from src.core.metrics import registry
+from src.core.metrics_server import start_metrics_server
+from src.core.profiling import profiler
+from src.core.tracing import configure_trace_export
 from src.handlers import register_handlers
 from src.middlewares.access_control import AccessControlMiddleware
+from src.middlewares.metrics import ApiMetricsMiddleware, HandlerMetricsMiddleware, UpdateMetricsMiddleware
+from src.middlewares.profiling import ProfilingMiddleware
+from src.middlewares.tracing import (
+    ApiTracingMiddleware,
+    HandlerSpanMiddleware,
+    MiddlewareSpanMiddleware,
+    TracingMiddleware,
+)
+from src.services.database import database
+from src.services.http_session import NetworkRetryMiddleware, PooledAiohttpSession
+from src.services.outbound import OutboundScheduler
+from src.state.storage import SQLiteStorage
+
+
+def build_bot(rate_share: float = 1.0) -> Bot:
+    """
+    Create the Bot on a pooled HTTP session with network retries and outbound
+    pacing; ``rate_share`` splits the global rate between processes that use
+    the same token.
+    """
+    session = PooledAiohttpSession(
+        pool_size=settings.api_pool_size,
+        pool_size_per_host=settings.api_pool_size_per_host,
+        keepalive_timeout=settings.api_keepalive_seconds,
+        dns_ttl=settings.api_dns_ttl_seconds,
+        timeout=settings.api_timeout_seconds,
+        api=(
+            TelegramAPIServer.from_base(settings.telegram_api_base_url)
+            if settings.telegram_api_base_url
+            else PRODUCTION
+        ),
+    )
+    # Outermost, so the API span includes retries and pacing delays.
+    session.middleware(ApiTracingMiddleware())
+    # Registered before pacing, so every retry passes through the pacing below again.
+    session.middleware(
+        NetworkRetryMiddleware(
+            max_retries=settings.api_max_network_retries,
+            base_delay=settings.api_retry_base_delay,
+            max_delay=settings.api_retry_max_delay,
+            stats=session.stats,
+        )
+    )
+    bot = Bot(token=settings.bot_token, session=session)
+    bot.session.middleware(
+        OutboundScheduler(
+            global_rate=settings.outbound_global_rate * rate_share,
+            private_chat_rate=settings.outbound_private_chat_rate,
+            group_chat_rate=settings.outbound_group_chat_rate,
+            max_retries=settings.outbound_max_retries,
+        )
+    )
+    # Innermost: measures the network call itself, without pacing delays.
+    bot.session.middleware(ApiMetricsMiddleware())
+
+    connections = registry.gauge(
+        "bot_api_connections", "Bot API HTTP connection and request counters.", ["kind"]
+    )
+    for kind in ("requests", "connections_created", "connections_reused", "retries"):
+        connections.set_function(lambda kind=kind: session.stats.snapshot()[kind], kind=kind)
+    return bot
+
+
+def start_loop_watchdog() -> LoopWatchdog | None:
+    if not settings.loop_block_threshold_ms:
+        return None
+    watchdog = LoopWatchdog(
+        interval=settings.loop_heartbeat_interval_ms / 1000,
+        threshold=settings.loop_block_threshold_ms / 1000,
+    )
+    watchdog.start()
+    return watchdog
+
+
+def build_dispatcher() -> Dispatcher:
+    # The storage keeps the database it is given, so resolve the proxy now:
+    # under Application.activate() that is the application's own database.
+    storage = SQLiteStorage(unwrap(database), ttl=settings.state_ttl_seconds, cache_size=settings.state_cache_size)
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware.register(TracingMiddleware(threshold=settings.trace_slow_update_ms / 1000))
+    dp.update.outer_middleware.register(UpdateMetricsMiddleware())
+    if settings.profile_updates:
+        dp.update.outer_middleware.register(ProfilingMiddleware(profiler))
+    middleware_span = MiddlewareSpanMiddleware()
+    access_middleware = AccessControlMiddleware()
+    handler_metrics = HandlerMetricsMiddleware()
+    handler_span = HandlerSpanMiddleware()
+    for observer in (dp.message, dp.callback_query):
+        observer.middleware.register(middleware_span)
+        observer.middleware.register(access_middleware)
+        observer.middleware.register(handler_metrics)
+        observer.middleware.register(handler_span)
+    register_handlers(dp)
+    return dp
 
 
 async def main() -> None:
     setup_logging()
+    configure_trace_export(settings.trace_export_path)
+    if settings.tracemalloc_frames:
+        tracemalloc.start(settings.tracemalloc_frames)
     logger = logging.getLogger(__name__)
     logger.info("Starting bot...")
 
-    bot = Bot(token=settings.bot_token)
-    dp = Dispatcher()
-    access_middleware = AccessControlMiddleware()
-    dp.message.middleware.register(access_middleware)
-    dp.callback_query.middleware.register(access_middleware)
-    register_handlers(dp)
+    bot = build_bot()
+    dp = build_dispatcher()
+
+    watchdog = start_loop_watchdog()
+    if settings.memory_sample_interval_seconds:
+        memory.start_sampling(settings.memory_sample_interval_seconds)
+    metrics_runner = None
+    if settings.metrics_port and settings.run_mode != "webhook":
+        metrics_runner = await start_metrics_server(settings.metrics_host, settings.metrics_port)
+    api_runner = None
+    # Its own listener in every mode: the webhook one is public.
+    if settings.http_api_tokens:
+        from src.core.api_server import start_api_server
+
+        api_runner = await start_api_server(settings.http_api_host, settings.http_api_port)
+
+    try:
+        # Mode-specific modules are imported only when that mode is used.
+        if settings.run_mode == "webhook":
+            from src.core.webhook import run_webhook
+
+            await run_webhook(dp, bot)
+        elif settings.run_mode == "workers":
+            from src.core.workers import run_workers
 
-    logger.info("Bot is polling...")
-    await dp.start_polling(bot)
+            await run_workers(bot, allowed_updates=dp.resolve_used_update_types())
+        else:
+            # Switching back from webhook mode requires removing the webhook first.
+            await bot.delete_webhook()
+            logger.info("Bot is polling...")
+            await dp.start_polling(bot)
+    finally:
+        logger.info("Bot API connection stats: %s", bot.session.stats.snapshot())
+        if watchdog is not None:
+            watchdog.stop()
+        memory.stop_sampling()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        if api_runner is not None:
+            await api_runner.cleanup()
 
 
 if __name__ == "__main__":
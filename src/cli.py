@@ -0,0 +1,194 @@
+"""
+Command-line tools that work without Telegram.
+
+``python -m src.cli generate links.csv -o result.csv`` reads a CSV of URLs and
+tags (``url,source,medium,campaign[,date][,content]``; header names may use any
+spelling the bot's quick syntax accepts, e.g. ``utm_source`` or ``src``) and
+writes one result row per input row: the resolved tags, the UTM link and, when
+a row is rejected, the reason. Tags are validated against the catalog like in
+the bot. Input and output are streamed, so memory use does not depend on the
+file size; ``--workers`` spreads chunks of rows over a process pool while
+keeping the output in input order.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from src.services.utm_manager import UTMManager
+from src.utils.quick_link import KEY_ALIASES, POSITIONAL_FIELDS, QuickLinkError, resolve_quick_link
+
+
+URL_COLUMNS = ("url", "base_url", "link")
+DEFAULT_COLUMNS: Dict[str, int] = {"url": 0, **{field: index for index, field in enumerate(POSITIONAL_FIELDS, start=1)}}
+DEFAULT_COLUMNS["content"] = len(DEFAULT_COLUMNS)
+OUTPUT_HEADER = ["url", "utm_source", "utm_medium", "utm_campaign", "utm_content", "utm_url", "error"]
+
+# Set once per process by _init_generator: the catalog and the input column layout.
+_catalog: Optional[UTMManager] = None
+_columns: Dict[str, int] = {}
+
+
+def resolve_columns(header: List[str]) -> Dict[str, int]:
+    """
+    Field -> column index for a CSV header; unknown columns are ignored.
+    """
+    columns: Dict[str, int] = {}
+    for index, name in enumerate(header):
+        key = name.strip().casefold()
+        field = "url" if key in URL_COLUMNS else KEY_ALIASES.get(key)
+        if field is not None and field not in columns:
+            columns[field] = index
+    if "url" not in columns:
+        raise ValueError(f"no URL column in header {header!r} (expected one of {', '.join(URL_COLUMNS)})")
+    return columns
+
+
+def _init_generator(catalog_path: Optional[str], columns: Dict[str, int]) -> None:
+    global _catalog, _columns
+    _catalog = UTMManager(catalog_path) if catalog_path else None
+    _columns = columns
+
+
+def generate_rows(rows: List[List[str]]) -> List[List[str]]:
+    """
+    Result rows for a chunk of input rows, using the catalog and layout of this process.
+    """
+    results = []
+    for row in rows:
+        fields = {
+            field: row[index].strip()
+            for field, index in _columns.items()
+            if index < len(row) and row[index].strip()
+        }
+        base_url = fields.pop("url", "")
+        if not base_url:
+            results.append([base_url, "", "", "", "", "", "нет ссылки"])
+            continue
+        try:
+            # Suggestions scan the whole catalog per rejected row; the reason alone is enough here.
+            link = resolve_quick_link(base_url, fields, _catalog, suggest=False)
+        except QuickLinkError as exc:
+            results.append([base_url, "", "", "", "", "", "; ".join(exc.problems)])
+            continue
+        content = link.content()
+        results.append(
+            [base_url, link.utm_source, link.utm_medium, link.utm_campaign, content, link.url(content), ""]
+        )
+    return results
+
+
+def _chunks(rows: Iterable[List[str]], size: int) -> Iterator[List[List[str]]]:
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def generate(
+    source: TextIO,
+    target: TextIO,
+    catalog_path: Optional[str],
+    workers: int = 1,
+    chunk_size: int = 1000,
+    header: bool = True,
+) -> Dict[str, int]:
+    """
+    Stream ``source`` CSV into ``target`` CSV. At most ``2 * workers`` chunks are
+    in flight, so memory stays bounded for any input size. Returns row counts.
+    """
+    reader = csv.reader(source)
+    writer = csv.writer(target)
+    columns = DEFAULT_COLUMNS
+    if header:
+        first = next(reader, None)
+        if first is None:
+            return {"rows": 0, "errors": 0}
+        columns = resolve_columns(first)
+    writer.writerow(OUTPUT_HEADER)
+    counts = {"rows": 0, "errors": 0}
+
+    def write(results: List[List[str]]) -> None:
+        writer.writerows(results)
+        target.flush()
+        counts["rows"] += len(results)
+        counts["errors"] += sum(1 for result in results if result[-1])
+
+    if workers <= 1:
+        _init_generator(catalog_path, columns)
+        for chunk in _chunks(reader, chunk_size):
+            write(generate_rows(chunk))
+        return counts
+
+    context = multiprocessing.get_context("spawn")
+    pending: Deque[Future] = deque()
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=_init_generator, initargs=(catalog_path, columns)
+    ) as pool:
+        for chunk in _chunks(reader, chunk_size):
+            if len(pending) >= 2 * workers:
+                write(pending.popleft().result())
+            pending.append(pool.submit(generate_rows, chunk))
+        while pending:
+            write(pending.popleft().result())
+    return counts
+
+
+def _run_generate(arguments: argparse.Namespace) -> int:
+    catalog_path = None if arguments.no_validate else arguments.catalog
+    if catalog_path and not os.path.exists(catalog_path):
+        print(f"Catalog {catalog_path} not found", file=sys.stderr)
+        return 2
+    source = open(arguments.input, newline="", encoding="utf-8") if arguments.input != "-" else sys.stdin
+    target = open(arguments.output, "w", newline="", encoding="utf-8") if arguments.output != "-" else sys.stdout
+    try:
+        counts = generate(
+            source,
+            target,
+            catalog_path,
+            workers=arguments.workers or os.cpu_count() or 1,
+            chunk_size=arguments.chunk_size,
+            header=not arguments.no_header,
+        )
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    print(f"{counts['rows']} rows, {counts['errors']} rejected", file=sys.stderr)
+    return 1 if counts["errors"] else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate", help="generate UTM links for a CSV of URLs and tags")
+    generate_parser.add_argument("input", nargs="?", default="-", help="input CSV file, - for stdin (default)")
+    generate_parser.add_argument("-o", "--output", default="-", help="output CSV file, - for stdout (default)")
+    generate_parser.add_argument("--catalog", default="data/utm_data.json", help="UTM catalog to validate tags against")
+    generate_parser.add_argument("--no-validate", action="store_true", help="use tag values as given")
+    generate_parser.add_argument(
+        "--no-header",
+        action="store_true",
+        help="input has no header; columns are url,source,medium,campaign,date,content",
+    )
+    generate_parser.add_argument("--workers", type=int, default=1, help="worker processes; 0 means one per CPU core")
+    generate_parser.add_argument("--chunk-size", type=int, default=1000, help="rows per worker task")
+
+    arguments = parser.parse_args(argv)
+    return _run_generate(arguments)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
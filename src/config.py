@@ -2,6 +2,8 @@ from pydantic import Field
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
+from src.core.lazy import lazy
+
 
 load_dotenv()
 
@@ -11,10 +13,93 @@ class Settings(BaseSettings):
     bot_access_password: str = Field(alias="BOT_ACCESS_PASSWORD")
     database_path: str = Field(default="data/bot_state.sqlite3")
 
+    # Abandoned FSM flows and pending actions expire after this many seconds.
+    state_ttl_seconds: int = Field(default=6 * 60 * 60)
+    # Users (FSM keys) each state store keeps in memory.
+    state_cache_size: int = Field(default=10_000)
+    # Recent links kept in memory per active user, and the cap for all of them together.
+    history_cache_per_user: int = Field(default=20)
+    history_cache_max_bytes: int = Field(default=16 * 1024 * 1024)
+    # Users whose UTM presets are kept in memory.
+    preset_cache_size: int = Field(default=10_000)
+
+    # Bot API server, e.g. a local Bot API server or src.benchmarks.fake_api; Telegram when unset.
+    telegram_api_base_url: str | None = Field(default=None)
+
+    # Bot API HTTP client: connection pool, DNS cache, timeouts and retries.
+    api_pool_size: int = Field(default=100)
+    api_pool_size_per_host: int = Field(default=0)
+    api_keepalive_seconds: float = Field(default=60.0)
+    api_dns_ttl_seconds: int = Field(default=3600)
+    api_timeout_seconds: float = Field(default=60.0)
+    api_max_network_retries: int = Field(default=3)
+    api_retry_base_delay: float = Field(default=0.5)
+    api_retry_max_delay: float = Field(default=8.0)
+
+    # Outbound Bot API pacing (requests per second).
+    outbound_global_rate: float = Field(default=30.0)
+    outbound_private_chat_rate: float = Field(default=1.0)
+    outbound_group_chat_rate: float = Field(default=20 / 60)
+    outbound_max_retries: int = Field(default=3)
+
+    # Metrics and health endpoints; in webhook mode they share the webhook server.
+    metrics_host: str = Field(default="0.0.0.0")
+    metrics_port: int | None = Field(default=None)
+
+    # Logging: "text" (colored) or "json"; LOG_LEVELS overrides per logger,
+    # e.g. {"aiogram.event": "WARNING"}.
+    log_level: str = Field(default="INFO")
+    log_format: str = Field(default="text")
+    log_levels: dict[str, str] = Field(default_factory=dict)
+    # Max INFO/DEBUG records per message template and minute; 0 disables the limit.
+    log_rate_limit_per_minute: int = Field(default=60)
+
+    # Updates slower than this are logged with their span breakdown.
+    trace_slow_update_ms: float = Field(default=500.0)
+    # JSON-lines file the slow traces are appended to; disabled when unset.
+    trace_export_path: str | None = Field(default=None)
+
+    # Event loop watchdog: blocks longer than the threshold are logged with a stack; 0 disables it.
+    loop_block_threshold_ms: float = Field(default=250.0)
+    loop_heartbeat_interval_ms: float = Field(default=100.0)
+
+    # Opt-in cProfile of updates; the slowest ones are kept for /profiles.
+    profile_updates: bool = Field(default=False)
+    profile_threshold_ms: float = Field(default=1000.0)
+    profile_keep: int = Field(default=10)
+
+    # Start tracemalloc at launch with this many frames per allocation; 0 leaves it
+    # to the /memory_diff command.
+    tracemalloc_frames: int = Field(default=0)
+    # How often store sizes (bot_store_bytes) are recomputed off the event loop; 0 disables it.
+    memory_sample_interval_seconds: float = Field(default=300.0)
+
+    # Telegram user ids allowed to use the diagnostic commands, e.g. [123, 456].
+    admin_user_ids: list[int] = Field(default_factory=list)
+
+    # "polling", "webhook" or "workers"
+    run_mode: str = Field(default="polling")
+    # Worker processes for RUN_MODE=workers; 0 means one per CPU core.
+    worker_count: int = Field(default=0)
+    webhook_base_url: str | None = Field(default=None)
+    webhook_path: str = Field(default="/telegram/webhook")
+    webhook_secret: str | None = Field(default=None)
+    webhook_host: str = Field(default="0.0.0.0")
+    webhook_port: int = Field(default=8080)
+
+    # Bearer tokens of the internal JSON API (src/core/api_server.py) as a JSON list,
+    # e.g. ["token-a", "token-b"] (a bare string does not parse); empty keeps it off.
+    # Served on HTTP_API_HOST:HTTP_API_PORT in every run mode.
+    http_api_tokens: list[str] = Field(default_factory=list)
+    http_api_host: str = Field(default="127.0.0.1")
+    http_api_port: int = Field(default=8090)
+    http_api_batch_limit: int = Field(default=1000)
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
         extra = "ignore"
 
 
-settings = Settings()
+# Built on first use, so importing this module does not require the environment.
+settings: Settings = lazy(Settings, "settings")
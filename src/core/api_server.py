@@ -0,0 +1,277 @@
+"""
+Internal JSON API: catalog, link generation and history for other tools.
+
+Every request needs ``Authorization: Bearer <token>`` with one of
+``HTTP_API_TOKENS``. Routes, relative to ``/api/v1``:
+
+- ``GET /catalog``: every catalog category with entry ids, names and values.
+  The ETag is the catalog version, so ``If-None-Match`` gets 304 until the
+  catalog changes.
+- ``POST /links``: ``{"url", "source", "medium", "campaign", "date"?, "content"?}``
+  validated like the bot's quick syntax; 422 lists every problem.
+- ``POST /links/batch``: ``{"links": [...]}``, up to ``HTTP_API_BATCH_LIMIT``
+  items; each result is a link or an ``errors`` list, in request order.
+- ``GET /history?user_id=…[&from=…][&to=…][&limit=…]``: a bot user's links
+  first generated in ``[from, to)`` (epoch seconds), oldest first, at most
+  ``limit`` of them (clamped to 1..500).
+
+Run it alone with ``python -m src.core.api_server`` (it then reloads the
+catalog when its file changes); the bot starts it itself on ``HTTP_API_PORT``
+when tokens are configured.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from src.config import settings
+from src.core.metrics import registry
+from src.services.database import database
+from src.services.utm_manager import utm_manager
+from src.utils.quick_link import QuickLinkError, resolve_quick_link
+
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/api/v1"
+# Batch items generated between yields to the event loop.
+BATCH_SLICE = 200
+HISTORY_LIMIT = 500
+# How often a standalone server checks the catalog file for edits made by the bot.
+CATALOG_POLL_SECONDS = 5.0
+
+HTTP_API_REQUESTS = registry.counter(
+    "bot_http_api_requests_total", "Internal JSON API requests.", ["route", "status"]
+)
+HTTP_API_SECONDS = registry.histogram(
+    "bot_http_api_request_seconds", "Internal JSON API request handling time.", ["route"]
+)
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+
+def _error(status: int, message: str, **extra: Any) -> web.Response:
+    return web.json_response({"error": message, **extra}, status=status)
+
+
+@web.middleware
+async def api_middleware(request: web.Request, handler: Handler) -> web.StreamResponse:
+    """
+    Token check and per-route metrics for every API request.
+    """
+    route = request.match_info.route.resource.canonical if request.match_info.route.resource else "unknown"
+    started = time.perf_counter()
+    header = request.headers.get("Authorization", "")
+    token = header[7:] if header.startswith("Bearer ") else ""
+    if not token or not any(hmac.compare_digest(token, allowed) for allowed in settings.http_api_tokens):
+        response: web.StreamResponse = _error(401, "invalid or missing token")
+    else:
+        try:
+            response = await handler(request)
+        except web.HTTPException as exc:
+            response = exc
+    HTTP_API_REQUESTS.inc(route=route, status=str(response.status))
+    HTTP_API_SECONDS.observe(time.perf_counter() - started, route=route)
+    if isinstance(response, web.HTTPException):
+        raise response
+    return response
+
+
+# Serialized catalog of the latest version seen; the version is a content hash.
+_catalog_body: Tuple[str, bytes] = ("", b"")
+
+
+def _catalog_payload() -> bytes:
+    global _catalog_body
+    version = utm_manager.version
+    if _catalog_body[0] != version:
+        categories = {
+            category_key: [
+                {"id": entry_id, "name": name, "value": value}
+                for entry_id, (name, value) in enumerate(utm_manager.get_category_data(category_key))
+            ]
+            for category_key in utm_manager.get_category_data_map()
+        }
+        body = json.dumps({"version": version, "categories": categories}, ensure_ascii=False).encode("utf-8")
+        _catalog_body = (version, body)
+    return _catalog_body[1]
+
+
+async def handle_catalog(request: web.Request) -> web.Response:
+    version = utm_manager.version
+    headers = {"ETag": f'"{version}"', "Cache-Control": "no-cache"}
+    # If-None-Match uses the weak comparison: W/"v" matches "v", and * matches any version.
+    if any(tag.value in ("*", version) for tag in request.if_none_match or ()):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=_catalog_payload(), content_type="application/json", headers=headers)
+
+
+def _generate(item: Any) -> Dict[str, Any]:
+    if not isinstance(item, dict):
+        return {"errors": ["ожидается JSON-объект"]}
+    fields = {
+        key: str(item[key]).strip()
+        for key in ("source", "medium", "campaign", "date", "content")
+        if item.get(key) not in (None, "")
+    }
+    base_url = str(item.get("url") or "").strip()
+    if not base_url.startswith(("http://", "https://")):
+        return {"errors": ["url должен начинаться с http:// или https://"]}
+    try:
+        link = resolve_quick_link(base_url, fields, utm_manager)
+    except QuickLinkError as exc:
+        return {"errors": exc.problems}
+    content = link.content()
+    return {
+        "url": link.base_url,
+        "utm_source": link.utm_source,
+        "utm_medium": link.utm_medium,
+        "utm_campaign": link.utm_campaign,
+        "utm_content": content,
+        "utm_url": link.url(content),
+    }
+
+
+async def _read_json(request: web.Request) -> Any:
+    try:
+        return await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text=json.dumps({"error": "body is not valid JSON"}), content_type="application/json")
+
+
+async def handle_link(request: web.Request) -> web.Response:
+    result = _generate(await _read_json(request))
+    return web.json_response(result, status=422 if "errors" in result else 200, dumps=_dumps)
+
+
+async def handle_batch(request: web.Request) -> web.Response:
+    payload = await _read_json(request)
+    items = payload.get("links") if isinstance(payload, dict) else None
+    if not isinstance(items, list):
+        return _error(400, 'expected {"links": [...]}')
+    if len(items) > settings.http_api_batch_limit:
+        return _error(413, "too many links", limit=settings.http_api_batch_limit)
+    results: List[Dict[str, Any]] = []
+    for start in range(0, len(items), BATCH_SLICE):
+        if start:
+            # Large batches must not hold the event loop shared with the bot.
+            await asyncio.sleep(0)
+        results.extend(_generate(item) for item in items[start : start + BATCH_SLICE])
+    failed = sum(1 for result in results if "errors" in result)
+    return web.json_response({"results": results, "failed": failed}, dumps=_dumps)
+
+
+def _int_param(request: web.Request, name: str, default: Optional[int] = None) -> Optional[int]:
+    raw = request.query.get(name)
+    if raw is None:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise web.HTTPBadRequest(
+            text=json.dumps({"error": f"{name} must be an integer"}), content_type="application/json"
+        )
+
+
+async def handle_history(request: web.Request) -> web.Response:
+    user_id = _int_param(request, "user_id")
+    if user_id is None:
+        return _error(400, "user_id is required")
+    # SQLite reads a negative LIMIT as no limit at all.
+    limit = max(1, min(_int_param(request, "limit", 50), HISTORY_LIMIT))
+    start = _int_param(request, "from", 0)
+    end = _int_param(request, "to", int(time.time()) + 1)
+    # Straight from SQLite: in workers mode the links are written by other processes,
+    # so this process's recent-history cache would be stale.
+    rows = await asyncio.to_thread(database.get_history_between, user_id, start, end, limit)
+    links = [
+        {
+            "url": row["base_url"],
+            "utm_url": row["utm_url"],
+            "short_url": row["short_url"],
+            "created_at": row["created_at"],
+            "last_used_at": row["last_used_at"],
+            "generation_count": row["generation_count"],
+        }
+        for row in rows
+    ]
+    return web.json_response({"user_id": user_id, "links": links}, dumps=_dumps)
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def build_api_app() -> web.Application:
+    """
+    The API as an aiohttp sub-application, to be mounted at :data:`API_PREFIX`.
+    """
+    app = web.Application(middlewares=[api_middleware], client_max_size=8 * 1024 * 1024)
+    app.router.add_get("/catalog", handle_catalog)
+    app.router.add_post("/links", handle_link)
+    app.router.add_post("/links/batch", handle_batch)
+    app.router.add_get("/history", handle_history)
+    return app
+
+
+async def start_api_server(host: str, port: int) -> web.AppRunner:
+    """
+    Serve the API on its own port; the caller cleans up the runner.
+    """
+    app = web.Application()
+    app.add_subapp(API_PREFIX, build_api_app())
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logger.info("Internal API is served on %s:%s%s", host, port, API_PREFIX)
+    return runner
+
+
+def _catalog_mtime() -> float:
+    try:
+        return os.stat(utm_manager.data_file).st_mtime
+    except OSError:
+        return 0.0
+
+
+async def _reload_catalog_on_change() -> None:
+    """
+    Keep a standalone server's catalog in step with the file the bot writes;
+    within the bot the catalog is already the live one.
+    """
+    seen = _catalog_mtime()
+    while True:
+        await asyncio.sleep(CATALOG_POLL_SECONDS)
+        mtime = _catalog_mtime()
+        if mtime == seen:
+            continue
+        seen = mtime
+        # On the loop, like the bot's own reload: handlers never see a half-loaded catalog.
+        utm_manager.load_data()
+        utm_manager.normalize_data()
+        logger.info("Catalog reloaded, version %s", utm_manager.version)
+
+
+async def _serve_forever() -> None:
+    if not settings.http_api_tokens:
+        raise SystemExit("HTTP_API_TOKENS must be set")
+    runner = await start_api_server(settings.http_api_host, settings.http_api_port)
+    watcher = asyncio.create_task(_reload_catalog_on_change())
+    try:
+        await asyncio.Event().wait()
+    finally:
+        watcher.cancel()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve_forever())
+    except KeyboardInterrupt:
+        pass
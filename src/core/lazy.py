@@ -0,0 +1,90 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Generic, Iterator, Optional, TypeVar
+
+
+T = TypeVar("T")
+
+
+class LazyProxy(Generic[T]):
+    """
+    Stand-in for a module-level singleton that is created on first use.
+
+    Importing a module that defines one costs nothing; the factory runs when
+    an attribute is first read. :meth:`bind` substitutes another instance for
+    the current context (and the asyncio tasks started from it), which is how
+    :class:`src.app.Application` keeps several instances apart in one process.
+    """
+
+    def __init__(self, factory: Callable[[], T], name: str) -> None:
+        object.__setattr__(self, "_lazy_factory", factory)
+        object.__setattr__(self, "_lazy_instance", None)
+        object.__setattr__(self, "_lazy_bound", ContextVar(f"lazy_{name}", default=None))
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+        object.__setattr__(self, "_lazy_name", name)
+
+    def _lazy_resolve(self) -> T:
+        bound = self._lazy_bound.get()
+        if bound is not None:
+            return bound
+        instance = self._lazy_instance
+        if instance is None:
+            with self._lazy_lock:
+                instance = self._lazy_instance
+                if instance is None:
+                    instance = self._lazy_factory()
+                    object.__setattr__(self, "_lazy_instance", instance)
+        return instance
+
+    @property
+    def lazy_created(self) -> bool:
+        return self._lazy_instance is not None or self._lazy_bound.get() is not None
+
+    @contextmanager
+    def bind(self, instance: T) -> Iterator[T]:
+        token = self._lazy_bound.set(instance)
+        try:
+            yield instance
+        finally:
+            self._lazy_bound.reset(token)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._lazy_resolve(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._lazy_resolve(), name, value)
+
+    def __contains__(self, item: object) -> bool:
+        return item in self._lazy_resolve()
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._lazy_resolve()[key]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._lazy_resolve()[key] = value
+
+    def __len__(self) -> int:
+        return len(self._lazy_resolve())
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._lazy_resolve())
+
+    def __repr__(self) -> str:
+        state = repr(self._lazy_resolve()) if self.lazy_created else "not created"
+        return f"<lazy {self._lazy_name}: {state}>"
+
+
+def lazy(factory: Callable[[], T], name: Optional[str] = None) -> T:
+    """
+    Typed helper: the proxy is annotated as the object it stands for.
+    """
+    return LazyProxy(factory, name or getattr(factory, "__name__", "object"))  # type: ignore[return-value]
+
+
+def unwrap(obj: T) -> T:
+    """
+    The instance a proxy currently stands for (``obj`` itself if it is not a
+    proxy), for holders that must keep that instance rather than the proxy.
+    """
+    return obj._lazy_resolve() if isinstance(obj, LazyProxy) else obj
@@ -1,5 +1,14 @@
+import atexit
+import json
 import logging
-from typing import Dict
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.core.tracing import current_trace
 
 
 class ColorFormatter(logging.Formatter):
@@ -31,21 +40,156 @@ class ColorFormatter(logging.Formatter):
         return message
 
 
-def setup_logging() -> None:
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, for log collectors.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            payload["trace_id"] = trace_id
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class TraceContextFilter(logging.Filter):
     """
-    Configure logging with colored output for different levels.
+    Stamps records with the current trace id while still on the caller's thread.
     """
-    formatter = ColorFormatter(
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = current_trace()
+        record.trace_id = trace.trace_id if trace else None
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most ``limit`` records per message template and ``period``
+    seconds; records at ``WARNING`` and above always pass.
+
+    The first record of a new period reports how many were dropped before it.
+    Windows that have expired are swept out once per period; a swept window
+    that still counts dropped records is reported by a summary record first.
+    """
+
+    def __init__(self, limit: int, period: float = 60.0) -> None:
+        super().__init__()
+        self.limit = limit
+        self.period = period
+        # (logger, template) -> (period start, records seen in the period, suppressed, level)
+        self._windows: Dict[Tuple[str, str], Tuple[float, int, int, int]] = {}
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or getattr(record, "rate_limit_summary", False):
+            return True
+
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        swept: List[Tuple[Tuple[str, str], int, int]] = []
+        with self._lock:
+            if now - self._last_sweep >= self.period:
+                # Templates built from variable data would otherwise pile up forever.
+                self._last_sweep = now
+                windows = {}
+                for window_key, window in self._windows.items():
+                    if now - window[0] < self.period or window_key == key:
+                        windows[window_key] = window
+                    elif window[2]:
+                        swept.append((window_key, window[2], window[3]))
+                self._windows = windows
+            started, seen, suppressed, _ = self._windows.get(key, (now, 0, 0, record.levelno))
+            if now - started >= self.period:
+                started, seen = now, 0
+            if seen >= self.limit:
+                self._windows[key] = (started, seen, suppressed + 1, record.levelno)
+                allowed = False
+            else:
+                self._windows[key] = (started, seen + 1, 0, record.levelno)
+                allowed = True
+
+        # Emitted outside the lock: the summaries pass through this filter again.
+        for (name, template), count, level in swept:
+            self._summarize(name, template, count, level)
+        if not allowed:
+            return False
+        if suppressed:
+            record.msg = f"{record.msg} (+{suppressed} similar suppressed)"
+        return True
+
+    @staticmethod
+    def _summarize(name: str, template: str, count: int, level: int) -> None:
+        logger = logging.getLogger(name)
+        summary = logger.makeRecord(
+            name, level, "(rate limit)", 0, "%d similar messages suppressed: %s", (count, template), None
+        )
+        summary.rate_limit_summary = True
+        logger.handle(summary)
+
+
+_listener: Optional[QueueListener] = None
+
+
+def _build_formatter() -> logging.Formatter:
+    if settings.log_format == "json":
+        return JsonFormatter()
+    return ColorFormatter(
         fmt="%(asctime)s,%(msecs)03d | %(levelname)-8s | %(name)s | %(lineno)d - %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
     )
 
+
+def setup_logging() -> None:
+    """
+    Configure logging through a queue: callers only enqueue records and a
+    listener thread formats and writes them, so the event loop never waits on
+    the output stream.
+    """
+    global _listener
+    shutdown_logging()
+
     handler = logging.StreamHandler()
-    handler.setFormatter(formatter)
+    handler.setFormatter(_build_formatter())
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(TraceContextFilter())
+    if settings.log_rate_limit_per_minute:
+        queue_handler.addFilter(RateLimitFilter(settings.log_rate_limit_per_minute))
 
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
+    root_logger.setLevel(settings.log_level.upper())
 
     # replace existing handlers to avoid duplicate outputs
     root_logger.handlers.clear()
-    root_logger.addHandler(handler)
+    root_logger.addHandler(queue_handler)
+
+    for name, level in settings.log_levels.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """
+    Flush queued records and stop the listener thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
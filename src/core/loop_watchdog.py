@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import List, Optional
+
+from src.core.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = registry.histogram(
+    "bot_event_loop_lag_seconds",
+    "Delay of the event loop heartbeat beyond its interval.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_BLOCKS_TOTAL = registry.counter(
+    "bot_event_loop_blocks_total", "Times the event loop was blocked, by blocking function.", ["function"]
+)
+LOOP_BLOCK_SECONDS = registry.gauge(
+    "bot_event_loop_longest_block_seconds", "Longest event loop block seen since start."
+)
+
+# Frames from this directory name the blocking function in reports.
+PROJECT_MARKER = "/src/"
+
+
+class LoopWatchdog:
+    """
+    Detects a blocked event loop.
+
+    A heartbeat task records when the loop last ran and how late it woke up; a
+    daemon thread notices when the heartbeat stops for longer than ``threshold``
+    and captures the loop thread's stack, so the report names the blocking call.
+    """
+
+    def __init__(self, interval: float, threshold: float) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.longest_block = 0.0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat = asyncio.get_running_loop().create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+
+    async def _beat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            LOOP_LAG_SECONDS.observe(lag)
+            self._last_beat = now
+            if lag > self.longest_block:
+                self.longest_block = lag
+                LOOP_BLOCK_SECONDS.set(lag)
+
+    def _watch(self) -> None:
+        reported_beat: Optional[float] = None
+        while not self._stopped.wait(self.threshold / 2):
+            last_beat = self._last_beat
+            blocked_for = time.monotonic() - last_beat - self.interval
+            if blocked_for < self.threshold or reported_beat == last_beat:
+                continue
+            # Report each block once, with the stack at the moment it was noticed.
+            reported_beat = last_beat
+            self._report(blocked_for)
+
+    def _report(self, blocked_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)
+        culprit = _blocking_frame(stack)
+        function = f"{_short_path(culprit.filename)}:{culprit.name}"
+        LOOP_BLOCKS_TOTAL.inc(function=function)
+        logger.warning(
+            "Event loop blocked for %.0fms+ in %s (line %s)\n%s",
+            blocked_for * 1000,
+            function,
+            culprit.lineno,
+            "".join(traceback.format_list(stack[-8:])).rstrip(),
+        )
+
+
+def _blocking_frame(stack: List[traceback.FrameSummary]) -> traceback.FrameSummary:
+    """
+    The innermost project frame, or the innermost frame when none is ours.
+    """
+    for frame in reversed(stack):
+        if PROJECT_MARKER in frame.filename.replace("\\", "/"):
+            return frame
+    return stack[-1]
+
+
+def _short_path(filename: str) -> str:
+    normalized = filename.replace("\\", "/")
+    index = normalized.rfind(PROJECT_MARKER)
+    return normalized[index + 1:] if index != -1 else normalized.rsplit("/", 1)[-1]
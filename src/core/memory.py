@@ -0,0 +1,179 @@
+import logging
+import sys
+import threading
+import tracemalloc
+import weakref
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sized, Tuple
+
+from src.core.metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+STORE_ENTRIES = registry.gauge("bot_store_entries", "Entries held by in-process stores.", ["store"])
+STORE_BYTES = registry.gauge(
+    "bot_store_bytes", "Approximate deep size of in-process stores, as of the last sample.", ["store"]
+)
+
+_CONTAINERS = (dict, list, tuple, set, frozenset, deque)
+
+
+def deep_sizeof(root: Any) -> int:
+    """
+    Approximate memory held by ``root``: builtin containers and objects of this
+    project are followed, anything else (asyncio handles, aiogram objects)
+    counts only its own size, so shared runtime state is never walked.
+    """
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, _CONTAINERS):
+            stack.extend(obj)
+        elif type(obj).__module__.startswith("src."):
+            if hasattr(obj, "__dict__"):
+                stack.append(vars(obj))
+            for slot in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+    return total
+
+
+@dataclass
+class StoreUsage:
+    name: str
+    entries: int
+    size: int
+
+
+class MemoryTracker:
+    """
+    Registry of in-process stores for memory accounting, plus ``tracemalloc``
+    snapshot diffing for what the stores do not cover.
+
+    Entry counts are exported live. Walking a store for its size takes time in
+    proportion to its contents, so sizes are computed only by :meth:`usage`
+    (the ``/memory`` command) and by the sampler thread, never per scrape.
+
+    Owners of stores are held by weak reference: tracking never keeps an
+    instance alive, and the entries of collected owners are dropped.
+    """
+
+    def __init__(self) -> None:
+        self._stores: Dict[str, Tuple[weakref.ref, Callable[[Any], Sized]]] = {}
+        # Names whose owner was collected; weakref callbacks only queue them, since
+        # they may run inside the garbage collector while a lock is held.
+        self._dead: deque = deque()
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+        self._sampler_stopped = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def track(self, name: str, owner: Any, provider: Callable[[Any], Sized]) -> str:
+        """
+        Account the container ``provider(owner)`` returns under ``name``; a name
+        already taken (a second instance of the same store) gets a ``#n``
+        suffix. Returns the name used. ``provider`` must not capture ``owner``.
+        """
+        self._purge()
+        with self._lock:
+            unique, number = name, 1
+            while unique in self._stores:
+                number += 1
+                unique = f"{name}#{number}"
+            owner_ref = weakref.ref(owner, lambda _: self._dead.append(unique))
+            self._stores[unique] = (owner_ref, provider)
+
+        def entries() -> int:
+            current = owner_ref()
+            return len(provider(current)) if current is not None else 0
+
+        STORE_ENTRIES.set_function(entries, store=unique)
+        return unique
+
+    def untrack(self, name: str) -> None:
+        with self._lock:
+            self._stores.pop(name, None)
+        STORE_ENTRIES.remove(store=name)
+        STORE_BYTES.remove(store=name)
+
+    def _purge(self) -> None:
+        while self._dead:
+            self.untrack(self._dead.popleft())
+
+    def usage(self) -> List[StoreUsage]:
+        self._purge()
+        with self._lock:
+            stores = list(self._stores.items())
+        result = []
+        for name, (owner_ref, provider) in stores:
+            owner = owner_ref()
+            if owner is None:
+                continue
+            container = provider(owner)
+            try:
+                size = deep_sizeof(container)
+            except RuntimeError:  # changed by the event loop while walked from the sampler
+                continue
+            STORE_BYTES.set(size, store=name)
+            result.append(StoreUsage(name, len(container), size))
+        return sorted(result, key=lambda item: item.size, reverse=True)
+
+    def start_sampling(self, interval: float) -> None:
+        """
+        Refresh ``bot_store_bytes`` every ``interval`` seconds from a daemon thread.
+        """
+        if self._sampler is not None:
+            return
+        self._sampler_stopped.clear()
+
+        def sample() -> None:
+            while not self._sampler_stopped.wait(interval):
+                try:
+                    self.usage()
+                except Exception:
+                    logger.exception("Failed to sample store sizes")
+
+        self._sampler = threading.Thread(target=sample, name="memory-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop_sampling(self) -> None:
+        self._sampler_stopped.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=1)
+            self._sampler = None
+
+    def snapshot_diff(self, limit: int = 10, frames: int = 1) -> Optional[List[tracemalloc.StatisticDiff]]:
+        """
+        Take a ``tracemalloc`` snapshot and compare it with the previous one.
+
+        Starts tracing on first use and returns ``None`` then, since there is
+        nothing to compare with yet.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._snapshot = None
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            return None
+        return snapshot.compare_to(previous, "lineno")[:limit]
+
+    def stop_tracing(self) -> None:
+        tracemalloc.stop()
+        self._snapshot = None
+
+
+memory = MemoryTracker()
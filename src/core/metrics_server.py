@@ -0,0 +1,50 @@
+import logging
+
+from aiohttp import web
+
+from src.core.metrics import registry
+from src.services.database import database
+from src.services.utm_manager import utm_manager
+
+
+logger = logging.getLogger(__name__)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=registry.expose(), content_type="text/plain", charset="utf-8")
+
+
+async def handle_liveness(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+async def handle_readiness(request: web.Request) -> web.Response:
+    checks = {}
+    try:
+        checks["database"] = database.ping()
+    except Exception as exc:
+        logger.error("Readiness check of the database failed: %s", exc)
+        checks["database"] = False
+    checks["catalog"] = utm_manager.is_healthy()
+
+    ready = all(checks.values())
+    return web.json_response({"status": "ok" if ready else "unavailable", "checks": checks}, status=200 if ready else 503)
+
+
+def setup_metrics_routes(app: web.Application) -> None:
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/health/live", handle_liveness)
+    app.router.add_get("/health/ready", handle_readiness)
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """
+    Serve metrics and health checks on a separate port; the caller cleans up the runner.
+    """
+    app = web.Application()
+    setup_metrics_routes(app)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logger.info("Metrics are served on %s:%s", host, port)
+    return runner
@@ -0,0 +1,125 @@
+import cProfile
+import heapq
+import itertools
+import marshal
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Coroutine, Generator, List, Optional, TypeVar
+
+from src.config import settings
+from src.core.lazy import lazy
+
+
+T = TypeVar("T")
+
+
+@dataclass(order=True)
+class ProfileRecord:
+    duration: float
+    sequence: int
+    name: str = field(compare=False)
+    trace_id: Optional[str] = field(compare=False)
+    created_at: float = field(compare=False)
+    # Marshalled ``pstats`` data, the format of ``cProfile -o`` files.
+    data: bytes = field(compare=False, repr=False)
+
+
+class _ProfiledCoroutine:
+    """
+    Drives a coroutine step by step with ``profile`` enabled only while the
+    step runs, so other tasks running on the loop between the steps are not
+    recorded in it.
+    """
+
+    # A step of one profiled coroutine never starts another's, but nesting is
+    # cheap to rule out and cProfile does not allow two active profiles.
+    _stepping = False
+
+    def __init__(self, coroutine: Coroutine[Any, Any, T], profile: cProfile.Profile) -> None:
+        self._coroutine = coroutine
+        self._profile = profile
+
+    def _step(self, value: Any, error: Optional[BaseException]) -> Any:
+        if _ProfiledCoroutine._stepping:
+            return self._coroutine.throw(error) if error is not None else self._coroutine.send(value)
+        _ProfiledCoroutine._stepping = True
+        self._profile.enable()
+        try:
+            return self._coroutine.throw(error) if error is not None else self._coroutine.send(value)
+        finally:
+            self._profile.disable()
+            _ProfiledCoroutine._stepping = False
+
+    def __await__(self) -> Generator[Any, Any, T]:
+        value: Any = None
+        error: Optional[BaseException] = None
+        while True:
+            try:
+                yielded = self._step(value, error)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                value, error = (yield yielded), None
+            except BaseException as exc:  # delivered into the coroutine, e.g. cancellation
+                value, error = None, exc
+
+
+class UpdateProfiler:
+    """
+    Profiles updates with cProfile and keeps the ``keep`` slowest ones that
+    took at least ``threshold`` seconds.
+
+    Each update gets its own profile, enabled only while the update's own
+    coroutine runs: time spent awaiting (and other updates running meanwhile)
+    is not in it, so a profile shows where the update used the CPU, while the
+    recorded duration is wall-clock time. Work the update hands to other tasks
+    or threads is not profiled.
+    """
+
+    def __init__(self, threshold: float, keep: int) -> None:
+        self.threshold = threshold
+        self.keep = keep
+        self._records: List[ProfileRecord] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def start(self) -> cProfile.Profile:
+        return cProfile.Profile()
+
+    async def run(self, profile: cProfile.Profile, coroutine: Coroutine[Any, Any, T]) -> T:
+        return await _ProfiledCoroutine(coroutine, profile)
+
+    def stop(self, profile: cProfile.Profile, duration: float, name: str, trace_id: Optional[str]) -> None:
+        if duration < self.threshold:
+            return
+        if len(self._records) >= self.keep and duration <= self._records[0].duration:
+            return
+
+        profile.create_stats()
+        record = ProfileRecord(
+            duration=duration,
+            sequence=next(self._sequence),
+            name=name,
+            trace_id=trace_id,
+            created_at=time.time(),
+            data=marshal.dumps(profile.stats),
+        )
+        with self._lock:
+            if len(self._records) < self.keep:
+                heapq.heappush(self._records, record)
+            else:
+                heapq.heappushpop(self._records, record)
+
+    def slowest(self) -> List[ProfileRecord]:
+        with self._lock:
+            return sorted(self._records, reverse=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+profiler: UpdateProfiler = lazy(
+    lambda: UpdateProfiler(threshold=settings.profile_threshold_ms / 1000, keep=settings.profile_keep), "profiler"
+)
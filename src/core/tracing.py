@@ -0,0 +1,193 @@
+import atexit
+import contextlib
+import functools
+import inspect
+import json
+import logging
+import queue
+import secrets
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+
+logger = logging.getLogger(__name__)
+# Slow traces are written here as JSON lines when an export path is configured.
+export_logger = logging.getLogger("src.traces")
+export_logger.propagate = False
+
+T = TypeVar("T")
+
+
+class Span:
+    __slots__ = ("name", "parent", "depth", "started", "finished")
+
+    def __init__(self, name: str, parent: Optional[int], depth: int) -> None:
+        self.name = name
+        self.parent = parent
+        self.depth = depth
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+
+class Trace:
+    """
+    Timings of one update: a flat list of spans linked to their parents.
+    """
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+        self.trace_id = secrets.token_hex(8)
+        self.name = name
+        self.attributes = attributes or {}
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.spans: List[Span] = []
+
+    @property
+    def duration(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        """
+        Compact one-line breakdown: ``name 12.3ms [db.get_history 1.1ms, ...]``.
+        """
+        parts = ", ".join(f"{span.name} {span.duration * 1000:.1f}ms" for span in self.spans)
+        return f"{self.name} {self.duration * 1000:.1f}ms [{parts}]"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "attributes": self.attributes,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "spans": [
+                {
+                    "name": span.name,
+                    "parent": span.parent,
+                    "depth": span.depth,
+                    "start_ms": round((span.started - self.started) * 1000, 3),
+                    "duration_ms": round(span.duration * 1000, 3),
+                }
+                for span in self.spans
+            ],
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextlib.contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Trace]:
+    trace = Trace(name, attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+@contextlib.contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Record a nested span in the current trace; does nothing outside of a trace.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    parent = _current_span.get()
+    depth = trace.spans[parent].depth + 1 if parent is not None else 0
+    record = Span(name, parent, depth)
+    trace.spans.append(record)
+    token = _current_span.set(len(trace.spans) - 1)
+    try:
+        yield
+    finally:
+        record.finished = time.perf_counter()
+        _current_span.reset(token)
+
+
+def trace_methods(prefix: str) -> Callable[[type], type]:
+    """
+    Class decorator wrapping every public method in a ``{prefix}.{method}`` span.
+    """
+
+    def decorate(cls: type) -> type:
+        for name, member in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(member):
+                continue
+            setattr(cls, name, _traced(member, f"{prefix}.{name}"))
+        return cls
+
+    return decorate
+
+
+def _traced(function: Callable[..., T], name: str) -> Callable[..., T]:
+    if inspect.iscoroutinefunction(function):
+
+        @functools.wraps(function)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return await function(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(function)
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        with span(name):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+_export_listener: Optional[QueueListener] = None
+
+
+def configure_trace_export(path: Optional[str]) -> None:
+    """
+    Append finished slow traces to ``path`` as JSON lines (one trace per line).
+
+    Writes happen on a listener thread, off the event loop.
+    """
+    global _export_listener
+    if _export_listener is not None:
+        _export_listener.stop()
+        _export_listener = None
+    export_logger.handlers.clear()
+    if not path:
+        return
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    export_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    export_logger.addHandler(QueueHandler(export_queue))
+    export_logger.setLevel(logging.INFO)
+    _export_listener = QueueListener(export_queue, handler)
+    _export_listener.start()
+
+
+@atexit.register
+def _stop_trace_export() -> None:
+    if _export_listener is not None:
+        _export_listener.stop()
+
+
+def report_trace(trace: Trace, threshold: float) -> None:
+    if trace.duration < threshold:
+        return
+    logger.warning("Slow update %s: %s", trace.trace_id, trace.summary())
+    if export_logger.handlers:
+        export_logger.info(json.dumps(trace.to_dict(), ensure_ascii=False))
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from src.config import settings
+from src.core.metrics_server import setup_metrics_routes
+
+
+logger = logging.getLogger(__name__)
+
+
+def build_webhook_app(dp: Dispatcher, bot: Bot) -> web.Application:
+    """
+    Build the aiohttp application serving Telegram updates for ``bot``.
+
+    Updates are acknowledged with 200 right away and fed to the dispatcher in
+    background tasks; requests without the configured secret token get 401.
+    Metrics and health checks are served by the same application; the internal
+    API keeps its own listener (``HTTP_API_HOST``/``HTTP_API_PORT``).
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=settings.webhook_secret,
+    ).register(app, path=settings.webhook_path)
+    setup_application(app, dp, bot=bot)
+    setup_metrics_routes(app)
+    return app
+
+
+async def _register_webhook(bot: Bot, dispatcher: Dispatcher) -> None:
+    url = settings.webhook_base_url.rstrip("/") + settings.webhook_path
+    # Every instance behind the proxy registers the same URL, so this is idempotent.
+    await bot.set_webhook(
+        url,
+        secret_token=settings.webhook_secret,
+        allowed_updates=dispatcher.resolve_used_update_types(),
+    )
+    logger.info("Webhook registered at %s", url)
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot) -> None:
+    """
+    Serve updates through the webhook application until cancelled.
+    """
+    if not settings.webhook_base_url:
+        raise RuntimeError("WEBHOOK_BASE_URL must be set when RUN_MODE=webhook")
+    if not settings.webhook_secret:
+        logger.warning("WEBHOOK_SECRET is not set, incoming updates are not verified")
+
+    dp.startup.register(_register_webhook)
+    app = build_webhook_app(dp, bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.webhook_host, port=settings.webhook_port)
+    await site.start()
+    logger.info("Bot is serving webhook on %s:%s", settings.webhook_host, settings.webhook_port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
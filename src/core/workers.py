@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.dispatcher.dispatcher import DEFAULT_BACKOFF_CONFIG
+from aiogram.types import Update
+from aiogram.utils.backoff import Backoff
+
+from src.config import settings
+from src.core.metrics_server import start_metrics_server
+
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CHANGED = "catalog_changed"
+# A user's cached history or presets changed in another worker; routed to the user's own worker.
+USER_CHANGED = "user_changed"
+POLL_TIMEOUT_SECONDS = 30
+# A worker that dies more often than this within the window is not restarted again.
+MAX_WORKER_RESTARTS = 5
+RESTART_WINDOW_SECONDS = 300.0
+
+
+def update_user_id(update: Update) -> int:
+    """
+    Routing key of an update: the acting user, falling back to the chat or update id.
+    """
+    event = update.event
+    from_user = getattr(event, "from_user", None)
+    if from_user is not None:
+        return from_user.id
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    return update.update_id
+
+
+def resolve_worker_count() -> int:
+    return settings.worker_count or os.cpu_count() or 1
+
+
+def _worker_main(index: int, updates: multiprocessing.Queue, notifications: multiprocessing.Queue) -> None:
+    from src.core.logging_config import setup_logging
+    from src.core.tracing import configure_trace_export
+
+    setup_logging()
+    # One trace file per worker, so concurrent appends never interleave.
+    if settings.trace_export_path:
+        configure_trace_export(f"{settings.trace_export_path}.worker{index}")
+    asyncio.run(_serve_worker(index, updates, notifications))
+
+
+async def _serve_worker(index: int, updates: multiprocessing.Queue, notifications: multiprocessing.Queue) -> None:
+    # Imported here so that spawned processes build their own singletons.
+    from src.bot import build_bot, build_dispatcher, start_loop_watchdog
+    from src.core.memory import memory
+    from src.services.database import database
+    from src.services.utm_manager import utm_manager
+
+    worker_logger = logging.getLogger(f"{__name__}.worker{index}")
+    utm_manager.add_change_listener(lambda: notifications.put({"control": CATALOG_CHANGED, "origin": index}))
+    database.add_change_listener(
+        lambda user_id: notifications.put({"control": USER_CHANGED, "user_id": user_id, "origin": index})
+    )
+
+    bot = build_bot(rate_share=1 / resolve_worker_count())
+    dp = build_dispatcher()
+    loop = asyncio.get_running_loop()
+    # Last scheduled task per user: each new update of the user waits for it,
+    # so per-user ordering holds while different users run concurrently.
+    tails: Dict[int, asyncio.Task] = {}
+
+    async def process(raw_update: Dict[str, Any], previous: Optional[asyncio.Task]) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            await dp.feed_raw_update(bot, raw_update)
+        except Exception:
+            worker_logger.exception("Failed to process update %s", raw_update.get("update_id"))
+
+    def forget(user_id: int, task: asyncio.Task) -> None:
+        if tails.get(user_id) is task:
+            del tails[user_id]
+
+    metrics_runner = None
+    if settings.metrics_port:
+        # The receiver owns METRICS_PORT, workers take the following ports.
+        metrics_runner = await start_metrics_server(settings.metrics_host, settings.metrics_port + 1 + index)
+
+    watchdog = start_loop_watchdog()
+    if settings.memory_sample_interval_seconds:
+        memory.start_sampling(settings.memory_sample_interval_seconds)
+    worker_logger.info("Worker %s started (pid %s)", index, os.getpid())
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    try:
+        while True:
+            item = await loop.run_in_executor(None, updates.get)
+            if item is None:
+                break
+            if item.get("control") == CATALOG_CHANGED:
+                utm_manager.load_data()
+                utm_manager.normalize_data()
+                worker_logger.info("Catalog reloaded after change in worker %s", item.get("origin"))
+                continue
+            if item.get("control") == USER_CHANGED:
+                database.invalidate_user(item["user_id"])
+                continue
+
+            user_id = item["user_id"]
+            task = asyncio.create_task(process(item["update"], tails.get(user_id)))
+            tails[user_id] = task
+            task.add_done_callback(lambda done, uid=user_id: forget(uid, done))
+
+        if tails:
+            await asyncio.wait(list(tails.values()))
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await dp.storage.close()
+        await bot.session.close()
+        if watchdog is not None:
+            watchdog.stop()
+        memory.stop_sampling()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+
+
+async def _relay_notifications(notifications: multiprocessing.Queue, workers: List[multiprocessing.Queue]) -> None:
+    loop = asyncio.get_running_loop()
+
+    def next_notification() -> Optional[Dict[str, Any]]:
+        try:
+            return notifications.get(timeout=1.0)
+        except queue.Empty:
+            return None
+
+    while True:
+        message = await loop.run_in_executor(None, next_notification)
+        if message is None:
+            continue
+        if message.get("control") == USER_CHANGED:
+            # Only the user's own worker caches their data; it needs no news of its own writes.
+            owner = message["user_id"] % len(workers)
+            if owner != message.get("origin"):
+                workers[owner].put(message)
+            continue
+        if message.get("control") == CATALOG_CHANGED:
+            # The receiver serves the internal API, which reads the catalog too.
+            from src.services.utm_manager import utm_manager
+
+            utm_manager.load_data()
+            utm_manager.normalize_data()
+        for index, worker_queue in enumerate(workers):
+            if index != message.get("origin"):
+                worker_queue.put(message)
+
+
+class _WorkerPool:
+    """
+    The worker processes and their update queues; a worker that dies is restarted
+    on the same queue, so the updates already routed to it are not lost.
+    """
+
+    def __init__(self, context: Any, count: int, notifications: multiprocessing.Queue) -> None:
+        self._context = context
+        self._notifications = notifications
+        self.queues: List[multiprocessing.Queue] = [context.Queue() for _ in range(count)]
+        self.processes: List[Any] = [self._spawn(index) for index in range(count)]
+        self._restarts: List[Deque[float]] = [deque() for _ in range(count)]
+
+    def _spawn(self, index: int) -> Any:
+        process = self._context.Process(
+            target=_worker_main, args=(index, self.queues[index], self._notifications), daemon=True
+        )
+        process.start()
+        return process
+
+    def supervise(self) -> None:
+        """
+        Restart dead workers; raise when one keeps dying, rather than leave its users unserved.
+        """
+        now = time.monotonic()
+        for index, process in enumerate(self.processes):
+            if process.is_alive():
+                continue
+            restarts = self._restarts[index]
+            while restarts and now - restarts[0] > RESTART_WINDOW_SECONDS:
+                restarts.popleft()
+            if len(restarts) >= MAX_WORKER_RESTARTS:
+                raise RuntimeError(
+                    f"Worker {index} died {len(restarts) + 1} times within {RESTART_WINDOW_SECONDS:.0f}s "
+                    f"(last exit code {process.exitcode})"
+                )
+            restarts.append(now)
+            logger.error("Worker %s exited with code %s, restarting it", index, process.exitcode)
+            self.processes[index] = self._spawn(index)
+
+    def stop(self) -> None:
+        for worker_queue in self.queues:
+            worker_queue.put(None)
+        for process in self.processes:
+            process.join(timeout=10)
+
+
+async def run_workers(bot: Bot, allowed_updates: List[str]) -> None:
+    """
+    Receive updates in this process and distribute them to worker processes.
+
+    Updates of one user always go to the same worker (``user_id % N``), which keeps
+    their order and lets each worker cache that user's state. Workers share the
+    SQLite database and announce catalog edits through the receiver, which
+    forwards them to every other worker; writes to a user's history or presets are
+    forwarded to that user's worker, which drops its cached copy. Dead workers are
+    restarted between polls.
+
+    Catalog edits are not serialized: each worker saves its whole copy of the
+    catalog, so when two workers edit it at the same time the last save wins and
+    the other edit is lost (the other worker then reloads the winning version).
+    """
+    context = multiprocessing.get_context("spawn")
+    worker_count = resolve_worker_count()
+    notifications: multiprocessing.Queue = context.Queue()
+    pool = _WorkerPool(context, worker_count, notifications)
+    logger.info("Started %s worker processes", worker_count)
+
+    relay = asyncio.create_task(_relay_notifications(notifications, pool.queues))
+    await bot.delete_webhook()
+    backoff = Backoff(config=DEFAULT_BACKOFF_CONFIG)
+    offset: Optional[int] = None
+    # Like aiogram's polling: the HTTP request must outlive the long poll itself.
+    request_timeout = int(bot.session.timeout + POLL_TIMEOUT_SECONDS) if bot.session.timeout else None
+    try:
+        while True:
+            pool.supervise()
+            try:
+                updates = await bot.get_updates(
+                    offset=offset,
+                    timeout=POLL_TIMEOUT_SECONDS,
+                    allowed_updates=allowed_updates,
+                    request_timeout=request_timeout,
+                )
+            except Exception as exc:
+                # Any Bot API failure (network, 5xx, flood control) is retried, like aiogram's own polling.
+                logger.warning(
+                    "Failed to fetch updates (%s: %s), retrying in %.1fs", type(exc).__name__, exc, backoff.next_delay
+                )
+                await backoff.asleep()
+                continue
+            backoff.reset()
+            for update in updates:
+                offset = update.update_id + 1
+                user_id = update_user_id(update)
+                pool.queues[user_id % worker_count].put(
+                    {"user_id": user_id, "update": update.model_dump(mode="json", exclude_none=True)}
+                )
+    finally:
+        relay.cancel()
+        pool.stop()
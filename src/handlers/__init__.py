@@ -1,11 +1,21 @@
 from aiogram import Dispatcher
 
 from .commands import router as commands_router
+from .diagnostics import router as diagnostics_router
+from .dispatch_index import dispatch_index
+from .presets import router as presets_router
 from .utm_generation import router as utm_generation_router
 from .utm_management import router as utm_management_router
 
 
 def register_handlers(dp: Dispatcher) -> None:
-    dp.include_router(commands_router)
-    dp.include_router(utm_management_router)
-    dp.include_router(utm_generation_router)
+    """
+    Include freshly built routers, so every dispatcher (one per
+    :class:`src.app.Application`) gets its own.
+    """
+    # Main-menu buttons come first, so they are never taken as a pending free-text input.
+    dp.include_router(commands_router.build())
+    # Pending free-text inputs and all callback queries are resolved by the index.
+    dp.include_router(dispatch_index.build_router())
+    for router in (diagnostics_router, presets_router, utm_management_router, utm_generation_router):
+        dp.include_router(router.build())
@@ -1,36 +1,45 @@
-from datetime import datetime, timezone
-from zoneinfo import ZoneInfo
+import re
+import sqlite3
+from datetime import date
+from typing import Optional, Tuple
 
-from aiogram import F, Router, types
+from aiogram import F, types
 from aiogram.filters import Command
 from aiogram.exceptions import TelegramBadRequest
 
 from src.keyboards.main_menu import build_main_menu_keyboard
-from src.keyboards.settings import build_settings_keyboard
+from src.keyboards.settings import UserCursor, build_settings_keyboard, build_users_keyboard, decode_user_cursor
 from src.services.database import database
-from src.handlers.utm_management import start_utm_management
-from src.state.user_state import (
-    pending_password_change_users,
-    pending_password_users,
-    pending_user_deletion,
+from src.handlers.dispatch_index import (
+    clear_pending_action,
+    dispatch_index,
+    get_pending_action,
+    get_pending_payload,
+    set_pending_action,
 )
+from src.handlers.utm_management import start_utm_management
+from src.handlers.routing import RouterTemplate
+from src.services.message_editor import edit_message
+from src.utils.formatting import format_timestamp, moscow_day_bounds
 
 
-router = Router()
-MOSCOW_TZ = ZoneInfo("Europe/Moscow")
+router = RouterTemplate("commands")
 
+PASSWORD_ACTION = "password"
+PASSWORD_CHANGE_ACTION = "password_change"
+USER_DELETION_ACTION = "user_deletion"
+USER_SEARCH_ACTION = "user_search"
+SETTINGS_ACTIONS = (PASSWORD_CHANGE_ACTION, USER_DELETION_ACTION, USER_SEARCH_ACTION)
+
+USERS_PAGE_SIZE = 20
+# Telegram usernames: latin letters, digits and underscores, up to 32 characters.
+USERNAME_PATTERN = re.compile(r"^@?([A-Za-z0-9_]{1,32})$")
+DATE_PATTERN = re.compile(r"^(\d{2})\.(\d{2})\.(\d{4})$")
 
-def _format_timestamp(value: str | None) -> str:
-    if not value:
-        return "—"
-    try:
-        parsed = datetime.fromisoformat(value)
-    except ValueError:
-        return value
-    if parsed.tzinfo is None:
-        parsed = parsed.replace(tzinfo=timezone.utc)
-    localized = parsed.astimezone(MOSCOW_TZ)
-    return localized.strftime("%Y-%m-%d %H:%M") + " МСК"
+
+def _clear_settings_actions(user_id: int) -> None:
+    if get_pending_action(user_id) in SETTINGS_ACTIONS:
+        clear_pending_action(user_id)
 
 
 def _format_username(username: str | None) -> str:
@@ -43,17 +52,27 @@ def _format_username(username: str | None) -> str:
     return f"@{username}"
 
 
+def _format_user_line(row: sqlite3.Row, banned: bool) -> str:
+    username = _format_username(row["username"])
+    if banned:
+        timestamp = format_timestamp(row["banned_at"])
+        reason = row["reason"] or "—"
+        return f"• ID {row['user_id']} | {username} | блокирован {timestamp} | причина: {reason}"
+    timestamp = format_timestamp(row["authorized_at"])
+    return f"• ID {row['user_id']} | {username} | доступ с {timestamp}"
+
+
 @router.message(Command("start"), flags={"auth_required": False})
 async def cmd_start(message: types.Message) -> None:
     user_id = message.from_user.id
 
     if database.is_user_banned(user_id):
-        pending_password_users.discard(user_id)
+        clear_pending_action(user_id, PASSWORD_ACTION)
         await message.answer("⛔️ Доступ к боту запрещён.")
         return
 
     if database.is_user_authorized(user_id):
-        pending_password_users.discard(user_id)
+        clear_pending_action(user_id, PASSWORD_ACTION)
         database.authorize_user(user_id, message.from_user.username)
         await message.answer(
             "👋 С возвращением! Выберите действие на клавиатуре.",
@@ -61,7 +80,7 @@ async def cmd_start(message: types.Message) -> None:
         )
         return
 
-    pending_password_users.add(user_id)
+    set_pending_action(user_id, PASSWORD_ACTION)
     await message.answer(
         "🔒 Бот доступен только для сотрудников.\n"
         "Введите пароль, чтобы начать работу.",
@@ -69,7 +88,7 @@ async def cmd_start(message: types.Message) -> None:
     )
 
 
-@router.message(lambda msg: msg.from_user.id in pending_password_users, flags={"auth_required": False})
+@dispatch_index.pending(PASSWORD_ACTION, flags={"auth_required": False})
 async def handle_password(message: types.Message) -> None:
     user_id = message.from_user.id
     if not message.text:
@@ -82,7 +101,7 @@ async def handle_password(message: types.Message) -> None:
 
     if password == current_password:
         database.authorize_user(user_id, message.from_user.username)
-        pending_password_users.discard(user_id)
+        clear_pending_action(user_id, PASSWORD_ACTION)
         await message.answer(
             "✅ Пароль принят! Теперь вы можете пользоваться ботом.",
             reply_markup=build_main_menu_keyboard(),
@@ -94,15 +113,14 @@ async def handle_password(message: types.Message) -> None:
 
     if attempts >= 3:
         database.ban_user(user_id, message.from_user.username, reason="invalid_password")
-        pending_password_users.discard(user_id)
+        clear_pending_action(user_id, PASSWORD_ACTION)
         await message.answer("❌ Пароль неверный. Лимит попыток исчерпан, вы заблокированы.")
         return
 
-    pending_password_users.add(user_id)
     await message.answer(f"❌ Пароль неверный. Осталось попыток: {remaining}.")
 
 
-@router.message(lambda msg: msg.from_user.id in pending_password_change_users)
+@dispatch_index.pending(PASSWORD_CHANGE_ACTION)
 async def handle_new_bot_password(message: types.Message) -> None:
     user_id = message.from_user.id
     if not message.text:
@@ -114,7 +132,7 @@ async def handle_new_bot_password(message: types.Message) -> None:
         await message.answer("Пароль не должен быть пустым. Введите другое значение.")
         return
     if new_password.casefold() == "отмена":
-        pending_password_change_users.discard(user_id)
+        clear_pending_action(user_id, PASSWORD_CHANGE_ACTION)
         await message.answer(
             "Действие отменено.",
             reply_markup=build_main_menu_keyboard(),
@@ -122,14 +140,14 @@ async def handle_new_bot_password(message: types.Message) -> None:
         return
 
     database.update_bot_password(new_password)
-    pending_password_change_users.discard(user_id)
+    clear_pending_action(user_id, PASSWORD_CHANGE_ACTION)
     await message.answer(
         "🔐 Пароль обновлён. Сообщите команде о новых данных для доступа.",
         reply_markup=build_main_menu_keyboard(),
     )
 
 
-@router.message(lambda msg: msg.from_user.id in pending_user_deletion)
+@dispatch_index.pending(USER_DELETION_ACTION)
 async def handle_user_deletion(message: types.Message) -> None:
     user_id = message.from_user.id
     if not message.text:
@@ -138,7 +156,7 @@ async def handle_user_deletion(message: types.Message) -> None:
 
     user_id_text = message.text.strip()
     if user_id_text.casefold() == "отмена":
-        pending_user_deletion.discard(user_id)
+        clear_pending_action(user_id, USER_DELETION_ACTION)
         await message.answer("Удаление отменено.", reply_markup=build_main_menu_keyboard())
         return
 
@@ -148,7 +166,7 @@ async def handle_user_deletion(message: types.Message) -> None:
 
     target_user_id = int(user_id_text)
     deleted = database.delete_user(target_user_id)
-    pending_user_deletion.discard(user_id)
+    clear_pending_action(user_id, USER_DELETION_ACTION)
 
     if deleted:
         await message.answer(f"✅ Пользователь {target_user_id} удалён из базы.")
@@ -158,20 +176,16 @@ async def handle_user_deletion(message: types.Message) -> None:
 
 @router.message(F.text == "Настройки")
 async def show_settings(message: types.Message) -> None:
-    user_id = message.from_user.id
-    pending_password_change_users.discard(user_id)
-    pending_user_deletion.discard(user_id)
+    _clear_settings_actions(message.from_user.id)
     await message.answer(
         "⚙️ Настройки. Выберите действие:",
         reply_markup=build_settings_keyboard(),
     )
 
 
-@router.callback_query(F.data == "settings:change_password")
+@dispatch_index.callback("settings:change_password")
 async def start_password_change(callback: types.CallbackQuery) -> None:
-    user_id = callback.from_user.id
-    pending_user_deletion.discard(user_id)
-    pending_password_change_users.add(user_id)
+    set_pending_action(callback.from_user.id, PASSWORD_CHANGE_ACTION)
     await callback.answer()
     if callback.message:
         await callback.message.answer(
@@ -179,60 +193,137 @@ async def start_password_change(callback: types.CallbackQuery) -> None:
         )
 
 
-@router.callback_query(F.data == "settings:view_users")
+def _render_users_page(
+    banned: bool,
+    cursor: Optional[UserCursor] = None,
+    newer: bool = False,
+    search: str = "",
+) -> Tuple[str, types.InlineKeyboardMarkup]:
+    rows = database.page_users(
+        banned,
+        limit=USERS_PAGE_SIZE + 1,
+        cursor=cursor,
+        newer=newer,
+        username_prefix=search or None,
+    )
+    # One extra row tells whether there is another page in that direction.
+    if newer:
+        has_newer, has_older = len(rows) > USERS_PAGE_SIZE, True
+        rows = rows[-USERS_PAGE_SIZE:]
+    else:
+        has_newer, has_older = cursor is not None, len(rows) > USERS_PAGE_SIZE
+        rows = rows[:USERS_PAGE_SIZE]
+
+    active_total = database.count_users(False, search or None)
+    banned_total = database.count_users(True, search or None)
+    lines = [f"👥 Пользователи бота: активных {active_total}, заблокированных {banned_total}"]
+    if search:
+        lines.append(f"🔍 Поиск: @{search}")
+    lines.append("")
+    lines.append("Заблокированные:" if banned else "Активные:")
+    if not rows:
+        lines.append("—")
+    lines.extend(_format_user_line(row, banned) for row in rows)
+
+    timestamp_column = "banned_at" if banned else "authorized_at"
+    keyboard = build_users_keyboard(
+        banned,
+        first=(rows[0][timestamp_column], rows[0]["user_id"]) if rows else None,
+        last=(rows[-1][timestamp_column], rows[-1]["user_id"]) if rows else None,
+        has_newer=has_newer and bool(rows),
+        has_older=has_older and bool(rows),
+        search=search,
+    )
+    return "\n".join(lines), keyboard
+
+
+def _render_users_by_date(banned: bool, day: date) -> Tuple[str, types.InlineKeyboardMarkup]:
+    start, end = moscow_day_bounds(day)
+    rows = database.users_between(start, end, banned, limit=USERS_PAGE_SIZE + 1)
+    label = "заблокированные" if banned else "получившие доступ"
+    lines = [f"👥 Пользователи, {label} {day:%d.%m.%Y}:", ""]
+    if not rows:
+        lines.append("—")
+    lines.extend(_format_user_line(row, banned) for row in rows[:USERS_PAGE_SIZE])
+    if len(rows) > USERS_PAGE_SIZE:
+        lines.append(f"…показаны первые {USERS_PAGE_SIZE}")
+    keyboard = build_users_keyboard(banned, first=None, last=None, has_newer=False, has_older=False, filtered=True)
+    return "\n".join(lines), keyboard
+
+
+@dispatch_index.callback("settings:view_users")
 async def show_users(callback: types.CallbackQuery) -> None:
     await callback.answer()
-    active_users = database.list_authorized_users()
-    banned_users = database.list_banned_users()
-
-    lines: list[str] = ["👥 Пользователи бота"]
-
-    if active_users:
-        lines.append("")
-        lines.append("Активные:")
-        for row in active_users[:50]:
-            username = _format_username(row["username"])
-            timestamp = _format_timestamp(row["authorized_at"])
-            lines.append(f"• ID {row['user_id']} | {username} | доступ с {timestamp}")
-        if len(active_users) > 50:
-            lines.append("… показаны последние 50 записей")
-    else:
-        lines.append("")
-        lines.append("Активные: —")
-
-    if banned_users:
-        lines.append("")
-        lines.append("Заблокированные:")
-        for row in banned_users[:50]:
-            username = _format_username(row["username"])
-            timestamp = _format_timestamp(row["banned_at"])
-            reason = row["reason"] or "—"
-            lines.append(
-                f"• ID {row['user_id']} | {username} | блокирован {timestamp} | причина: {reason}"
-            )
-        if len(banned_users) > 50:
-            lines.append("… показаны последние 50 записей")
-    else:
-        lines.append("")
-        lines.append("Заблокированные: —")
+    text, keyboard = _render_users_page(banned=False)
+    if callback.message:
+        await callback.message.answer(text, reply_markup=keyboard)
+
+
+@dispatch_index.callback("users:")
+async def navigate_users(callback: types.CallbackQuery) -> None:
+    _, kind, action, cursor, search = callback.data.split(":", 4)
+    banned = kind == "b"
+    if action == "s":
+        set_pending_action(callback.from_user.id, USER_SEARCH_ACTION, banned=banned)
+        await callback.answer()
+        if callback.message:
+            await callback.message.answer("🔍 Отправьте username или его начало либо дату в формате ДД.ММ.ГГГГ. "
+                "Чтобы отменить, напишите «Отмена».")
+        return
 
+    await callback.answer()
+    text, keyboard = _render_users_page(
+        banned,
+        cursor=decode_user_cursor(cursor) if action in ("n", "p") else None,
+        newer=action == "p",
+        search=search,
+    )
     if callback.message:
-        await callback.message.answer("\n".join(lines))
+        await edit_message(callback.message, text, reply_markup=keyboard)
+
+
+@dispatch_index.pending(USER_SEARCH_ACTION)
+async def handle_user_search(message: types.Message) -> None:
+    user_id = message.from_user.id
+    text = (message.text or "").strip()
+    if text.casefold() == "отмена":
+        clear_pending_action(user_id, USER_SEARCH_ACTION)
+        await message.answer("Поиск отменён.")
+        return
+
+    date_match = DATE_PATTERN.match(text)
+    if date_match:
+        day_number, month, year = (int(part) for part in date_match.groups())
+        try:
+            day = date(year, month, day_number)
+        except ValueError:
+            await message.answer("Такой даты нет. Отправьте дату в формате ДД.ММ.ГГГГ.")
+            return
+    else:
+        match = USERNAME_PATTERN.match(text)
+        if not match:
+            await message.answer("Username может содержать только латинские буквы, цифры и «_» (до 32 символов).")
+            return
+
+    banned = bool(get_pending_payload(user_id).get("banned"))
+    clear_pending_action(user_id, USER_SEARCH_ACTION)
+    if date_match:
+        page_text, keyboard = _render_users_by_date(banned, day)
+    else:
+        page_text, keyboard = _render_users_page(banned, search=match.group(1))
+    await message.answer(page_text, reply_markup=keyboard)
 
 
-@router.callback_query(F.data == "settings:utm_manage")
+@dispatch_index.callback("settings:utm_manage")
 async def open_utm_management(callback: types.CallbackQuery) -> None:
     user_id = callback.from_user.id
-    pending_password_change_users.discard(user_id)
-    pending_user_deletion.discard(user_id)
+    _clear_settings_actions(user_id)
     await start_utm_management(user_id, callback=callback)
 
 
-@router.callback_query(F.data == "settings:delete_user")
+@dispatch_index.callback("settings:delete_user")
 async def prompt_user_deletion(callback: types.CallbackQuery) -> None:
-    user_id = callback.from_user.id
-    pending_password_change_users.discard(user_id)
-    pending_user_deletion.add(user_id)
+    set_pending_action(callback.from_user.id, USER_DELETION_ACTION)
     await callback.answer()
     if callback.message:
         await callback.message.answer(
@@ -240,15 +331,13 @@ async def prompt_user_deletion(callback: types.CallbackQuery) -> None:
         )
 
 
-@router.callback_query(F.data == "settings:exit")
+@dispatch_index.callback("settings:exit")
 async def close_settings(callback: types.CallbackQuery) -> None:
-    user_id = callback.from_user.id
-    pending_password_change_users.discard(user_id)
-    pending_user_deletion.discard(user_id)
+    _clear_settings_actions(callback.from_user.id)
     await callback.answer("Настройки закрыты.")
     if callback.message:
         try:
-            await callback.message.edit_reply_markup(reply_markup=None)
+            await edit_message(callback.message, callback.message.text or "", reply_markup=None)
         except TelegramBadRequest:
             pass
 
@@ -257,7 +346,9 @@ async def close_settings(callback: types.CallbackQuery) -> None:
 async def prompt_for_link(message: types.Message) -> None:
     await message.answer(
         "✍️ Пришлите ссылку, для которой нужно собрать UTM-метки. "
-        "Она должна начинаться с http:// или https://"
+        "Она должна начинаться с http:// или https://\n\n"
+        "Можно сразу указать метки: ссылка src=vk med=zakup camp=kazan date=2025-10-10 "
+        "(или значения через пробел в том же порядке)."
     )
 
 
@@ -0,0 +1,86 @@
+import asyncio
+
+from aiogram import types
+from aiogram.filters import Command, CommandObject
+
+from src.config import settings
+from src.core.memory import memory
+from src.core.profiling import profiler
+from src.handlers.routing import RouterTemplate
+from src.utils.formatting import format_timestamp
+
+
+router = RouterTemplate("diagnostics")
+
+ADMIN_FLAGS = {"admin_only": True}
+
+
+@router.message(Command("profiles"), flags=ADMIN_FLAGS)
+async def list_profiles(message: types.Message) -> None:
+    records = profiler.slowest()
+    if not records:
+        await message.answer("Профилей медленных апдейтов пока нет.")
+        return
+
+    lines = ["🐢 Самые медленные апдейты:"]
+    for number, record in enumerate(records, start=1):
+        created_at = format_timestamp(int(record.created_at))
+        lines.append(f"{number}. {record.duration * 1000:.0f} мс — {record.name} ({created_at})")
+    lines.append("\nОтправьте /profile <номер>, чтобы получить .prof файл.")
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("profile"), flags=ADMIN_FLAGS)
+async def send_profile(message: types.Message, command: CommandObject) -> None:
+    records = profiler.slowest()
+    try:
+        record = records[int(command.args or "1") - 1]
+    except (ValueError, IndexError):
+        await message.answer("Профиль с таким номером не найден. Список: /profiles")
+        return
+
+    document = types.BufferedInputFile(record.data, filename=f"update-{record.trace_id or record.sequence}.prof")
+    await message.answer_document(
+        document,
+        caption=(
+            f"{record.name}: {record.duration * 1000:.0f} мс\n"
+            "Открыть: snakeviz, или flameprof для флеймграфа."
+        ),
+    )
+
+
+def _format_size(size: float) -> str:
+    for unit in ("Б", "КБ", "МБ"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} ГБ"
+
+
+@router.message(Command("memory"), flags=ADMIN_FLAGS)
+async def show_memory(message: types.Message) -> None:
+    lines = ["🧠 Память хранилищ процесса:"]
+    # Walking the stores takes a while when they are large; keep it off the event loop.
+    for usage in await asyncio.to_thread(memory.usage):
+        lines.append(f"• {usage.name}: {usage.entries} записей, ~{_format_size(usage.size)}")
+    await message.answer("\n".join(lines))
+
+
+@router.message(Command("memory_diff"), flags=ADMIN_FLAGS)
+async def show_memory_diff(message: types.Message) -> None:
+    diff = memory.snapshot_diff(frames=settings.tracemalloc_frames or 1)
+    if diff is None:
+        await message.answer(
+            "📸 Снимок памяти сохранён (tracemalloc запущен).\n"
+            "Повторите /memory_diff позже, чтобы увидеть прирост."
+        )
+        return
+
+    lines = ["📈 Прирост памяти с прошлого снимка:"]
+    for stat in diff:
+        frame = stat.traceback[0]
+        lines.append(
+            f"• {'/'.join(frame.filename.rsplit('/', 2)[-2:])}:{frame.lineno} "
+            f"{_format_size(stat.size_diff)} ({stat.count_diff:+d} объектов)"
+        )
+    await message.answer("\n".join(lines))
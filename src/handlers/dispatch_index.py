@@ -0,0 +1,153 @@
+from typing import Any, Callable, Dict, Optional
+
+from aiogram import Router, types
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.filters import Filter
+
+from src.state.user_state import pending_actions
+
+
+HandlerCallback = Callable[..., Any]
+
+
+class DispatchEntry:
+    __slots__ = ("callback", "flags", "name")
+
+    def __init__(self, callback: HandlerCallback, flags: Optional[Dict[str, Any]] = None) -> None:
+        self.callback = CallableObject(callback)
+        self.flags = flags or {}
+        self.name = callback.__name__
+
+
+class DispatchIndex:
+    """
+    Resolves state-based messages and callback queries with dict lookups.
+
+    Messages are routed by the user's pending action (one entry per user in
+    ``pending_actions``); callbacks by their exact data or by the prefix up to
+    the first ``:``. The cost of resolving an update does not depend on how many
+    handlers are registered.
+    """
+
+    def __init__(self) -> None:
+        self._pending: Dict[str, DispatchEntry] = {}
+        self._callbacks_exact: Dict[str, DispatchEntry] = {}
+        self._callbacks_prefix: Dict[str, DispatchEntry] = {}
+
+    def build_router(self) -> Router:
+        """
+        A router resolving through this index; a fresh one per dispatcher.
+        """
+        router = Router(name="dispatch_index")
+        router.message.register(self._dispatch, PendingActionFilter(self))
+        router.callback_query.register(self._dispatch, CallbackDataFilter(self))
+        return router
+
+    def pending(self, action: str, flags: Optional[Dict[str, Any]] = None) -> Callable[[HandlerCallback], HandlerCallback]:
+        """
+        Register the message handler for users whose pending action is ``action``.
+        """
+
+        def decorator(callback: HandlerCallback) -> HandlerCallback:
+            if action in self._pending:
+                raise ValueError(f"Pending action {action!r} is already registered")
+            self._pending[action] = DispatchEntry(callback, flags)
+            return callback
+
+        return decorator
+
+    def callback(self, data: str, flags: Optional[Dict[str, Any]] = None) -> Callable[[HandlerCallback], HandlerCallback]:
+        """
+        Register a callback query handler. ``data`` ending with ``:`` is a prefix
+        (``"src:"``), anything else must match the callback data exactly.
+        """
+
+        def decorator(callback: HandlerCallback) -> HandlerCallback:
+            if data.endswith(":"):
+                if data.count(":") != 1:
+                    raise ValueError(f"Callback prefix {data!r} must contain a single ':'")
+                table = self._callbacks_prefix
+            else:
+                table = self._callbacks_exact
+            if data in table:
+                raise ValueError(f"Callback data {data!r} is already registered")
+            table[data] = DispatchEntry(callback, flags)
+            return callback
+
+        return decorator
+
+    def resolve_message(self, message: types.Message) -> Optional[DispatchEntry]:
+        if message.from_user is None:
+            return None
+        # Commands are never consumed as free-form input.
+        if message.text and message.text.startswith("/"):
+            return None
+        pending = pending_actions.get(message.from_user.id)
+        if pending is None:
+            return None
+        return self._pending.get(pending["action"])
+
+    def resolve_callback(self, data: Optional[str]) -> Optional[DispatchEntry]:
+        if not data:
+            return None
+        entry = self._callbacks_exact.get(data)
+        if entry is not None:
+            return entry
+        separator = data.find(":")
+        if separator < 0:
+            return None
+        return self._callbacks_prefix.get(data[: separator + 1])
+
+    @staticmethod
+    async def _dispatch(event: types.TelegramObject, dispatch_entry: DispatchEntry, **kwargs: Any) -> Any:
+        return await dispatch_entry.callback.call(event, **kwargs)
+
+
+class PendingActionFilter(Filter):
+    def __init__(self, index: DispatchIndex) -> None:
+        self.index = index
+
+    async def __call__(self, message: types.Message) -> bool | Dict[str, Any]:
+        entry = self.index.resolve_message(message)
+        if entry is None:
+            return False
+        return {"dispatch_entry": entry}
+
+
+class CallbackDataFilter(Filter):
+    def __init__(self, index: DispatchIndex) -> None:
+        self.index = index
+
+    async def __call__(self, callback: types.CallbackQuery) -> bool | Dict[str, Any]:
+        entry = self.index.resolve_callback(callback.data)
+        if entry is None:
+            return False
+        return {"dispatch_entry": entry}
+
+
+def set_pending_action(user_id: int, action: str, **payload: Any) -> None:
+    pending_actions[user_id] = {"action": action, **payload}
+
+
+def get_pending_action(user_id: int) -> Optional[str]:
+    pending = pending_actions.get(user_id)
+    return pending["action"] if pending else None
+
+
+def get_pending_payload(user_id: int) -> Dict[str, Any]:
+    """
+    Extra values stored with the pending action by :func:`set_pending_action`.
+    """
+    pending = pending_actions.get(user_id) or {}
+    return {key: value for key, value in pending.items() if key != "action"}
+
+
+def clear_pending_action(user_id: int, action: Optional[str] = None) -> None:
+    """
+    Drop the user's pending action (only if it is ``action`` when one is given).
+    """
+    if action is None or get_pending_action(user_id) == action:
+        pending_actions.pop(user_id)
+
+
+dispatch_index = DispatchIndex()
@@ -0,0 +1,148 @@
+from typing import Sequence, Tuple
+
+from aiogram import types
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+
+from src.handlers.dispatch_index import (
+    clear_pending_action,
+    dispatch_index,
+    get_pending_payload,
+    set_pending_action,
+)
+from src.handlers.utm_generation import apply_preset, get_utm_sources
+from src.handlers.routing import RouterTemplate
+from src.keyboards.utm_keyboards import build_presets_keyboard, build_sources_keyboard
+from src.services.database import UTMPreset, database
+from src.services.message_editor import edit_message
+from src.services.utm_builder import extract_utm_params
+
+
+router = RouterTemplate("presets")
+
+PRESET_NAME_ACTION = "preset_name"
+MAX_PRESETS = 10
+MAX_PRESET_NAME_LENGTH = 32
+
+
+def _render_presets(presets: Sequence[UTMPreset]) -> Tuple[str, types.InlineKeyboardMarkup]:
+    if not presets:
+        return (
+            "⚡ Пресетов пока нет.\n"
+            "Сгенерируйте ссылку и нажмите «Сохранить как пресет» под результатом.",
+            build_presets_keyboard(presets),
+        )
+    lines = ["⚡ Ваши пресеты:"]
+    for preset in presets:
+        mark = " ⭐ по умолчанию" if preset.is_default else ""
+        lines.append(f"• {preset.name}: {preset.utm_source} / {preset.utm_medium} / {preset.utm_campaign}{mark}")
+    lines.append("")
+    lines.append(
+        "Пресет по умолчанию применяется сразу к каждой присланной ссылке. "
+        "Нажмите на пресет, чтобы назначить или снять его, 🗑 — удалить."
+    )
+    return "\n".join(lines), build_presets_keyboard(presets)
+
+
+@router.message(Command("presets"))
+async def show_presets(message: types.Message) -> None:
+    text, keyboard = _render_presets(database.list_presets(message.from_user.id))
+    await message.answer(text, reply_markup=keyboard)
+
+
+@dispatch_index.callback("presets:")
+async def handle_preset_action(callback: types.CallbackQuery, state: FSMContext) -> None:
+    """
+    Callback data: ``presets:<action>[:<id>]``; ``save`` and ``manual`` sit under a
+    generated link and carry its history id, the other actions a preset id.
+    """
+    user_id = callback.from_user.id
+    _, action, *rest = callback.data.split(":")
+    item_id = int(rest[0]) if rest and rest[0].isdigit() else None
+    data = await state.get_data()
+
+    if action in ("manual", "save"):
+        entry = database.get_history_entry(user_id, item_id) if item_id is not None else None
+        if entry is None:
+            await callback.answer("Ссылка не найдена в истории. Пришлите её заново.", show_alert=True)
+            return
+        if action == "manual":
+            await callback.answer()
+            await state.clear()
+            await state.update_data(base_url=entry["base_url"])
+            await callback.message.answer(
+                "1️⃣ Выберите источник трафика (utm_source):",
+                reply_markup=build_sources_keyboard(get_utm_sources(), database.list_presets(user_id)),
+            )
+            return
+        params = extract_utm_params(entry["utm_url"])
+        tags = {key: params.get(key) for key in ("utm_source", "utm_medium", "utm_campaign")}
+        if not all(tags.values()):
+            await callback.answer("В этой ссылке нет всех трёх меток.", show_alert=True)
+            return
+        await callback.answer()
+        set_pending_action(user_id, PRESET_NAME_ACTION, **tags)
+        await callback.message.answer(
+            f"Как назвать пресет {tags['utm_source']} / {tags['utm_medium']} / {tags['utm_campaign']}?\n"
+            "Отправьте название или «Отмена»."
+        )
+        return
+
+    if action == "apply":
+        preset = database.get_preset(user_id, item_id) if item_id is not None else None
+        if preset is None:
+            await callback.answer("Пресет не найден.", show_alert=True)
+            return
+        if not data.get("base_url"):
+            await callback.answer("Сначала пришлите ссылку.", show_alert=True)
+            return
+        await callback.answer()
+        await apply_preset(state, preset, callback=callback)
+        return
+
+    if action == "default" and item_id is not None:
+        preset = database.get_preset(user_id, item_id)
+        if preset is None:
+            await callback.answer("Пресет не найден.", show_alert=True)
+            return
+        database.set_default_preset(user_id, None if preset.is_default else item_id)
+        await callback.answer("Пресет по умолчанию снят." if preset.is_default else "Пресет назначен по умолчанию.")
+    elif action == "nodefault":
+        database.set_default_preset(user_id, None)
+        await callback.answer("Пресет по умолчанию снят.")
+    elif action == "delete" and item_id is not None:
+        deleted = database.delete_preset(user_id, item_id)
+        await callback.answer("Пресет удалён." if deleted else "Пресет не найден.")
+    else:
+        await callback.answer()
+        return
+
+    text, keyboard = _render_presets(database.list_presets(user_id))
+    await edit_message(callback.message, text, reply_markup=keyboard)
+
+
+@dispatch_index.pending(PRESET_NAME_ACTION)
+async def handle_preset_name(message: types.Message) -> None:
+    user_id = message.from_user.id
+    name = (message.text or "").strip()
+    if name.casefold() == "отмена":
+        clear_pending_action(user_id, PRESET_NAME_ACTION)
+        await message.answer("Сохранение пресета отменено.")
+        return
+    if not name or len(name) > MAX_PRESET_NAME_LENGTH:
+        await message.answer(f"Название должно быть текстом до {MAX_PRESET_NAME_LENGTH} символов. Попробуйте ещё раз.")
+        return
+
+    presets = database.list_presets(user_id)
+    if len(presets) >= MAX_PRESETS and all(preset.name != name for preset in presets):
+        clear_pending_action(user_id, PRESET_NAME_ACTION)
+        await message.answer(f"❌ Можно сохранить не больше {MAX_PRESETS} пресетов. Удалите лишние в /presets.")
+        return
+
+    tags = get_pending_payload(user_id)
+    clear_pending_action(user_id, PRESET_NAME_ACTION)
+    database.save_preset(user_id, name, tags["utm_source"], tags["utm_medium"], tags["utm_campaign"])
+    await message.answer(
+        f"✅ Пресет «{name}» сохранён. Он появится над списком источников для следующей ссылки; "
+        "в /presets его можно сделать пресетом по умолчанию."
+    )
@@ -0,0 +1,40 @@
+from typing import Any, Callable, List, Tuple
+
+from aiogram import Router
+
+
+HandlerCallback = Callable[..., Any]
+
+
+class RouterTemplate:
+    """
+    Collects handler registrations at import time and builds a fresh aiogram
+    ``Router`` from them for every dispatcher.
+
+    An aiogram router can belong to one dispatcher only, while each
+    :class:`src.app.Application` builds its own. Handlers are declared with the
+    usual decorators (``@router.message(...)``, ``@router.callback_query(...)``).
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._registrations: List[Tuple[str, HandlerCallback, Tuple[Any, ...], dict]] = []
+
+    def _register(self, event_name: str, *filters: Any, **kwargs: Any) -> Callable[[HandlerCallback], HandlerCallback]:
+        def decorator(callback: HandlerCallback) -> HandlerCallback:
+            self._registrations.append((event_name, callback, filters, kwargs))
+            return callback
+
+        return decorator
+
+    def message(self, *filters: Any, **kwargs: Any) -> Callable[[HandlerCallback], HandlerCallback]:
+        return self._register("message", *filters, **kwargs)
+
+    def callback_query(self, *filters: Any, **kwargs: Any) -> Callable[[HandlerCallback], HandlerCallback]:
+        return self._register("callback_query", *filters, **kwargs)
+
+    def build(self) -> Router:
+        router = Router(name=self.name)
+        for event_name, callback, filters, kwargs in self._registrations:
+            router.observers[event_name].register(callback, *filters, **kwargs)
+        return router
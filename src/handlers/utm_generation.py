@@ -1,12 +1,14 @@
 import datetime
 import logging
-from typing import Optional, Sequence, Tuple, Dict
+from typing import Collection, Optional, Sequence, Tuple, Dict
 
-from aiogram import F, Router, types
+from aiogram import F, types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
 
+from src.handlers.dispatch_index import dispatch_index
+from src.handlers.routing import RouterTemplate
+from src.keyboards.callback_codec import CatalogEntry, decode_catalog_entry
 from src.keyboards.utm_keyboards import (
     build_campaign_category_keyboard,
     build_campaign_keyboard,
@@ -14,15 +16,19 @@ from src.keyboards.utm_keyboards import (
     build_manual_content_confirm_keyboard,
     build_medium_keyboard,
     build_other_sources_keyboard,
+    build_result_keyboard,
     build_sources_keyboard,
 )
 from src.services.utm_builder import build_utm_url
-from src.services.utm_manager import utm_manager
-from src.services.database import database
-from src.utils.utm import build_utm_content_with_date, extract_action_slug
+from src.services.utm_manager import VALUE_KINDS, utm_manager
+from src.services.database import UTMPreset, database
+from src.services.message_editor import edit_message
+from src.utils.formatting import format_timestamp
+from src.utils.quick_link import QuickLinkError, is_quick_link, parse_quick_link
+from src.utils.utm import build_link_key, build_utm_content_with_date, extract_action_slug
 
 logger = logging.getLogger(__name__)
-router = Router()
+router = RouterTemplate("utm_generation")
 
 
 class UTMGenerationStates(StatesGroup):
@@ -67,13 +73,31 @@ def get_utm_campaigns(group: str) -> Sequence[Tuple[str, str]]:
         return []
     return utm_manager.get_category_data(category_key)
 
+async def _catalog_entry(callback: types.CallbackQuery, category_keys: Collection[str]) -> Optional[CatalogEntry]:
+    entry = decode_catalog_entry(callback.data, category_keys)
+    if entry is None:
+        await callback.answer(
+            "Кнопка устарела: список меток изменился. Пришлите ссылку заново.", show_alert=True
+        )
+    return entry
+
 # --- Обработчики процесса генерации UTM ---
 
 @router.message(F.text.regexp(r"^https?://"))
 async def handle_base_url(message: types.Message, state: FSMContext) -> None:
+    user_id = message.from_user.id
+    if is_quick_link(message.text):
+        await handle_quick_link(message, state)
+        return
+
     await state.clear()
     await state.update_data(base_url=message.text.strip())
-    logger.info("Received base URL: %s", message.text.strip())
+    logger.debug("Received base URL: %s", message.text.strip())
+
+    default_preset = database.get_default_preset(user_id)
+    if default_preset is not None:
+        await apply_preset(state, default_preset, message=message)
+        return
 
     sources = get_utm_sources()
     if not sources:
@@ -82,11 +106,59 @@ async def handle_base_url(message: types.Message, state: FSMContext) -> None:
 
     await message.answer(
         "1️⃣ Выберите источник трафика (utm_source):",
-        reply_markup=build_sources_keyboard(sources),
+        reply_markup=build_sources_keyboard(sources, database.list_presets(user_id)),
+    )
+
+
+async def handle_quick_link(message: types.Message, state: FSMContext) -> None:
+    """
+    ``<url> src=vk med=zakup camp=kazan [date=YYYY-MM-DD]`` (or the values in that
+    order): the link is sent right away, without the keyboard steps.
+    """
+    try:
+        quick = parse_quick_link(message.text, utm_manager)
+    except QuickLinkError as exc:
+        await message.answer(
+            "❌ Не удалось собрать ссылку:\n"
+            + "\n".join(f"• {problem}" for problem in exc.problems)
+            + "\n\nФормат: ссылка src=… med=… camp=… [date=YYYY-MM-DD] или значения через пробел в том же порядке."
+        )
+        return
+
+    await send_generated_link(
+        state,
+        message.from_user.id,
+        base_url=quick.base_url,
+        utm_source=quick.utm_source,
+        utm_medium=quick.utm_medium,
+        utm_campaign=quick.utm_campaign,
+        utm_content_manual=quick.utm_content,
+        date_for_utm=quick.date,
+        message=message,
     )
 
 
-@router.callback_query(F.data == "srcgrp:other")
+async def apply_preset(
+    state: FSMContext,
+    preset: UTMPreset,
+    message: Optional[types.Message] = None,
+    callback: Optional[types.CallbackQuery] = None,
+) -> None:
+    """
+    Generate the link for the URL in ``state`` with the preset's tags, skipping the selection steps.
+    """
+    await state.update_data(
+        utm_source=preset.utm_source,
+        utm_medium=preset.utm_medium,
+        utm_campaign=preset.utm_campaign,
+        utm_content=None,
+        date_for_utm=None,
+        preset_name=preset.name,
+    )
+    await generate_short_link(state, message=message, callback=callback)
+
+
+@dispatch_index.callback("srcgrp:other")
 async def open_other_sources(callback: types.CallbackQuery) -> None:
     other_sources = get_utm_other_sources()
     if not other_sources:
@@ -94,55 +166,65 @@ async def open_other_sources(callback: types.CallbackQuery) -> None:
         return
 
     await callback.answer()
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         "1️⃣ Выберите источник из раздела «Другое»:",
         reply_markup=build_other_sources_keyboard(other_sources),
     )
 
 
-@router.callback_query(F.data.startswith("src:"))
+@dispatch_index.callback("src:")
 async def select_source(callback: types.CallbackQuery, state: FSMContext) -> None:
-    source_val = callback.data.split(":", 1)[1]
+    entry = await _catalog_entry(callback, VALUE_KINDS["source"])
+    if entry is None:
+        return
+    source_val = entry.value
     await state.update_data(utm_source=source_val)
-    logger.info("Selected utm_source: %s", source_val)
+    logger.debug("Selected utm_source: %s", source_val)
 
     await callback.answer()
     
     mediums = get_utm_mediums()
     if not mediums:
-        await callback.message.edit_text("❌ Список utm_medium пуст. Добавьте данные через /manage.")
+        await edit_message(callback.message, "❌ Список utm_medium пуст. Добавьте данные через /manage.")
         return
 
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         f"Источник: {source_val}\n\n2️⃣ Выберите тип трафика (utm_medium):",
         reply_markup=build_medium_keyboard(mediums),
     )
 
 
-@router.callback_query(F.data.startswith("med:"))
+@dispatch_index.callback("med:")
 async def select_medium(callback: types.CallbackQuery, state: FSMContext) -> None:
-    medium_val = callback.data.split(":", 1)[1]
+    entry = await _catalog_entry(callback, VALUE_KINDS["medium"])
+    if entry is None:
+        return
+    medium_val = entry.value
     await state.update_data(utm_medium=medium_val)
-    logger.info("Selected utm_medium: %s", medium_val)
+    logger.debug("Selected utm_medium: %s", medium_val)
 
     await callback.answer()
     data = await state.get_data()
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         f"Источник: {data.get('utm_source')}\nТип: {medium_val}\n\n3️⃣ Выберите категорию кампании (utm_campaign):",
         reply_markup=build_campaign_category_keyboard(CAMPAIGN_CATEGORIES),
     )
 
-@router.callback_query(F.data == "select_category:campaign")
+@dispatch_index.callback("select_category:campaign")
 async def select_campaign_main_category(callback: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         f"Источник: {data.get('utm_source')}\nТип: {data.get('utm_medium')}\n\n3️⃣ Выберите категорию кампании (utm_campaign):",
         reply_markup=build_campaign_category_keyboard(CAMPAIGN_CATEGORIES),
     )
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("select_campaign_category:"))
+@dispatch_index.callback("select_campaign_category:")
 async def select_campaign_category(callback: types.CallbackQuery, state: FSMContext) -> None:
     category_key = callback.data.split(":", 1)[1]
     campaigns = get_utm_campaigns(category_key)
@@ -152,12 +234,13 @@ async def select_campaign_category(callback: types.CallbackQuery, state: FSMCont
 
     await callback.answer()
     data = await state.get_data()
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         f"Источник: {data.get('utm_source')}\nТип: {data.get('utm_medium')}\n\n4️⃣ Выберите кампанию:",
         reply_markup=build_campaign_keyboard(campaigns, category_key, page=1),
     )
 
-@router.callback_query(F.data.startswith("select_campaign_page:"))
+@dispatch_index.callback("select_campaign_page:")
 async def select_campaign_page(callback: types.CallbackQuery, state: FSMContext):
     _, category_key, page_str = callback.data.split(":", 2)
     page = int(page_str)
@@ -168,27 +251,32 @@ async def select_campaign_page(callback: types.CallbackQuery, state: FSMContext)
 
     await callback.answer()
     data = await state.get_data()
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         f"Источник: {data.get('utm_source')}\nТип: {data.get('utm_medium')}\n\n4️⃣ Выберите кампанию:",
         reply_markup=build_campaign_keyboard(campaigns, category_key, page=page),
     )
 
 
-@router.callback_query(F.data.startswith("select_item:campaign:"))
+@dispatch_index.callback("select_item:")
 async def select_campaign(callback: types.CallbackQuery, state: FSMContext) -> None:
-    campaign_val = callback.data.split(":", 2)[2]
+    entry = await _catalog_entry(callback, CAMPAIGN_GROUPS_MAP.values())
+    if entry is None:
+        return
+    campaign_val = entry.value
     await state.update_data(utm_campaign=campaign_val)
-    logger.info("Selected utm_campaign: %s", campaign_val)
+    logger.debug("Selected utm_campaign: %s", campaign_val)
 
     await callback.answer()
     data = await state.get_data()
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         f"Источник: {data.get('utm_source')}\nТип: {data.get('utm_medium')}\nКампания: {campaign_val}\n\n5️⃣ Добавить дату в utm_content?",
         reply_markup=build_date_choice_keyboard(),
     )
 
 
-@router.callback_query(F.data.startswith("adddate:"))
+@dispatch_index.callback("adddate:")
 async def add_date_choice(callback: types.CallbackQuery, state: FSMContext) -> None:
     choice = callback.data.split(":", 1)[1]
     await state.update_data(awaiting_date=False, awaiting_content=False)
@@ -254,7 +342,7 @@ async def handle_manual_content(message: types.Message, state: FSMContext) -> No
     )
 
 
-@router.callback_query(F.data == "content:confirm")
+@dispatch_index.callback("content:confirm")
 async def confirm_manual_content(callback: types.CallbackQuery, state: FSMContext) -> None:
     data = await state.get_data()
     if not data.get("utm_content"):
@@ -265,13 +353,14 @@ async def confirm_manual_content(callback: types.CallbackQuery, state: FSMContex
     await generate_short_link(state, callback=callback)
 
 
-@router.callback_query(F.data == "content:back")
+@dispatch_index.callback("content:back")
 async def back_from_manual_content(callback: types.CallbackQuery, state: FSMContext) -> None:
     await state.set_state(None)
     await state.update_data(awaiting_content=False, utm_content=None)
     data = await state.get_data()
     await callback.answer()
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         f"Источник: {data.get('utm_source')}\nТип: {data.get('utm_medium')}\nКампания: {data.get('utm_campaign')}\n\n5️⃣ Добавить дату в utm_content?",
         reply_markup=build_date_choice_keyboard(),
     )
@@ -285,14 +374,39 @@ async def generate_short_link(
 ) -> None:
     user_id = callback.from_user.id if callback else message.from_user.id
     data = await state.get_data()
-    
-    base_url = data.get("base_url", "")
-    utm_source = data.get("utm_source")
-    utm_medium = data.get("utm_medium")
-    utm_campaign = data.get("utm_campaign")
-    utm_content_manual = data.get("utm_content")
-    date_for_utm = data.get("date_for_utm")
+    await send_generated_link(
+        state,
+        user_id,
+        base_url=data.get("base_url", ""),
+        utm_source=data.get("utm_source"),
+        utm_medium=data.get("utm_medium"),
+        utm_campaign=data.get("utm_campaign"),
+        utm_content_manual=data.get("utm_content"),
+        date_for_utm=data.get("date_for_utm"),
+        preset_name=data.get("preset_name"),
+        message=message,
+        callback=callback,
+    )
+
+
+async def send_generated_link(
+    state: FSMContext,
+    user_id: int,
+    base_url: str,
+    utm_source: Optional[str],
+    utm_medium: Optional[str],
+    utm_campaign: Optional[str],
+    utm_content_manual: Optional[str] = None,
+    date_for_utm: Optional[str] = None,
+    preset_name: Optional[str] = None,
+    message: Optional[types.Message] = None,
+    callback: Optional[types.CallbackQuery] = None,
+) -> None:
+    """
+    Build the link, record it in the history and reply with the result.
 
+    The buttons under the result refer to the history row, so the flow state is cleared.
+    """
     if utm_content_manual:
         utm_content = utm_content_manual
     else:
@@ -300,20 +414,22 @@ async def generate_short_link(
         utm_content = build_utm_content_with_date(base_slug, date_for_utm)
 
     full_url = build_utm_url(base_url, utm_source, utm_medium, utm_campaign, utm_content)
-    logger.info("Full UTM URL for user %s: %s", user_id, full_url)
+    logger.debug("Full UTM URL for user %s: %s", user_id, full_url)
 
-    database.add_history(user_id, base_url, full_url, full_url)
+    link_key = build_link_key(base_url, utm_source, utm_medium, utm_campaign, utm_content)
+    history_id, first_generated_at = database.add_history(user_id, base_url, full_url, full_url, link_key=link_key)
 
     result_text = (
         f"✅ Результаты генерации ссылок:\n\n"
         f"🔗 Исходная:\n{base_url}\n\n"
         f"🧩 С UTM:\n{full_url}"
     )
-    admin_keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="Открыть API Горбилета", web_app=WebAppInfo(url="https://api.gorbilet.com/v2/admin/"))]
-    ])
+    if first_generated_at:
+        result_text += f"\n\n♻️ Такая ссылка уже генерировалась {format_timestamp(first_generated_at)}"
+    if preset_name:
+        result_text += f"\n\n⚡ Пресет: {preset_name}"
 
-    await _reply(message, callback, result_text, reply_markup=admin_keyboard)
+    await _reply(message, callback, result_text, reply_markup=build_result_keyboard(history_id, from_preset=bool(preset_name)))
     await state.clear()
 
 
@@ -332,27 +448,30 @@ async def _reply(
         await message.answer(text, **kwargs)
 
 
-@router.callback_query(F.data.startswith("back:"))
+@dispatch_index.callback("back:")
 async def go_back(callback: types.CallbackQuery, state: FSMContext) -> None:
     target = callback.data.split(":", 1)[1]
     await callback.answer()
 
     if target == "source":
         sources = get_utm_sources()
-        await callback.message.edit_text(
+        await edit_message(
+            callback.message,
             "1️⃣ Выберите источник трафика (utm_source):",
-            reply_markup=build_sources_keyboard(sources),
+            reply_markup=build_sources_keyboard(sources, database.list_presets(callback.from_user.id)),
         )
     elif target == "medium":
         mediums = get_utm_mediums()
         data = await state.get_data()
-        await callback.message.edit_text(
+        await edit_message(
+            callback.message,
             f"Источник: {data.get('utm_source')}\n\n2️⃣ Выберите тип трафика (utm_medium):",
             reply_markup=build_medium_keyboard(mediums),
         )
     elif target == "campaign":
         data = await state.get_data()
-        await callback.message.edit_text(
+        await edit_message(
+            callback.message,
             f"Источник: {data.get('utm_source')}\nТип: {data.get('utm_medium')}\n\n3️⃣ Выберите категорию кампании (utm_campaign):",
             reply_markup=build_campaign_category_keyboard(CAMPAIGN_CATEGORIES),
         )
@@ -1,22 +1,32 @@
 import re
-from aiogram import F, Router, types
+from aiogram import F, types
 from aiogram.filters import Command
 
 # Импортируем глобальный экземпляр, как и раньше
 from src.services.utm_manager import utm_manager 
+from src.services.message_editor import edit_message
 from src.keyboards.utm_keyboards import (
     build_categories_keyboard,
     build_category_management_keyboard,
     build_items_to_delete_keyboard,
     build_view_items_keyboard,
 )
+from src.handlers.dispatch_index import clear_pending_action, dispatch_index, set_pending_action
+from src.handlers.routing import RouterTemplate
+from src.keyboards.callback_codec import CATEGORY_CODES, decode_catalog_entry
 from src.state.user_state import utm_editing_data
 
-router = Router()
+router = RouterTemplate("utm_management")
+
+UTM_NAME_ACTION = "utm_waiting_name"
+UTM_VALUE_ACTION = "utm_waiting_value"
+CANCEL_WORDS = ("отмена", "cancel", "стоп")
 
 # --- Вспомогательные функции для управления состоянием ---
 def _reset_user_state(user_id: int):
     utm_editing_data.pop(user_id, None)
+    clear_pending_action(user_id, UTM_NAME_ACTION)
+    clear_pending_action(user_id, UTM_VALUE_ACTION)
 
 # --- Функции для управления режимом редактирования ---
 async def _exit_utm_mode(user_id: int, message: types.Message, callback: types.CallbackQuery | None = None):
@@ -39,7 +49,7 @@ async def start_utm_management(user_id: int, message: types.Message | None = Non
 
     if callback:
         await callback.answer()
-        await callback.message.edit_text(text, reply_markup=keyboard)
+        await edit_message(callback.message, text, reply_markup=keyboard)
     elif message:
         await message.answer(text, reply_markup=keyboard)
 
@@ -52,13 +62,13 @@ async def cmd_manage_utm(message: types.Message):
 async def cmd_cancel(message: types.Message):
     await _exit_utm_mode(message.from_user.id, message)
 
-@router.message(F.text.lower().in_(["отмена", "cancel", "стоп"]))
+@router.message(F.text.lower().in_(CANCEL_WORDS))
 async def text_cancel(message: types.Message):
     if message.from_user.id in utm_editing_data:
         await _exit_utm_mode(message.from_user.id, message)
 
 # --- Обработчики колбеков (кнопок) ---
-@router.callback_query(F.data.startswith("manage_category:"))
+@dispatch_index.callback("manage_category:")
 async def cb_manage_category(callback: types.CallbackQuery):
     user_id = callback.from_user.id
     category_key = callback.data.split(":", 1)[1]
@@ -66,15 +76,16 @@ async def cb_manage_category(callback: types.CallbackQuery):
     categories = utm_manager.get_all_categories()
     category_name = categories[category_key][0]
 
-    utm_editing_data[user_id] = {"category": category_key, "step": "choosing_action"}
+    utm_editing_data[user_id] = {"category": category_key}
 
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         f"Выбрана категория: {category_name}\n\nВыберите действие:",
         reply_markup=build_category_management_keyboard(category_key)
     )
     await callback.answer()
 
-@router.callback_query(F.data.startswith("view_items:"))
+@dispatch_index.callback("view_items:")
 async def cb_view_items(callback: types.CallbackQuery):
     long_category_key = callback.data.split(":", 1)[1]
     categories = utm_manager.get_all_categories()
@@ -89,10 +100,10 @@ async def cb_view_items(callback: types.CallbackQuery):
     text = f"Просмотр меток в категории: {category_name}\n\n"
     text += "\n".join([f"- {name} ({value})" for name, value in items])
 
-    await callback.message.edit_text(text, reply_markup=build_view_items_keyboard(long_category_key))
+    await edit_message(callback.message, text, reply_markup=build_view_items_keyboard(long_category_key))
     await callback.answer()
 
-@router.callback_query(F.data.startswith("add_item_prompt:"))
+@dispatch_index.callback("add_item_prompt:")
 async def cb_add_item_prompt(callback: types.CallbackQuery):
     user_id = callback.from_user.id
     long_category_key = callback.data.split(":", 1)[1]
@@ -100,13 +111,14 @@ async def cb_add_item_prompt(callback: types.CallbackQuery):
     categories = utm_manager.get_all_categories()
     _, short_category_key = categories[long_category_key]
 
-    utm_editing_data[user_id] = {"category": short_category_key, "step": "waiting_name"}
+    utm_editing_data[user_id] = {"category": short_category_key}
+    set_pending_action(user_id, UTM_NAME_ACTION)
 
-    await callback.message.edit_text("Введите название новой метки (например: 'Новый источник'):")
+    await edit_message(callback.message, "Введите название новой метки (например: 'Новый источник'):")
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("delete_item_prompt:"))
+@dispatch_index.callback("delete_item_prompt:")
 async def cb_delete_item_prompt(callback: types.CallbackQuery):
     long_category_key = callback.data.split(":", 1)[1]
     categories = utm_manager.get_all_categories()
@@ -117,27 +129,32 @@ async def cb_delete_item_prompt(callback: types.CallbackQuery):
         await callback.answer("В этой категории нет меток для удаления.", show_alert=True)
         return
 
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         "Выберите метку для удаления:",
         reply_markup=build_items_to_delete_keyboard(long_category_key, items)
     )
     await callback.answer()
 
-@router.callback_query(F.data.startswith("delete_item:"))
+@dispatch_index.callback("delete_item:")
 async def cb_delete_item(callback: types.CallbackQuery):
-    _, long_category_key, value = callback.data.split(":", 2)
-    categories = utm_manager.get_all_categories()
-    _, short_category_key = categories[long_category_key]
+    entry = decode_catalog_entry(callback.data, CATEGORY_CODES)
+    if entry is None:
+        await callback.answer("Список меток изменился. Откройте категорию заново.", show_alert=True)
+        return
+    short_category_key = entry.category_key
+    long_category_key = f"utm_{short_category_key}"
 
-    if utm_manager.delete_item(short_category_key, value):
+    if utm_manager.delete_item(short_category_key, entry.value):
         await callback.answer("✅ Метка удалена!", show_alert=True)
         utm_manager.load_data() # Перезагружаем данные после удаления
         items = utm_manager.get_category_data(short_category_key)
         if not items:
-            await callback.message.edit_text("Все метки в этой категории были удалены.")
+            await edit_message(callback.message, "Все метки в этой категории были удалены.")
             await start_utm_management(callback.from_user.id, callback.message)
         else:
-            await callback.message.edit_text(
+            await edit_message(
+                callback.message,
                 "Выберите метку для удаления:",
                 reply_markup=build_items_to_delete_keyboard(long_category_key, items)
             )
@@ -146,30 +163,39 @@ async def cb_delete_item(callback: types.CallbackQuery):
 
 
 # --- Обработчики текстовых сообщений в режиме редактирования ---
-@router.message(lambda msg: utm_editing_data.get(msg.from_user.id, {}).get("step") == "waiting_name")
+@dispatch_index.pending(UTM_NAME_ACTION)
 async def process_utm_name(message: types.Message):
     user_id = message.from_user.id
+    if message.text and message.text.strip().lower() in CANCEL_WORDS:
+        await _exit_utm_mode(user_id, message)
+        return
     if not message.text or not message.text.strip():
         await message.answer("Название не может быть пустым. Попробуйте снова.")
         return
     
-    utm_editing_data[user_id]["name"] = message.text.strip()
-    utm_editing_data[user_id]["step"] = "waiting_value"
+    editing = utm_editing_data.update(user_id, name=message.text.strip())
+    set_pending_action(user_id, UTM_VALUE_ACTION)
     await message.answer(
-        f"Отлично! Название: '{utm_editing_data[user_id]['name']}'\n\n"
+        f"Отлично! Название: '{editing['name']}'\n\n"
         f"Теперь введите значение (латиница, цифры, _, -):"
     )
 
-@router.message(lambda msg: utm_editing_data.get(msg.from_user.id, {}).get("step") == "waiting_value")
+@dispatch_index.pending(UTM_VALUE_ACTION)
 async def process_utm_value(message: types.Message):
     user_id = message.from_user.id
     value = message.text.strip() if message.text else ""
+    if value.lower() in CANCEL_WORDS:
+        await _exit_utm_mode(user_id, message)
+        return
     
     if not re.match(r"^[A-Za-z0-9._-]+$", value):
         await message.answer("Неверный формат! Только латиница, цифры и символы '._-'. Попробуйте снова.")
         return
 
-    state = utm_editing_data[user_id]
+    state = utm_editing_data.get(user_id)
+    if not state:
+        await _exit_utm_mode(user_id, message)
+        return
     
     if utm_manager.add_item(state["category"], state["name"], value):
         await message.answer(f"✅ Успешно добавлено!\nНазвание: {state['name']}\nЗначение: {value}")
@@ -180,11 +206,11 @@ async def process_utm_value(message: types.Message):
     await start_utm_management(user_id, message)
 
 # --- Навигационные колбеки ---
-@router.callback_query(F.data == "back_to_categories")
+@dispatch_index.callback("back_to_categories")
 async def cb_back_to_categories(callback: types.CallbackQuery):
     await start_utm_management(callback.from_user.id, callback=callback)
 
-@router.callback_query(F.data.startswith("back_to_manage:"))
+@dispatch_index.callback("back_to_manage:")
 async def cb_back_to_manage_category(callback: types.CallbackQuery):
     # Извлекаем ключ категории из callback.data
     long_category_key = callback.data.split(":", 1)[1]
@@ -193,14 +219,15 @@ async def cb_back_to_manage_category(callback: types.CallbackQuery):
     categories = utm_manager.get_all_categories()
     category_name = categories[long_category_key][0]
 
-    utm_editing_data[callback.from_user.id] = {"category": long_category_key, "step": "choosing_action"}
+    utm_editing_data[callback.from_user.id] = {"category": long_category_key}
 
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         f"Выбрана категория: {category_name}\n\nВыберите действие:",
         reply_markup=build_category_management_keyboard(long_category_key)
     )
     await callback.answer()
 
-@router.callback_query(F.data == "exit_manage")
+@dispatch_index.callback("exit_manage")
 async def cb_exit_manage(callback: types.CallbackQuery):
     await _exit_utm_mode(callback.from_user.id, callback.message, callback)
@@ -0,0 +1,66 @@
+"""
+Compact callback data for buttons that carry a catalog entry.
+
+The data is ``<prefix>:<version>:<category code>:<entry id>[:<value>]``. The
+entry id is the entry's position in its catalog category, so the data stays a
+few dozen bytes whatever the value, well under Telegram's 64-byte limit; the
+value itself is appended when it still fits, and then must match on decode. Positions move
+when entries are deleted, so the data also carries the first characters of
+the category's version (``utm_manager.category_version``); a button built from
+another version of its category is reported as stale instead of selecting the
+wrong entry, while edits of other categories leave it valid.
+"""
+from typing import Collection, NamedTuple, Optional
+
+from src.services.utm_manager import utm_manager
+
+
+VERSION_LENGTH = 8
+CALLBACK_DATA_LIMIT = 64
+CATEGORY_CODES = {
+    "source": "s",
+    "source_other": "o",
+    "medium": "m",
+    "campaign_spb": "p",
+    "campaign_msk": "k",
+    "campaign_regions": "r",
+    "campaign_foreign": "f",
+}
+_CODE_CATEGORIES = {code: category_key for category_key, code in CATEGORY_CODES.items()}
+
+
+class CatalogEntry(NamedTuple):
+    category_key: str
+    name: str
+    value: str
+
+
+def encode_catalog_entry(prefix: str, category_key: str, value: str) -> str:
+    entry_id = utm_manager.entry_id(category_key, value)
+    if entry_id is None:
+        raise KeyError(f"{value!r} is not in catalog category {category_key!r}")
+    version = utm_manager.category_version(category_key)[:VERSION_LENGTH]
+    data = f"{prefix}:{version}:{CATEGORY_CODES[category_key]}:{entry_id}"
+    with_value = f"{data}:{value}"
+    return with_value if len(with_value.encode("utf-8")) <= CALLBACK_DATA_LIMIT else data
+
+
+def decode_catalog_entry(data: str, category_keys: Collection[str]) -> Optional[CatalogEntry]:
+    """
+    The entry a button points at, or ``None`` when the data is stale, malformed
+    or names a category outside ``category_keys`` (those valid for its prefix).
+    """
+    try:
+        _, version, code, entry_id, *value = data.split(":", 4)
+        category_key = _CODE_CATEGORIES[code]
+        position = int(entry_id)
+    except (KeyError, ValueError):
+        return None
+    if category_key not in category_keys:
+        return None
+    if version != utm_manager.category_version(category_key)[:VERSION_LENGTH]:
+        return None
+    entry = utm_manager.entry_by_id(category_key, position)
+    if entry is None or (value and value[0] != entry[1]):
+        return None
+    return CatalogEntry(category_key, *entry)
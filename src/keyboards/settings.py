@@ -1,6 +1,35 @@
+from typing import Optional, Tuple
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 
+UserCursor = Tuple[int, int]
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def _base36(number: int) -> str:
+    digits = ""
+    while True:
+        number, remainder = divmod(number, 36)
+        digits = _DIGITS[remainder] + digits
+        if not number:
+            return digits
+
+
+def encode_user_cursor(cursor: UserCursor) -> str:
+    # Base 36 keeps "users:a:n:<cursor>:<32-char search>" within the 64-byte callback limit.
+    timestamp, user_id = cursor
+    return f"{_base36(timestamp)}.{_base36(user_id)}"
+
+
+def decode_user_cursor(value: str) -> Optional[UserCursor]:
+    timestamp, _, user_id = value.partition(".")
+    try:
+        return int(timestamp, 36), int(user_id, 36)
+    except ValueError:
+        return None
+
+
 def build_settings_keyboard() -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton(text="🔐 Изменить пароль бота", callback_data="settings:change_password")],
@@ -10,3 +39,44 @@ def build_settings_keyboard() -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text="❌ Закрыть", callback_data="settings:exit")],
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def build_users_keyboard(
+    banned: bool,
+    first: Optional[UserCursor],
+    last: Optional[UserCursor],
+    has_newer: bool,
+    has_older: bool,
+    search: str = "",
+    filtered: bool = False,
+) -> InlineKeyboardMarkup:
+    """
+    Navigation of the user list. Callback data: ``users:<a|b>:<action>:<cursor>:<search>``,
+    where the cursor is the (timestamp, user id) key of the page's edge row and the
+    action is ``f`` (first page), ``n`` (older than the cursor), ``p`` (newer than
+    the cursor) or ``s`` (ask for a search term). ``filtered`` offers the search
+    reset for lists narrowed other than by ``search`` (by date).
+    """
+    kind = "b" if banned else "a"
+    other = "a" if banned else "b"
+    buttons = []
+    navigation = []
+    if has_newer:
+        navigation.append(InlineKeyboardButton(text="◀️ Назад", callback_data=f"users:{kind}:p:{encode_user_cursor(first)}:{search}"))
+    if has_older:
+        navigation.append(InlineKeyboardButton(text="Вперёд ▶️", callback_data=f"users:{kind}:n:{encode_user_cursor(last)}:{search}"))
+    if navigation:
+        buttons.append(navigation)
+    buttons.append(
+        [
+            InlineKeyboardButton(
+                text="🚫 Заблокированные" if not banned else "✅ Активные",
+                callback_data=f"users:{other}:f::{search}",
+            )
+        ]
+    )
+    search_row = [InlineKeyboardButton(text="🔍 Поиск по username или дате", callback_data=f"users:{kind}:s::")]
+    if search or filtered:
+        search_row.append(InlineKeyboardButton(text="✖️ Сбросить поиск", callback_data=f"users:{kind}:f::"))
+    buttons.append(search_row)
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
@@ -2,6 +2,10 @@ from aiogram import types
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from typing import List, Tuple, Dict, Sequence
 
+from src.keyboards.callback_codec import encode_catalog_entry
+from src.services.database import UTMPreset
+from src.services.utm_manager import utm_manager
+
 
 # --- Клавиатуры для генератора UTM ---
 
@@ -18,9 +22,15 @@ def build_main_keyboard():
     builder.adjust(2, 2, 2, 1)
     return builder.as_markup()
 
-def build_sources_keyboard(sources: Sequence[Tuple[str, str]]) -> types.InlineKeyboardMarkup:
+def build_sources_keyboard(
+    sources: Sequence[Tuple[str, str]], presets: Sequence[UTMPreset] = ()
+) -> types.InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
+    # Пресеты пользователя — генерация в одно нажатие
+    for preset in presets:
+        builder.row(types.InlineKeyboardButton(text=f"⚡ {preset.name}", callback_data=f"presets:apply:{preset.id}"))
+
     # Отделяем Telegram от остальных
     telegram_source = None
     other_sources_list = []
@@ -32,11 +42,11 @@ def build_sources_keyboard(sources: Sequence[Tuple[str, str]]) -> types.InlineKe
 
     # Добавляем кнопку Telegram на отдельную строку
     if telegram_source:
-        builder.button(text=telegram_source[0], callback_data=f"src:{telegram_source[1]}")
+        builder.button(text=telegram_source[0], callback_data=encode_catalog_entry("src", "source", telegram_source[1]))
     
     # Добавляем остальные кнопки
     for name, value in other_sources_list:
-        builder.button(text=name, callback_data=f"src:{value}")
+        builder.button(text=name, callback_data=encode_catalog_entry("src", "source", value))
     
     builder.button(text="Другое...", callback_data="srcgrp:other")
 
@@ -50,14 +60,14 @@ def build_sources_keyboard(sources: Sequence[Tuple[str, str]]) -> types.InlineKe
     if num_other_buttons % 2:
         layout.append(1)
 
-    builder.adjust(*layout)
+    builder.adjust(*([1] * len(presets)), *layout)
     return builder.as_markup()
 
 
 def build_other_sources_keyboard(other_sources: Sequence[Tuple[str, str]]) -> types.InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for name, value in other_sources:
-        builder.button(text=name, callback_data=f"src:{value}")
+        builder.button(text=name, callback_data=encode_catalog_entry("src", "source_other", value))
     builder.adjust(2)
     builder.row(types.InlineKeyboardButton(text="⬅️ Назад", callback_data="back:source"))
     return builder.as_markup()
@@ -66,7 +76,7 @@ def build_other_sources_keyboard(other_sources: Sequence[Tuple[str, str]]) -> ty
 def build_medium_keyboard(mediums: Sequence[Tuple[str, str]]) -> types.InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for name, value in mediums:
-        builder.button(text=name, callback_data=f"med:{value}")
+        builder.button(text=name, callback_data=encode_catalog_entry("med", "medium", value))
     builder.adjust(2)
     builder.row(types.InlineKeyboardButton(text="⬅️ Назад", callback_data="back:source"))
     return builder.as_markup()
@@ -107,7 +117,9 @@ def build_campaign_keyboard(items: List[Tuple[str, str]], category_key: str, pag
             if len(short_name) > 20:
                  short_name = short_name.replace("Всё в ", "")
 
-        builder.button(text=short_name, callback_data=f"select_item:campaign:{value}")
+        builder.button(
+            text=short_name, callback_data=encode_catalog_entry("select_item", f"campaign_{category_key}", value)
+        )
     
     builder.adjust(2)
 
@@ -142,6 +154,34 @@ def build_manual_content_confirm_keyboard() -> types.InlineKeyboardMarkup:
     builder.adjust(1)
     return builder.as_markup()
 
+def build_result_keyboard(history_id: int, from_preset: bool = False) -> types.InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        types.InlineKeyboardButton(
+            text="Открыть API Горбилета", web_app=types.WebAppInfo(url="https://api.gorbilet.com/v2/admin/")
+        )
+    )
+    if from_preset:
+        builder.row(types.InlineKeyboardButton(text="✏️ Выбрать метки вручную", callback_data=f"presets:manual:{history_id}"))
+    else:
+        builder.row(types.InlineKeyboardButton(text="💾 Сохранить как пресет", callback_data=f"presets:save:{history_id}"))
+    return builder.as_markup()
+
+
+# --- Клавиатуры для пресетов ---
+
+def build_presets_keyboard(presets: Sequence[UTMPreset]) -> types.InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for preset in presets:
+        mark = "⭐" if preset.is_default else "☆"
+        builder.row(
+            types.InlineKeyboardButton(text=f"{mark} {preset.name}", callback_data=f"presets:default:{preset.id}"),
+            types.InlineKeyboardButton(text="🗑", callback_data=f"presets:delete:{preset.id}"),
+        )
+    if any(preset.is_default for preset in presets):
+        builder.row(types.InlineKeyboardButton(text="Без пресета по умолчанию", callback_data="presets:nodefault"))
+    return builder.as_markup()
+
 # --- Клавиатуры для управления UTM ---
 
 def build_categories_keyboard(categories: Dict[str, Tuple[str, str]]):
@@ -163,9 +203,12 @@ def build_category_management_keyboard(category_key: str):
 
 def build_items_to_delete_keyboard(category_key: str, items: List[Tuple[str, str]]):
     builder = InlineKeyboardBuilder()
+    _, short_category_key = utm_manager.get_all_categories()[category_key]
     for name, value in items:
         display_name = f"{name} ({value})"
-        builder.button(text=f"❌ {display_name}", callback_data=f"delete_item:{category_key}:{value}")
+        builder.button(
+            text=f"❌ {display_name}", callback_data=encode_catalog_entry("delete_item", short_category_key, value)
+        )
     builder.adjust(1)
     builder.row(types.InlineKeyboardButton(text="⬅️ Назад", callback_data=f"back_to_manage:{category_key}"))
     return builder.as_markup()
@@ -3,9 +3,16 @@ from typing import Any, Awaitable, Callable, Dict
 from aiogram import BaseMiddleware
 from aiogram.types import CallbackQuery, Message, TelegramObject
 
+from src.config import settings
+from src.core.metrics import registry
 from src.services.database import database
 
 
+ACCESS_REJECTIONS = registry.counter(
+    "bot_access_rejections_total", "Updates rejected by access control.", ["reason"]
+)
+
+
 class AccessControlMiddleware(BaseMiddleware):
     def __init__(self) -> None:
         super().__init__()
@@ -23,19 +30,31 @@ class AccessControlMiddleware(BaseMiddleware):
         user_id = from_user.id
 
         if database.is_user_banned(user_id):
+            ACCESS_REJECTIONS.inc(reason="banned")
             await self._notify_banned(event)
             return None
 
-        handler_object = data.get("handler")
-        flags = getattr(handler_object, "flags", {}) if handler_object else {}
+        dispatch_entry = data.get("dispatch_entry")
+        if dispatch_entry is not None:
+            flags = dispatch_entry.flags
+        else:
+            handler_object = data.get("handler")
+            flags = getattr(handler_object, "flags", {}) if handler_object else {}
 
         if not flags.get("auth_required", True):
             return await handler(event, data)
 
         if not database.is_user_authorized(user_id):
+            ACCESS_REJECTIONS.inc(reason="unauthorized")
             await self._prompt_for_password(event)
             return None
 
+        if flags.get("admin_only") and user_id not in settings.admin_user_ids:
+            ACCESS_REJECTIONS.inc(reason="not_admin")
+            if isinstance(event, Message):
+                await event.answer("⛔️ Команда доступна только администраторам.")
+            return None
+
         return await handler(event, data)
 
     async def _notify_banned(self, event: TelegramObject) -> None:
@@ -0,0 +1,99 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramAPIError
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+
+from src.core.metrics import registry
+
+
+UPDATES_TOTAL = registry.counter("bot_updates_total", "Updates received, by update type.", ["type"])
+UPDATE_SECONDS = registry.histogram(
+    "bot_update_seconds", "Time to fully process an update, by update type.", ["type"]
+)
+HANDLER_SECONDS = registry.histogram("bot_handler_seconds", "Handler execution time.", ["handler"])
+HANDLER_ERRORS = registry.counter("bot_handler_errors_total", "Handlers that raised.", ["handler"])
+API_REQUEST_SECONDS = registry.histogram(
+    "bot_api_request_seconds", "Outbound Bot API call latency, by method.", ["method"]
+)
+API_ERRORS = registry.counter(
+    "bot_api_errors_total", "Outbound Bot API calls that failed, by method and error.", ["method", "error"]
+)
+
+
+def handler_name(data: Dict[str, Any]) -> str:
+    """
+    Name of the handler about to run, looking through the dispatch index.
+    """
+    dispatch_entry = data.get("dispatch_entry")
+    if dispatch_entry is not None:
+        return dispatch_entry.name
+    handler_object = data.get("handler")
+    if handler_object is None:
+        return "unknown"
+    return getattr(handler_object.callback, "__name__", "unknown")
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Outer ``update`` middleware: counts updates and times their whole processing.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        update_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        UPDATES_TOTAL.inc(type=update_type)
+        with UPDATE_SECONDS.time(type=update_type):
+            return await handler(event, data)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Inner middleware timing the matched handler.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = handler_name(data)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Session middleware recording latency and failures of Bot API calls.
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        api_method = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramAPIError as exc:
+            API_ERRORS.inc(method=api_method, error=type(exc).__name__)
+            raise
+        finally:
+            API_REQUEST_SECONDS.observe(time.perf_counter() - started, method=api_method)
@@ -0,0 +1,42 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from src.core.profiling import UpdateProfiler
+from src.core.tracing import current_trace
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    """
+    Outer ``update`` middleware feeding updates to an :class:`UpdateProfiler`.
+    """
+
+    def __init__(self, profiler: UpdateProfiler) -> None:
+        self.profiler = profiler
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        profile = self.profiler.start()
+        started = time.perf_counter()
+        try:
+            return await self.profiler.run(profile, handler(event, data))
+        finally:
+            self.profiler.stop(profile, time.perf_counter() - started, _describe(event), data.get("trace_id"))
+
+
+def _describe(event: TelegramObject) -> str:
+    """
+    The handler that ran, taken from the trace when there is one.
+    """
+    trace = current_trace()
+    if trace is not None:
+        for span in trace.spans:
+            if span.name.startswith("handler:"):
+                return span.name
+    return event.event_type if isinstance(event, Update) else type(event).__name__
@@ -0,0 +1,87 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+
+from src.core.tracing import report_trace, span, start_trace
+from src.middlewares.metrics import handler_name
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Outer ``update`` middleware opening a trace for every update.
+
+    Updates slower than ``threshold`` seconds are logged with their span
+    breakdown and exported (see :func:`src.core.tracing.configure_trace_export`).
+    """
+
+    def __init__(self, threshold: float) -> None:
+        self.threshold = threshold
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        update_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        user = data.get("event_from_user")
+        attributes = {
+            "update_id": getattr(event, "update_id", None),
+            "user_id": user.id if user else None,
+        }
+        with start_trace(f"update:{update_type}", **attributes) as trace:
+            data["trace_id"] = trace.trace_id
+            try:
+                return await handler(event, data)
+            finally:
+                report_trace(trace, self.threshold)
+
+
+class MiddlewareSpanMiddleware(BaseMiddleware):
+    """
+    First inner middleware: spans the whole inner chain, so the time of the
+    middlewares themselves is what remains after the handler span.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        with span("middlewares"):
+            return await handler(event, data)
+
+
+class HandlerSpanMiddleware(BaseMiddleware):
+    """
+    Last inner middleware: spans the matched handler.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        with span(f"handler:{handler_name(data)}"):
+            return await handler(event, data)
+
+
+class ApiTracingMiddleware(BaseRequestMiddleware):
+    """
+    Session middleware adding a span for every Bot API call, pacing included.
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        with span(f"api.{method.__api_method__}"):
+            return await make_request(bot, method)
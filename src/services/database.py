@@ -1,12 +1,48 @@
+import logging
 import sqlite3
 import threading
-from datetime import datetime
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Iterable, List, Optional, Tuple
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
 
 from src.config import settings
+from src.core.lazy import lazy
+from src.core.memory import memory
+from src.core.metrics import instrument_methods, registry
+from src.core.tracing import trace_methods
+from src.services.history_cache import RecentHistoryCache
 
 
+logger = logging.getLogger(__name__)
+
+DB_QUERY_SECONDS = registry.histogram(
+    "bot_db_query_seconds", "Time spent in DatabaseManager methods.", ["method"]
+)
+
+
+# banned flag -> (table, timestamp column)
+USER_TABLES = {False: ("users", "authorized_at"), True: ("banned_users", "banned_at")}
+
+
+class UTMPreset(NamedTuple):
+    id: int
+    name: str
+    utm_source: str
+    utm_medium: str
+    utm_campaign: str
+    is_default: bool
+
+
+def _username_condition(prefix: Optional[str]) -> Tuple[str, Tuple]:
+    if not prefix:
+        return "1 = 1", ()
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return "username LIKE ? ESCAPE '\\'", (escaped + "%",)
+
+
+@trace_methods("db")
+@instrument_methods(DB_QUERY_SECONDS)
 class DatabaseManager:
     def __init__(self, db_path: str) -> None:
         self.db_path = Path(db_path)
@@ -15,22 +51,35 @@ class DatabaseManager:
 
         self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
         self._connection.row_factory = sqlite3.Row
+        # WAL lets worker processes read while another one writes.
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
         self._lock = threading.Lock()
+        # Serves "Посмотреть историю" for active users; guarded by ``_lock`` like the connection.
+        self._recent_history = RecentHistoryCache(settings.history_cache_per_user, settings.history_cache_max_bytes)
+        memory.track("recent_history", self, lambda database: database._recent_history._users)
+        # Presets are read on every link a user sends; writes drop the user's entry.
+        self._presets: "OrderedDict[int, Tuple[UTMPreset, ...]]" = OrderedDict()
+        memory.track("utm_presets", self, lambda database: database._presets)
+        self._change_listeners: List[Callable[[int], None]] = []
         self._setup()
 
     def _setup(self) -> None:
+        # Timestamps are INTEGER Unix epoch seconds (UTC); older databases stored ISO text.
         users_table = """
-        CREATE TABLE IF NOT EXISTS users (
+        CREATE TABLE IF NOT EXISTS {name} (
             user_id INTEGER PRIMARY KEY,
-            authorized_at TEXT NOT NULL
+            authorized_at INTEGER NOT NULL,
+            username TEXT
         )
         """
 
         banned_table = """
-        CREATE TABLE IF NOT EXISTS banned_users (
+        CREATE TABLE IF NOT EXISTS {name} (
             user_id INTEGER PRIMARY KEY,
-            banned_at TEXT NOT NULL,
-            reason TEXT
+            banned_at INTEGER NOT NULL,
+            reason TEXT,
+            username TEXT
         )
         """
 
@@ -49,28 +98,104 @@ class DatabaseManager:
         """
 
         history_table = """
-        CREATE TABLE IF NOT EXISTS history (
+        CREATE TABLE IF NOT EXISTS {name} (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
             base_url TEXT NOT NULL,
             utm_url TEXT NOT NULL,
             short_url TEXT NOT NULL,
-            created_at TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            link_key TEXT,
+            generation_count INTEGER NOT NULL DEFAULT 1,
+            last_used_at INTEGER,
             FOREIGN KEY (user_id) REFERENCES users(user_id)
         )
         """
 
+        fsm_table = """
+        CREATE TABLE IF NOT EXISTS fsm_state (
+            storage_key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """
+
+        conversation_table = """
+        CREATE TABLE IF NOT EXISTS conversation_state (
+            namespace TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            value TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (namespace, user_id)
+        )
+        """
+
+        presets_table = """
+        CREATE TABLE IF NOT EXISTS utm_presets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            utm_source TEXT NOT NULL,
+            utm_medium TEXT NOT NULL,
+            utm_campaign TEXT NOT NULL,
+            is_default INTEGER NOT NULL DEFAULT 0,
+            created_at INTEGER NOT NULL,
+            UNIQUE (user_id, name)
+        )
+        """
+
         with self._lock:
             cursor = self._connection.cursor()
-            cursor.execute(users_table)
-            cursor.execute(banned_table)
+            cursor.execute(users_table.format(name="users"))
+            cursor.execute(banned_table.format(name="banned_users"))
             cursor.execute(attempts_table)
             cursor.execute(settings_table)
-            cursor.execute(history_table)
+            cursor.execute(history_table.format(name="history"))
+            cursor.execute(fsm_table)
+            cursor.execute(conversation_table)
+            cursor.execute(presets_table)
             self._connection.commit()
 
         self._ensure_column("users", "username", "TEXT")
         self._ensure_column("banned_users", "username", "TEXT")
+        self._ensure_column("history", "link_key", "TEXT")
+        self._ensure_column("history", "generation_count", "INTEGER NOT NULL DEFAULT 1")
+        self._ensure_column("history", "last_used_at", "TEXT")
+        self._migrate_to_epoch("users", users_table, ("authorized_at",))
+        self._migrate_to_epoch("banned_users", banned_table, ("banned_at",))
+        self._migrate_to_epoch("history", history_table, ("created_at", "last_used_at"))
+        self._ensure_index(
+            "idx_history_user_link_key",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_history_user_link_key ON history (user_id, link_key)",
+        )
+        # Recent history walks (user_id, last_used_at); period queries range-scan created_at.
+        self._ensure_index(
+            "idx_history_user_last_used_at",
+            "CREATE INDEX IF NOT EXISTS idx_history_user_last_used_at ON history (user_id, last_used_at, id)",
+        )
+        self._ensure_index(
+            "idx_history_user_created_at",
+            "CREATE INDEX IF NOT EXISTS idx_history_user_created_at ON history (user_id, created_at)",
+        )
+        for table, timestamp in USER_TABLES.values():
+            # Keyset pagination walks (timestamp, user_id); username search is a NOCASE prefix scan.
+            self._ensure_index(
+                f"idx_{table}_{timestamp}",
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_{timestamp} ON {table} ({timestamp}, user_id)",
+            )
+            self._ensure_index(
+                f"idx_{table}_username",
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_username ON {table} (username COLLATE NOCASE)",
+            )
+        self._ensure_index(
+            "idx_fsm_state_updated_at",
+            "CREATE INDEX IF NOT EXISTS idx_fsm_state_updated_at ON fsm_state (updated_at)",
+        )
+        self._ensure_index(
+            "idx_conversation_state_updated_at",
+            "CREATE INDEX IF NOT EXISTS idx_conversation_state_updated_at ON conversation_state (updated_at)",
+        )
         self._ensure_default_password()
 
     def _ensure_column(self, table: str, column: str, definition: str) -> None:
@@ -82,6 +207,50 @@ class DatabaseManager:
                 cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
                 self._connection.commit()
 
+    def _migrate_to_epoch(self, table: str, create_statement: str, timestamps: Tuple[str, ...]) -> None:
+        """
+        Rebuild ``table`` with INTEGER epoch ``timestamps`` if they still hold ISO text.
+
+        SQLite cannot change a column type in place, so the rows are copied into
+        a new table created from ``create_statement``, which replaces the old one.
+        Its indexes are dropped with it and recreated by ``_setup``.
+        """
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute(f"PRAGMA table_info({table})")
+            columns = {row["name"]: row for row in cursor.fetchall()}
+            if columns[timestamps[0]]["type"].upper() != "TEXT":
+                return
+            selected = []
+            for name, column in columns.items():
+                if name not in timestamps:
+                    selected.append(name)
+                    continue
+                # Stored values are naive UTC, which is what strftime assumes.
+                converted = f"CAST(strftime('%s', {name}) AS INTEGER)"
+                if column["notnull"]:
+                    converted = f"COALESCE({converted}, 0)"
+                selected.append(converted)
+            names = ", ".join(columns)
+            migrated = f"{table}_epoch"
+            cursor.execute(create_statement.format(name=migrated))
+            cursor.execute(f"INSERT INTO {migrated} ({names}) SELECT {', '.join(selected)} FROM {table}")
+            cursor.execute(f"DROP TABLE {table}")
+            cursor.execute(f"ALTER TABLE {migrated} RENAME TO {table}")
+            if "last_used_at" in timestamps:
+                cursor.execute(f"UPDATE {table} SET last_used_at = created_at WHERE last_used_at IS NULL")
+            self._connection.commit()
+
+    def _ensure_index(self, name: str, statement: str) -> None:
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)
+            )
+            if cursor.fetchone() is None:
+                cursor.execute(statement)
+                self._connection.commit()
+
     def _ensure_default_password(self) -> None:
         with self._lock:
             cursor = self._connection.cursor()
@@ -95,12 +264,15 @@ class DatabaseManager:
                 )
                 self._connection.commit()
 
+    def ping(self) -> bool:
+        return self._exists("SELECT 1", ())
+
     def is_user_authorized(self, user_id: int) -> bool:
         query = "SELECT 1 FROM users WHERE user_id = ?"
         return self._exists(query, (user_id,))
 
     def authorize_user(self, user_id: int, username: Optional[str]) -> None:
-        now = datetime.utcnow().isoformat()
+        now = int(time.time())
         query = """
         INSERT INTO users (user_id, username, authorized_at)
         VALUES (?, ?, ?)
@@ -114,7 +286,7 @@ class DatabaseManager:
         return self._exists(query, (user_id,))
 
     def ban_user(self, user_id: int, username: Optional[str], reason: str | None = None) -> None:
-        now = datetime.utcnow().isoformat()
+        now = int(time.time())
         query = """
         INSERT OR IGNORE INTO banned_users (user_id, username, banned_at, reason)
         VALUES (?, ?, ?, ?)
@@ -122,40 +294,224 @@ class DatabaseManager:
         self._execute(query, (user_id, username, now, reason))
         self.reset_auth_attempts(user_id)
 
-    def add_history(self, user_id: int, base_url: str, utm_url: str, short_url: str) -> None:
-        now = datetime.utcnow().isoformat()
-        query = """
-        INSERT INTO history (user_id, base_url, utm_url, short_url, created_at)
-        VALUES (?, ?, ?, ?, ?)
+    def add_history(
+        self,
+        user_id: int,
+        base_url: str,
+        utm_url: str,
+        short_url: str,
+        link_key: Optional[str] = None,
+    ) -> Tuple[int, Optional[int]]:
+        """
+        Store a generated link and return its row id with the first generation time.
+
+        When the user already generated a link with the same ``link_key`` the existing
+        row is reused (counter and last-used time are bumped) and its original
+        ``created_at`` epoch is returned; ``None`` means a new row.
         """
-        self._execute(query, (user_id, base_url, utm_url, short_url, now))
+        now = int(time.time())
+        with self._lock:
+            cursor = self._connection.cursor()
+            existing = None
+            if link_key is not None:
+                cursor.execute(
+                    "SELECT id, created_at FROM history WHERE user_id = ? AND link_key = ?",
+                    (user_id, link_key),
+                )
+                existing = cursor.fetchone()
+            if existing is not None:
+                cursor.execute(
+                    """
+                    UPDATE history
+                    SET utm_url = ?, short_url = ?, last_used_at = ?,
+                        generation_count = generation_count + 1
+                    WHERE id = ?
+                    """,
+                    (utm_url, short_url, now, existing["id"]),
+                )
+                result = int(existing["id"]), int(existing["created_at"])
+            else:
+                cursor.execute(
+                    """
+                    INSERT INTO history (user_id, base_url, utm_url, short_url, created_at, link_key, last_used_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (user_id, base_url, utm_url, short_url, now, link_key, now),
+                )
+                result = int(cursor.lastrowid), None
+            self._connection.commit()
+            self._recent_history.record(user_id, (link_key, base_url, utm_url, short_url))
+        self._notify_changed(user_id)
+        return result
 
     def get_history(self, user_id: int, limit: int = 50) -> List[Tuple[str, str, str]]:
+        """
+        The user's most recently used links, from the in-memory ring when it covers ``limit``.
+        """
         query = """
-        SELECT base_url, utm_url, short_url
+        SELECT link_key, base_url, utm_url, short_url
         FROM history
         WHERE user_id = ?
-        ORDER BY id DESC
+        ORDER BY last_used_at DESC, id DESC
+        LIMIT ?
+        """
+        with self._lock:
+            entries = self._recent_history.get(user_id, limit)
+            if entries is None:
+                cursor = self._connection.cursor()
+                cursor.execute(query, (user_id, max(limit, self._recent_history.per_user)))
+                entries = [
+                    (row["link_key"], row["base_url"], row["utm_url"], row["short_url"])
+                    for row in cursor.fetchall()
+                ]
+                self._recent_history.fill(user_id, entries)
+                entries = entries[:limit]
+        return [(base_url, utm_url, short_url) for _, base_url, utm_url, short_url in entries]
+
+    def get_history_entry(self, user_id: int, history_id: int) -> Optional[sqlite3.Row]:
+        rows = self._fetchall(
+            "SELECT id, base_url, utm_url FROM history WHERE id = ? AND user_id = ?", (history_id, user_id)
+        )
+        return rows[0] if rows else None
+
+    def get_history_between(self, user_id: int, start: int, end: int, limit: int = 50) -> List[sqlite3.Row]:
+        """
+        Links the user first generated in ``[start, end)`` (epoch seconds), oldest first.
+        """
+        query = """
+        SELECT id, base_url, utm_url, short_url, created_at, last_used_at, generation_count
+        FROM history
+        WHERE user_id = ? AND created_at >= ? AND created_at < ?
+        ORDER BY created_at, id
+        LIMIT ?
+        """
+        return self._fetchall(query, (user_id, start, end, limit))
+
+    def count_users(self, banned: bool = False, username_prefix: Optional[str] = None) -> int:
+        table, _ = USER_TABLES[banned]
+        condition, params = _username_condition(username_prefix)
+        rows = self._fetchall(f"SELECT COUNT(*) AS total FROM {table} WHERE {condition}", params)
+        return int(rows[0]["total"])
+
+    def page_users(
+        self,
+        banned: bool = False,
+        limit: int = 20,
+        cursor: Optional[Tuple[int, int]] = None,
+        newer: bool = False,
+        username_prefix: Optional[str] = None,
+    ) -> List[sqlite3.Row]:
+        """
+        One page of users, newest first, by keyset pagination.
+
+        ``cursor`` is the (timestamp, user id) key of the row at the edge of the
+        current page: rows older than it are returned, or newer ones when
+        ``newer`` is set. The key does not have to exist any more, so a user
+        deleted or unbanned between pages does not break navigation.
+        """
+        table, timestamp = USER_TABLES[banned]
+        condition, params = _username_condition(username_prefix)
+        if cursor is not None:
+            comparison = ">" if newer else "<"
+            condition += f" AND ({timestamp}, user_id) {comparison} (?, ?)"
+            params += tuple(cursor)
+        order = "ASC" if newer else "DESC"
+        columns = "user_id, username, banned_at, reason" if banned else "user_id, username, authorized_at"
+        query = f"""
+        SELECT {columns}
+        FROM {table}
+        WHERE {condition}
+        ORDER BY {timestamp} {order}, user_id {order}
+        LIMIT ?
+        """
+        rows = self._fetchall(query, params + (limit,))
+        return rows[::-1] if newer else rows
+
+    def users_between(self, start: int, end: int, banned: bool = False, limit: int = 100) -> List[sqlite3.Row]:
+        """
+        Users authorized (or banned) in ``[start, end)`` (epoch seconds), oldest first.
+        """
+        table, timestamp = USER_TABLES[banned]
+        columns = "user_id, username, banned_at, reason" if banned else "user_id, username, authorized_at"
+        query = f"""
+        SELECT {columns}
+        FROM {table}
+        WHERE {timestamp} >= ? AND {timestamp} < ?
+        ORDER BY {timestamp}, user_id
         LIMIT ?
         """
-        rows = self._fetchall(query, (user_id, limit))
-        return [(row["base_url"], row["utm_url"], row["short_url"]) for row in rows]
+        return self._fetchall(query, (start, end, limit))
 
-    def list_authorized_users(self) -> List[sqlite3.Row]:
+    def list_presets(self, user_id: int) -> Tuple[UTMPreset, ...]:
         query = """
-        SELECT user_id, username, authorized_at
-        FROM users
-        ORDER BY authorized_at DESC
+        SELECT id, name, utm_source, utm_medium, utm_campaign, is_default
+        FROM utm_presets
+        WHERE user_id = ?
+        ORDER BY created_at, id
         """
-        return self._fetchall(query, ())
+        with self._lock:
+            presets = self._presets.get(user_id)
+            if presets is None:
+                cursor = self._connection.cursor()
+                cursor.execute(query, (user_id,))
+                presets = tuple(
+                    UTMPreset(
+                        row["id"],
+                        row["name"],
+                        row["utm_source"],
+                        row["utm_medium"],
+                        row["utm_campaign"],
+                        bool(row["is_default"]),
+                    )
+                    for row in cursor.fetchall()
+                )
+                self._presets[user_id] = presets
+                while len(self._presets) > settings.preset_cache_size:
+                    self._presets.popitem(last=False)
+            self._presets.move_to_end(user_id)
+        return presets
+
+    def get_preset(self, user_id: int, preset_id: int) -> Optional[UTMPreset]:
+        return next((preset for preset in self.list_presets(user_id) if preset.id == preset_id), None)
 
-    def list_banned_users(self) -> List[sqlite3.Row]:
+    def get_default_preset(self, user_id: int) -> Optional[UTMPreset]:
+        return next((preset for preset in self.list_presets(user_id) if preset.is_default), None)
+
+    def save_preset(self, user_id: int, name: str, utm_source: str, utm_medium: str, utm_campaign: str) -> None:
+        """
+        Store a named source/medium/campaign combination; an existing preset with the same name is replaced.
+        """
         query = """
-        SELECT user_id, username, banned_at, reason
-        FROM banned_users
-        ORDER BY banned_at DESC
+        INSERT INTO utm_presets (user_id, name, utm_source, utm_medium, utm_campaign, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, name) DO UPDATE SET
+            utm_source = excluded.utm_source,
+            utm_medium = excluded.utm_medium,
+            utm_campaign = excluded.utm_campaign
         """
-        return self._fetchall(query, ())
+        self._write_presets(user_id, query, (user_id, name, utm_source, utm_medium, utm_campaign, int(time.time())))
+
+    def set_default_preset(self, user_id: int, preset_id: Optional[int]) -> bool:
+        """
+        Make ``preset_id`` the user's only default preset, or clear the default when it is ``None``.
+        """
+        query = "UPDATE utm_presets SET is_default = (id IS ?) WHERE user_id = ?"
+        self._write_presets(user_id, query, (preset_id, user_id))
+        return preset_id is None or self.get_preset(user_id, preset_id) is not None
+
+    def delete_preset(self, user_id: int, preset_id: int) -> bool:
+        query = "DELETE FROM utm_presets WHERE user_id = ? AND id = ?"
+        return self._write_presets(user_id, query, (user_id, preset_id)) > 0
+
+    def _write_presets(self, user_id: int, query: str, params: Iterable) -> int:
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute(query, tuple(params))
+            self._connection.commit()
+            self._presets.pop(user_id, None)
+            changed = cursor.rowcount
+        self._notify_changed(user_id)
+        return changed
 
     def delete_user(self, user_id: int) -> bool:
         with self._lock:
@@ -166,9 +522,35 @@ class DatabaseManager:
             deleted_from_users = cursor.rowcount
             cursor.execute("DELETE FROM banned_users WHERE user_id = ?", (user_id,))
             deleted_from_banned = cursor.rowcount
+            cursor.execute("DELETE FROM utm_presets WHERE user_id = ?", (user_id,))
             self._connection.commit()
+            self._recent_history.invalidate(user_id)
+            self._presets.pop(user_id, None)
+        self._notify_changed(user_id)
         return (deleted_from_users + deleted_from_banned) > 0
 
+    def add_change_listener(self, listener: Callable[[int], None]) -> None:
+        """
+        Call ``listener`` with the user id after every write to data this process
+        caches per user, so other processes can drop their copies (see :meth:`invalidate_user`).
+        """
+        self._change_listeners.append(listener)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """
+        Forget what this process caches for the user, after another process changed it.
+        """
+        with self._lock:
+            self._recent_history.invalidate(user_id)
+            self._presets.pop(user_id, None)
+
+    def _notify_changed(self, user_id: int) -> None:
+        for listener in self._change_listeners:
+            try:
+                listener(user_id)
+            except Exception:
+                logger.exception("Error in database change listener")
+
     def get_bot_password(self) -> str:
         query = "SELECT value FROM app_settings WHERE key = ?"
         rows = self._fetchall(query, ("bot_password",))
@@ -211,6 +593,63 @@ class DatabaseManager:
         query = "DELETE FROM auth_attempts WHERE user_id = ?"
         self._execute(query, (user_id,))
 
+    def load_fsm_record(self, storage_key: str, not_before: float) -> Optional[sqlite3.Row]:
+        query = """
+        SELECT state, data, updated_at
+        FROM fsm_state
+        WHERE storage_key = ? AND updated_at >= ?
+        """
+        rows = self._fetchall(query, (storage_key, not_before))
+        return rows[0] if rows else None
+
+    def save_fsm_record(self, storage_key: str, state: Optional[str], data: str, updated_at: float) -> None:
+        query = """
+        INSERT INTO fsm_state (storage_key, state, data, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(storage_key) DO UPDATE SET
+            state = excluded.state, data = excluded.data, updated_at = excluded.updated_at
+        """
+        self._execute(query, (storage_key, state, data, updated_at))
+
+    def delete_fsm_record(self, storage_key: str) -> None:
+        self._execute("DELETE FROM fsm_state WHERE storage_key = ?", (storage_key,))
+
+    def purge_fsm_records(self, older_than: float) -> None:
+        self._execute("DELETE FROM fsm_state WHERE updated_at < ?", (older_than,))
+
+    def load_conversation_values(self, namespace: str, not_before: float) -> List[sqlite3.Row]:
+        query = """
+        SELECT user_id, value, updated_at
+        FROM conversation_state
+        WHERE namespace = ? AND updated_at >= ?
+        """
+        return self._fetchall(query, (namespace, not_before))
+
+    def load_conversation_value(self, namespace: str, user_id: int, not_before: float) -> Optional[sqlite3.Row]:
+        query = """
+        SELECT value, updated_at
+        FROM conversation_state
+        WHERE namespace = ? AND user_id = ? AND updated_at >= ?
+        """
+        rows = self._fetchall(query, (namespace, user_id, not_before))
+        return rows[0] if rows else None
+
+    def save_conversation_value(self, namespace: str, user_id: int, value: str, updated_at: float) -> None:
+        query = """
+        INSERT INTO conversation_state (namespace, user_id, value, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(namespace, user_id) DO UPDATE SET
+            value = excluded.value, updated_at = excluded.updated_at
+        """
+        self._execute(query, (namespace, user_id, value, updated_at))
+
+    def delete_conversation_value(self, namespace: str, user_id: int) -> None:
+        query = "DELETE FROM conversation_state WHERE namespace = ? AND user_id = ?"
+        self._execute(query, (namespace, user_id))
+
+    def purge_conversation_values(self, older_than: float) -> None:
+        self._execute("DELETE FROM conversation_state WHERE updated_at < ?", (older_than,))
+
     def _execute(self, query: str, params: Iterable) -> None:
         with self._lock:
             cursor = self._connection.cursor()
@@ -230,4 +669,4 @@ class DatabaseManager:
             return cursor.fetchone() is not None
 
 
-database = DatabaseManager(settings.database_path)
+database: DatabaseManager = lazy(lambda: DatabaseManager(settings.database_path), "database")
@@ -0,0 +1,105 @@
+import sys
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+
+# (link_key, base_url, utm_url, short_url), most recently used first.
+HistoryEntry = Tuple[Optional[str], str, str, str]
+
+
+def _entry_size(entry: HistoryEntry) -> int:
+    return sys.getsizeof(entry) + sum(sys.getsizeof(value) for value in entry if value is not None)
+
+
+class RecentHistoryCache:
+    """
+    The last ``per_user`` links of recently active users, kept in memory.
+
+    A user's ring buffer is filled from the database on the first read and then
+    kept current by :meth:`record`; users are evicted least recently used first
+    once the cache holds more than ``max_bytes`` (an approximation of the
+    strings and tuples it references). Not thread-safe: the owner serializes
+    access.
+    """
+
+    def __init__(self, per_user: int, max_bytes: int) -> None:
+        self.per_user = per_user
+        self.max_bytes = max_bytes
+        self._users: "OrderedDict[int, Deque[HistoryEntry]]" = OrderedDict()
+        self._sizes: Dict[int, int] = {}
+        self._bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, user_id: int, limit: int) -> Optional[List[HistoryEntry]]:
+        """
+        Up to ``limit`` recent entries, or ``None`` when the database must be asked.
+        """
+        ring = self._users.get(user_id)
+        if ring is None or limit > self.per_user:
+            return None
+        self._users.move_to_end(user_id)
+        return list(ring)[:limit]
+
+    def fill(self, user_id: int, entries: Iterable[HistoryEntry]) -> None:
+        """
+        Load the user's ring from ``entries`` (most recent first, as read from the database).
+        """
+        self._drop(user_id)
+        if self.per_user <= 0:
+            return
+        ring: Deque[HistoryEntry] = deque(islice(entries, self.per_user), maxlen=self.per_user)
+        self._users[user_id] = ring
+        self._sizes[user_id] = sum(_entry_size(entry) for entry in ring)
+        self._bytes += self._sizes[user_id]
+        self._evict()
+
+    def record(self, user_id: int, entry: HistoryEntry) -> None:
+        """
+        Put a just generated (or regenerated) link first in the user's ring.
+
+        Users without a ring are left alone: their first read loads it.
+        """
+        ring = self._users.get(user_id)
+        if ring is None:
+            return
+        link_key = entry[0]
+        if link_key is not None:
+            for existing in ring:
+                if existing[0] == link_key:
+                    ring.remove(existing)
+                    self._resize(user_id, -_entry_size(existing))
+                    break
+        if len(ring) == ring.maxlen:
+            self._resize(user_id, -_entry_size(ring[-1]))
+        ring.appendleft(entry)
+        self._resize(user_id, _entry_size(entry))
+        self._users.move_to_end(user_id)
+        self._evict()
+
+    def invalidate(self, user_id: int) -> None:
+        self._drop(user_id)
+
+    def clear(self) -> None:
+        self._users.clear()
+        self._sizes.clear()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def _resize(self, user_id: int, delta: int) -> None:
+        self._sizes[user_id] += delta
+        self._bytes += delta
+
+    def _drop(self, user_id: int) -> None:
+        if self._users.pop(user_id, None) is not None:
+            self._bytes -= self._sizes.pop(user_id)
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._users:
+            user_id = next(iter(self._users))
+            self._drop(user_id)
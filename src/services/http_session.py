@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import random
+from types import SimpleNamespace
+from typing import Any, Dict
+
+from aiogram import Bot, __version__ as aiogram_version
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramNetworkError, TelegramServerError
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import ClientConnectorError, ClientSession, TraceConfig
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+
+
+logger = logging.getLogger(__name__)
+
+# Methods that may deliver a second message when retried after an ambiguous failure.
+NON_IDEMPOTENT_PREFIXES = ("send", "forward", "copy")
+
+
+class ConnectionStats:
+    """
+    Counters of how Bot API requests obtained their connections.
+    """
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+        self.retries = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.connections_created + self.connections_reused
+        return self.connections_reused / total if total else 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+            "retries": self.retries,
+            "reuse_ratio": round(self.reuse_ratio, 4),
+        }
+
+
+class PooledAiohttpSession(AiohttpSession):
+    """
+    aiogram session with a configurable keep-alive connection pool and DNS cache,
+    instrumented with :class:`ConnectionStats`.
+    """
+
+    def __init__(
+        self,
+        pool_size: int,
+        pool_size_per_host: int,
+        keepalive_timeout: float,
+        dns_ttl: int,
+        timeout: float,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(limit=pool_size, timeout=timeout, **kwargs)
+        self._connector_init.update(
+            limit_per_host=pool_size_per_host,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=dns_ttl,
+        )
+        self.stats = ConnectionStats()
+
+    def _build_trace_config(self) -> TraceConfig:
+        stats = self.stats
+        trace_config = TraceConfig()
+
+        async def on_request_start(session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+            stats.requests += 1
+
+        async def on_connection_create_end(session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+            stats.connections_created += 1
+
+        async def on_connection_reuseconn(session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+            stats.connections_reused += 1
+
+        async def on_dns_cache_hit(session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+            stats.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(session: ClientSession, context: SimpleNamespace, params: Any) -> None:
+            stats.dns_cache_misses += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    async def create_session(self) -> ClientSession:
+        if self._should_reset_connector:
+            await self.close()
+
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=self._connector_type(**self._connector_init),
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{aiogram_version}"},
+                trace_configs=[self._build_trace_config()],
+            )
+            self._should_reset_connector = False
+
+        return self._session
+
+
+class NetworkRetryMiddleware(BaseRequestMiddleware):
+    """
+    Retries transient network and 5xx failures with full-jitter exponential backoff.
+
+    Sends are retried only when no connection could be established, i.e. the
+    request never left the process. A dropped connection or a timeout may come
+    after Telegram has already delivered the message, so those are not retried.
+    """
+
+    def __init__(self, max_retries: int, base_delay: float, max_delay: float, stats: ConnectionStats) -> None:
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = stats
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        attempt = 0
+        while True:
+            try:
+                return await make_request(bot, method)
+            except (TelegramNetworkError, TelegramServerError) as exc:
+                if attempt >= self.max_retries or not self._can_retry(method, exc):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                attempt += 1
+                self.stats.retries += 1
+                logger.warning(
+                    "%s failed (%s), retry %s/%s in %.2fs",
+                    method.__api_method__,
+                    exc.message,
+                    attempt,
+                    self.max_retries,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _can_retry(method: TelegramMethod[Any], exc: Exception) -> bool:
+        if not method.__api_method__.startswith(NON_IDEMPOTENT_PREFIXES):
+            return True
+        return isinstance(exc.__cause__, ClientConnectorError)
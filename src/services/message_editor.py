@@ -0,0 +1,88 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from aiogram import types
+from aiogram.exceptions import TelegramBadRequest
+
+from src.core.lazy import lazy
+from src.core.memory import memory
+
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_MESSAGES = 10_000
+
+Fingerprint = Tuple[str, str]
+
+
+def _digest(value: str) -> str:
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _fingerprint(text: Optional[str], reply_markup: Optional[types.InlineKeyboardMarkup]) -> Fingerprint:
+    markup = reply_markup.model_dump_json(exclude_none=True) if reply_markup else ""
+    return _digest(text or ""), _digest(markup)
+
+
+class MessageEditor:
+    """
+    Edits bot messages only as much as needed, remembering the fingerprint of
+    what was last rendered per (chat_id, message_id).
+    """
+
+    def __init__(self, max_tracked: int = MAX_TRACKED_MESSAGES) -> None:
+        self._max_tracked = max_tracked
+        self._rendered: "OrderedDict[Tuple[int, int], Fingerprint]" = OrderedDict()
+        memory.track("rendered_messages", self, lambda editor: editor._rendered)
+
+    def _remember(self, key: Tuple[int, int], fingerprint: Fingerprint) -> None:
+        self._rendered[key] = fingerprint
+        self._rendered.move_to_end(key)
+        while len(self._rendered) > self._max_tracked:
+            self._rendered.popitem(last=False)
+
+    async def edit(
+        self,
+        message: types.Message,
+        text: str,
+        reply_markup: Optional[types.InlineKeyboardMarkup] = None,
+        **kwargs: Any,
+    ) -> None:
+        key = (message.chat.id, message.message_id)
+        new = _fingerprint(text, reply_markup)
+        previous = self._rendered.get(key) or _fingerprint(message.text, message.reply_markup)
+        if previous == new:
+            return
+
+        try:
+            if previous[0] == new[0]:
+                await message.edit_reply_markup(reply_markup=reply_markup)
+            else:
+                await message.edit_text(text, reply_markup=reply_markup, **kwargs)
+        except TelegramBadRequest as exc:
+            if "message is not modified" not in exc.message:
+                raise
+            logger.debug("Message %s was already up to date", key)
+        self._remember(key, new)
+
+
+message_editor: MessageEditor = lazy(MessageEditor, "message_editor")
+
+
+async def edit_message(
+    message: types.Message,
+    text: str,
+    reply_markup: Optional[types.InlineKeyboardMarkup] = None,
+    **kwargs: Any,
+) -> None:
+    """
+    Edit a bot message only as much as needed.
+
+    Compares the new text and keyboard with what was last rendered (or with the
+    message as Telegram delivered it): identical content is not sent at all and a
+    keyboard-only change goes through ``edit_reply_markup``. Every edit of a
+    message tracked here must go through this function, or its fingerprint goes stale.
+    """
+    await message_editor.edit(message, text, reply_markup, **kwargs)
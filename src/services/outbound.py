@@ -0,0 +1,193 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    AnswerCallbackQuery,
+    EditMessageCaption,
+    EditMessageMedia,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    Response,
+    TelegramMethod,
+)
+from aiogram.methods.base import TelegramType
+
+from src.core.memory import memory
+
+
+logger = logging.getLogger(__name__)
+
+# Retried calls go first so a flood wait does not reorder messages within a chat.
+PRIORITY_RETRY = -1
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+
+# Idle per-chat buckets beyond this count are forgotten (they are full anyway).
+MAX_CHAT_BUCKETS = 10_000
+# In-place updates of a message already in the chat, e.g. keyboard navigation.
+EDIT_METHODS = (EditMessageText, EditMessageReplyMarkup, EditMessageCaption, EditMessageMedia)
+
+
+class TokenBucket:
+    """
+    Token bucket whose waiters are served by priority, then in arrival order.
+    """
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return not self._waiters and self._tokens >= self.burst
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL) -> None:
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._schedule()
+        await future
+
+    def pause(self, seconds: float) -> None:
+        """
+        Withhold tokens for ``seconds`` (used when Telegram asks to retry later).
+        """
+        self._refill()
+        self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+        self._schedule(reschedule=True)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _schedule(self, reschedule: bool = False) -> None:
+        if reschedule and self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        if self._wakeup is not None or not self._waiters:
+            return
+        delay = max(0.0, (1 - self._tokens) / self.rate)
+        self._wakeup = asyncio.get_running_loop().call_later(delay, self._release)
+
+    def _release(self) -> None:
+        self._wakeup = None
+        self._refill()
+        while self._waiters and self._tokens >= 1:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():  # the waiting request was cancelled
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+        self._schedule()
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """
+    Request middleware that paces outgoing Bot API calls to Telegram's limits.
+
+    Calls addressed to a chat take a token from that chat's bucket and from the
+    global bucket; callback answers and edits in private chats (the per-chat limit
+    is about new messages, and every button press edits one) only use the global
+    bucket and jump ahead of queued sends. Calls without a chat (getUpdates,
+    setWebhook, ...) are not paced.
+    On 429 the affected bucket is paused for ``retry_after`` and the call retried.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        private_chat_rate: float,
+        group_chat_rate: float,
+        max_retries: int,
+    ) -> None:
+        self.global_bucket = TokenBucket(rate=global_rate, burst=global_rate)
+        self.private_chat_rate = private_chat_rate
+        self.group_chat_rate = group_chat_rate
+        self.max_retries = max_retries
+        self._chat_buckets: "OrderedDict[int | str, TokenBucket]" = OrderedDict()
+        memory.track("outbound_chat_buckets", self, lambda scheduler: scheduler._chat_buckets)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        private_edit = isinstance(method, EDIT_METHODS) and not _is_group(chat_id)
+        interactive = isinstance(method, AnswerCallbackQuery) or private_edit
+        if chat_id is None and not interactive:
+            return await make_request(bot, method)
+
+        chat_bucket = self._chat_bucket(chat_id) if chat_id is not None and not private_edit else None
+        priority = PRIORITY_INTERACTIVE if interactive else PRIORITY_NORMAL
+        attempt = 0
+        while True:
+            if chat_bucket is not None:
+                await chat_bucket.acquire(priority)
+            await self.global_bucket.acquire(priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as exc:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(
+                    "Flood control on %s (chat %s), retrying in %ss",
+                    type(method).__name__,
+                    chat_id,
+                    exc.retry_after,
+                )
+                (chat_bucket or self.global_bucket).pause(exc.retry_after)
+                priority = PRIORITY_RETRY
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if _is_group(chat_id):
+                bucket = TokenBucket(rate=self.group_chat_rate, burst=3)
+            else:
+                bucket = TokenBucket(rate=self.private_chat_rate, burst=3)
+            self._chat_buckets[chat_id] = bucket
+            self._prune()
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    def _prune(self) -> None:
+        excess = len(self._chat_buckets) - MAX_CHAT_BUCKETS
+        if excess <= 0:
+            return
+        # Least recently used first; buckets with queued calls are skipped, not waited for.
+        stale = []
+        for chat_id, bucket in self._chat_buckets.items():
+            if len(stale) >= excess:
+                break
+            if bucket.idle:
+                stale.append(chat_id)
+        for chat_id in stale:
+            del self._chat_buckets[chat_id]
+
+
+def _is_group(chat_id: Optional[int | str]) -> bool:
+    # Group and channel ids are negative; @username targets are channels.
+    return isinstance(chat_id, str) or (chat_id is not None and chat_id < 0)
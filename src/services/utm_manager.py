@@ -1,15 +1,37 @@
+import hashlib
 import json
 import os
 import logging
-from typing import Dict, List, Tuple
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.core.lazy import lazy
+from src.core.memory import memory
+from src.core.metrics import registry
 
 logger = logging.getLogger(__name__)
 
+CATALOG_SAVE_SECONDS = registry.histogram("bot_catalog_save_seconds", "Time to write the UTM catalog to disk.")
+CATALOG_SAVE_ERRORS = registry.counter("bot_catalog_save_errors_total", "Failed UTM catalog writes.")
+
+# Вид метки -> категории каталога, в которых ищется её значение.
+VALUE_KINDS: Dict[str, Tuple[str, ...]] = {
+    "source": ("source", "source_other"),
+    "medium": ("medium",),
+    "campaign": ("campaign_spb", "campaign_msk", "campaign_regions", "campaign_foreign"),
+}
+
 class UTMManager:
     def __init__(self, data_file: str = "data/utm_data.json"):
         self.data_file = data_file
         self.data_dir = os.path.dirname(data_file)
         self.data: Dict = {}
+        self.version: str = ""
+        self._category_versions: Dict[str, str] = {}
+        self._value_index: Dict[str, Dict[str, str]] = {}
+        self._entry_ids: Dict[str, Dict[str, int]] = {}
+        self._change_listeners: List[Callable[[], None]] = []
+        memory.track("utm_catalog", self, lambda manager: manager.data)
         self._ensure_data_file_and_load()
 
     def _ensure_data_file_and_load(self):
@@ -128,6 +150,8 @@ class UTMManager:
                 self.data = json.load(f)
         except (FileNotFoundError, json.JSONDecodeError):
             self.data = {}
+        self._refresh_version()
+        self._rebuild_index()
 
     def normalize_data(self) -> None:
         """Гарантирует, что все ключи и списки существуют в self.data."""
@@ -141,16 +165,93 @@ class UTMManager:
         self.data["campaigns"].setdefault("msk", [])
         self.data["campaigns"].setdefault("regions", [])
         self.data["campaigns"].setdefault("foreign", [])
+        self._refresh_version()
+        self._rebuild_index()
+
+    def _refresh_version(self) -> None:
+        """Пересчитывает версию каталога — короткий хеш его содержимого."""
+        payload = json.dumps(self.data, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        self.version = hashlib.sha1(payload).hexdigest()[:12]
+
+    def _rebuild_index(self) -> None:
+        """
+        Строит индексы каталога: значения меток по виду (без учёта регистра),
+        номера записей внутри категорий (их позиции, см. entry_id) и версии категорий.
+        """
+        index: Dict[str, Dict[str, str]] = {}
+        entry_ids: Dict[str, Dict[str, int]] = {}
+        category_versions: Dict[str, str] = {}
+        for kind, category_keys in VALUE_KINDS.items():
+            values: Dict[str, str] = {}
+            for category_key in category_keys:
+                try:
+                    items = self.get_category_data(category_key)
+                except AttributeError:
+                    continue  # раздел повреждён, normalize_data его восстановит
+                payload = json.dumps(items, ensure_ascii=False).encode("utf-8")
+                category_versions[category_key] = hashlib.sha1(payload).hexdigest()[:12]
+                ids = entry_ids.setdefault(category_key, {})
+                for position, (_, value) in enumerate(items):
+                    values.setdefault(value.casefold(), value)
+                    ids.setdefault(value, position)
+            index[kind] = values
+        self._value_index = index
+        self._entry_ids = entry_ids
+        self._category_versions = category_versions
+
+    def category_version(self, category_key: str) -> str:
+        """Короткий хеш списка категории: меняется только при правке этой категории."""
+        return self._category_versions.get(category_key, "")
+
+    def entry_id(self, category_key: str, value: str) -> Optional[int]:
+        """Короткий номер записи в категории; действителен, пока не изменилась версия категории."""
+        return self._entry_ids.get(category_key, {}).get(value)
+
+    def entry_by_id(self, category_key: str, entry_id: int) -> Optional[Tuple[str, str]]:
+        items = self.get_category_data(category_key)
+        if 0 <= entry_id < len(items):
+            name, value = items[entry_id]
+            return name, value
+        return None
+
+    def find_value(self, kind: str, value: str) -> Optional[str]:
+        """Значение метки вида ``kind`` ("source", "medium", "campaign") из каталога или None."""
+        return self._value_index.get(kind, {}).get(value.casefold())
+
+    def known_values(self, kind: str) -> List[str]:
+        return list(self._value_index.get(kind, {}).values())
+
+    def add_change_listener(self, listener: Callable[[], None]) -> None:
+        """Регистрирует функцию, вызываемую после каждого успешного сохранения каталога."""
+        self._change_listeners.append(listener)
+
+    def _notify_changed(self) -> None:
+        for listener in self._change_listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Error in catalog change listener: {e}")
 
     def save_data(self) -> bool:
         """Сохраняет текущие данные в JSON файл."""
+        started = time.perf_counter()
         try:
             with open(self.data_file, 'w', encoding='utf-8') as f:
                 json.dump(self.data, f, ensure_ascii=False, indent=2)
-            return True
         except Exception as e:
             logger.error(f"Error saving data: {e}")
+            CATALOG_SAVE_ERRORS.inc()
             return False
+        finally:
+            CATALOG_SAVE_SECONDS.observe(time.perf_counter() - started)
+        self._refresh_version()
+        self._rebuild_index()
+        self._notify_changed()
+        return True
+
+    def is_healthy(self) -> bool:
+        """Каталог пригоден для работы: файл на месте, источники и типы трафика не пусты."""
+        return os.path.exists(self.data_file) and bool(self.data.get("sources")) and bool(self.data.get("mediums"))
 
     def get_all_categories(self) -> Dict[str, Tuple[str, str]]:
         return {
@@ -211,4 +312,4 @@ class UTMManager:
             "campaign_foreign": ("campaigns", "foreign")
         }
 
-utm_manager = UTMManager()
+utm_manager: UTMManager = lazy(UTMManager, "utm_manager")
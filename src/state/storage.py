@@ -0,0 +1,248 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Iterator, List, Mapping, Optional, Tuple, TypeVar
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from src.core.memory import memory
+from src.core.tracing import trace_methods
+from src.services.database import DatabaseManager
+
+
+T = TypeVar("T")
+
+# How often expired rows are swept out of the cache and the database.
+SWEEP_INTERVAL_SECONDS = 60.0
+
+
+def _build_key(key: StorageKey) -> str:
+    parts = [
+        str(key.bot_id),
+        str(key.chat_id),
+        str(key.user_id),
+        str(key.thread_id or ""),
+        str(getattr(key, "business_connection_id", None) or ""),
+        key.destiny,
+    ]
+    return ":".join(parts)
+
+
+class _FSMRecord:
+    __slots__ = ("state", "data", "updated_at")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any], updated_at: float) -> None:
+        self.state = state
+        self.data = data
+        self.updated_at = updated_at
+
+
+@trace_methods("fsm")
+class SQLiteStorage(BaseStorage):
+    """
+    aiogram FSM storage persisted in SQLite with an in-process read-through cache.
+
+    Records that were not written for ``ttl`` seconds are treated as abandoned
+    and dropped; the cache keeps at most ``cache_size`` most recently used keys.
+    """
+
+    def __init__(self, database: DatabaseManager, ttl: float, cache_size: int) -> None:
+        self._database = database
+        self._ttl = ttl
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[str, _FSMRecord]" = OrderedDict()
+        self._last_sweep = time.time()
+        memory.track("fsm_cache", self, lambda storage: storage._cache)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._load(_build_key(key))
+        new_state = state.state if isinstance(state, State) else state
+        self._store(_build_key(key), new_state, record.data if record else {})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._load(_build_key(key))
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        record = self._load(_build_key(key))
+        self._store(_build_key(key), record.state if record else None, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._load(_build_key(key))
+        return dict(record.data) if record else {}
+
+    async def close(self) -> None:
+        self._cache.clear()
+
+    def _load(self, storage_key: str) -> Optional[_FSMRecord]:
+        now = time.time()
+        self._maybe_sweep(now)
+        record = self._cache.get(storage_key)
+        if record is not None:
+            if now - record.updated_at < self._ttl:
+                self._cache.move_to_end(storage_key)
+                return record
+            del self._cache[storage_key]
+            return None
+
+        row = self._database.load_fsm_record(storage_key, not_before=now - self._ttl)
+        if row is None:
+            return None
+        record = _FSMRecord(row["state"], json.loads(row["data"]), float(row["updated_at"]))
+        self._remember(storage_key, record)
+        return record
+
+    def _store(self, storage_key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        if state is None and not data:
+            self._cache.pop(storage_key, None)
+            self._database.delete_fsm_record(storage_key)
+            return
+
+        record = _FSMRecord(state, data, time.time())
+        self._database.save_fsm_record(
+            storage_key, state, json.dumps(data, ensure_ascii=False), record.updated_at
+        )
+        self._remember(storage_key, record)
+
+    def _remember(self, storage_key: str, record: _FSMRecord) -> None:
+        self._cache[storage_key] = record
+        self._cache.move_to_end(storage_key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        expired = [key for key, record in self._cache.items() if now - record.updated_at >= self._ttl]
+        for key in expired:
+            del self._cache[key]
+        self._database.purge_fsm_records(older_than=now - self._ttl)
+
+
+class ExpiringUserStore(Generic[T]):
+    """
+    Per-user values of one conversation namespace, persisted in SQLite.
+
+    A user's value is read on first access and cached, absence included; the
+    cache keeps at most ``cache_size`` most recently used users and every
+    change is written through. Entries expire ``ttl`` seconds after they were
+    last written.
+    """
+
+    def __init__(self, database: DatabaseManager, namespace: str, ttl: float, cache_size: int) -> None:
+        self._database = database
+        self.namespace = namespace
+        self._ttl = ttl
+        self._cache_size = cache_size
+        # user id -> (value, updated_at), or None when the user has no value.
+        self._cache: "OrderedDict[int, Optional[Tuple[T, float]]]" = OrderedDict()
+        self._last_sweep = time.time()
+        memory.track(f"conversation:{namespace}", self, lambda store: store._cache)
+
+    def _lookup(self, user_id: int) -> Optional[Tuple[T, float]]:
+        now = time.time()
+        self._maybe_sweep(now)
+        if user_id in self._cache:
+            entry = self._cache[user_id]
+            self._cache.move_to_end(user_id)
+        else:
+            row = self._database.load_conversation_value(self.namespace, user_id, not_before=now - self._ttl)
+            entry = (json.loads(row["value"]), float(row["updated_at"])) if row is not None else None
+            self._remember(user_id, entry)
+        if entry is not None and now - entry[1] >= self._ttl:
+            self._remove(user_id)
+            return None
+        return entry
+
+    def _remember(self, user_id: int, entry: Optional[Tuple[T, float]]) -> None:
+        self._cache[user_id] = entry
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+        expired = [
+            user_id for user_id, entry in self._cache.items() if entry is not None and now - entry[1] >= self._ttl
+        ]
+        for user_id in expired:
+            del self._cache[user_id]
+        self._database.purge_conversation_values(older_than=now - self._ttl)
+
+    def _write(self, user_id: int, value: T) -> None:
+        now = time.time()
+        self._remember(user_id, (value, now))
+        self._database.save_conversation_value(
+            self.namespace, user_id, json.dumps(value, ensure_ascii=False), now
+        )
+
+    def _remove(self, user_id: int) -> None:
+        if user_id in self._cache and self._cache[user_id] is None:
+            return
+        self._remember(user_id, None)
+        self._database.delete_conversation_value(self.namespace, user_id)
+
+    def _live_user_ids(self) -> List[int]:
+        rows = self._database.load_conversation_values(self.namespace, not_before=time.time() - self._ttl)
+        return [int(row["user_id"]) for row in rows]
+
+    def __contains__(self, user_id: object) -> bool:
+        return isinstance(user_id, int) and self._lookup(user_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._live_user_ids())
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._live_user_ids())
+
+
+class PersistentUserSet(ExpiringUserStore[bool]):
+    """
+    Set-like store of user ids (``add`` / ``discard`` / ``in``).
+    """
+
+    def add(self, user_id: int) -> None:
+        self._write(user_id, True)
+
+    def discard(self, user_id: int) -> None:
+        self._remove(user_id)
+
+
+class PersistentUserDict(ExpiringUserStore[Dict[str, Any]]):
+    """
+    Dict-like store of per-user payloads. Values are copied on read and write,
+    so a change is persisted only through assignment or :meth:`update`.
+    """
+
+    def get(self, user_id: int, default: Any = None) -> Any:
+        entry = self._lookup(user_id)
+        return dict(entry[0]) if entry is not None else default
+
+    def pop(self, user_id: int, default: Any = None) -> Any:
+        entry = self._lookup(user_id)
+        if entry is None:
+            return default
+        self._remove(user_id)
+        return dict(entry[0])
+
+    def update(self, user_id: int, **fields: Any) -> Dict[str, Any]:
+        """
+        Merge ``fields`` into the user's payload (an empty one if absent) and persist it.
+        """
+        entry = self._lookup(user_id)
+        value = {**(entry[0] if entry is not None else {}), **fields}
+        self._write(user_id, value)
+        return dict(value)
+
+    def __getitem__(self, user_id: int) -> Dict[str, Any]:
+        entry = self._lookup(user_id)
+        if entry is None:
+            raise KeyError(user_id)
+        return dict(entry[0])
+
+    def __setitem__(self, user_id: int, value: Dict[str, Any]) -> None:
+        self._write(user_id, dict(value))
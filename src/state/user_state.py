@@ -1,16 +1,32 @@
-from typing import Dict, Optional, Set
+from typing import TYPE_CHECKING, Dict, Optional
+
+from src.config import settings
+from src.core.lazy import lazy
+from src.services.database import database
+
+if TYPE_CHECKING:
+    from src.state.storage import PersistentUserDict
+
+    UserDataStorage = PersistentUserDict
+    UtmEditingStorage = PersistentUserDict
+    PendingActionStorage = PersistentUserDict
 
 
 UserSessionData = Dict[str, Optional[str]]
-UserDataStorage = Dict[int, Dict[str, Optional[str]]]
-UtmEditingStorage = Dict[int, Dict[str, Optional[str]]]
-PendingAuthUsers = Set[int]
-PendingPasswordChangeUsers = Set[int]
-PendingUserDeletion = Set[int]
-
-# In-memory storages. For now simple dicts are sufficient.
-user_data: UserDataStorage = {}
-utm_editing_data: UtmEditingStorage = {}
-pending_password_users: PendingAuthUsers = set()
-pending_password_change_users: PendingPasswordChangeUsers = set()
-pending_user_deletion: PendingUserDeletion = set()
+
+CONVERSATION_NAMESPACES = ("user_data", "utm_editing", "pending_action")
+
+
+def build_conversation_store(namespace: str) -> "PersistentUserDict":
+    # Imported on first use: the storage module pulls in aiogram.
+    from src.state.storage import PersistentUserDict
+
+    return PersistentUserDict(database, namespace, settings.state_ttl_seconds, settings.state_cache_size)
+
+
+# Conversation stores persisted in SQLite; entries of abandoned flows expire
+# after settings.state_ttl_seconds and survive restarts until then.
+user_data: "UserDataStorage" = lazy(lambda: build_conversation_store("user_data"), "user_data")
+utm_editing_data: "UtmEditingStorage" = lazy(lambda: build_conversation_store("utm_editing"), "utm_editing_data")
+# The single free-text input a user is expected to send next: {"action": ..., **payload}.
+pending_actions: "PendingActionStorage" = lazy(lambda: build_conversation_store("pending_action"), "pending_actions")
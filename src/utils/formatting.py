@@ -0,0 +1,42 @@
+import time
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Tuple
+from zoneinfo import ZoneInfo
+
+
+MOSCOW_TZ = ZoneInfo("Europe/Moscow")
+
+
+@lru_cache(maxsize=4096)
+def _moscow_offset(hour: int) -> int:
+    # Offsets only change on hour boundaries, so one lookup serves the whole hour.
+    return int(MOSCOW_TZ.utcoffset(datetime.fromtimestamp(hour * 3600, timezone.utc)).total_seconds())
+
+
+def format_timestamp(value: int | str | None) -> str:
+    """
+    Render a stored UTC timestamp (epoch seconds or legacy ISO text) in Moscow time.
+    """
+    if value is None or value == "":
+        return "—"
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        value = int(parsed.timestamp())
+    value = int(value)
+    local = time.gmtime(value + _moscow_offset(value // 3600))
+    return time.strftime("%Y-%m-%d %H:%M", local) + " МСК"
+
+
+def moscow_day_bounds(day: date) -> Tuple[int, int]:
+    """
+    ``[start, end)`` of a Moscow calendar day in epoch seconds.
+    """
+    start = datetime(day.year, day.month, day.day, tzinfo=MOSCOW_TZ)
+    end = datetime.fromordinal(day.toordinal() + 1).replace(tzinfo=MOSCOW_TZ)
+    return int(start.timestamp()), int(end.timestamp())
@@ -0,0 +1,157 @@
+import datetime
+import difflib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from src.services.utm_builder import build_utm_url
+from src.utils.utm import build_utm_content_with_date, extract_action_slug
+
+if TYPE_CHECKING:
+    from src.services.utm_manager import UTMManager
+
+
+# Accepted spellings of each key in ``key=value`` tokens.
+KEY_ALIASES: Dict[str, str] = {
+    "src": "source",
+    "source": "source",
+    "utm_source": "source",
+    "med": "medium",
+    "medium": "medium",
+    "utm_medium": "medium",
+    "camp": "campaign",
+    "campaign": "campaign",
+    "utm_campaign": "campaign",
+    "date": "date",
+    "content": "content",
+    "utm_content": "content",
+}
+# Positional values fill the fields not given as key=value, in this order.
+POSITIONAL_FIELDS = ("source", "medium", "campaign", "date")
+# Relative dates, same as the date buttons.
+DATE_WORDS = {"today": 0, "сегодня": 0, "tomorrow": 1, "завтра": 1, "dayafter": 2, "послезавтра": 2}
+
+
+@dataclass
+class QuickLink:
+    base_url: str
+    utm_source: str
+    utm_medium: str
+    utm_campaign: str
+    date: Optional[str] = None
+    utm_content: Optional[str] = None
+
+    def content(self) -> str:
+        """utm_content as the bot builds it: the given value, or the URL slug with the date."""
+        return self.utm_content or build_utm_content_with_date(extract_action_slug(self.base_url), self.date)
+
+    def url(self, content: Optional[str] = None) -> str:
+        return build_utm_url(
+            self.base_url, self.utm_source, self.utm_medium, self.utm_campaign, content or self.content()
+        )
+
+
+class QuickLinkError(ValueError):
+    def __init__(self, problems: List[str]) -> None:
+        super().__init__("; ".join(problems))
+        self.problems = problems
+
+
+def is_quick_link(text: str) -> bool:
+    """
+    A URL followed by tag values, as opposed to a bare URL that starts the keyboard flow.
+    """
+    return len(text.split()) > 1
+
+
+def _parse_date(value: str) -> str:
+    offset = DATE_WORDS.get(value.casefold())
+    if offset is not None:
+        return (datetime.date.today() + datetime.timedelta(days=offset)).isoformat()
+    return datetime.date.fromisoformat(value).isoformat()
+
+
+def _unknown(kind: str, value: str, catalog: "UTMManager") -> str:
+    problem = f"utm_{kind} «{value}» нет в каталоге"
+    suggestions = difflib.get_close_matches(value, catalog.known_values(kind), n=3)
+    if suggestions:
+        problem += f" (возможно: {', '.join(suggestions)})"
+    return problem
+
+
+def parse_quick_link(text: str, catalog: "UTMManager") -> QuickLink:
+    """
+    Parse ``<url> src=vk med=zakup camp=kazan date=2025-10-10`` or the positional
+    form ``<url> vk zakup kazan [date]``, validating tags against the catalog's
+    value index. Values are matched case-insensitively and returned as spelled in
+    the catalog; every problem found is reported at once in :class:`QuickLinkError`.
+    """
+    base_url, *tokens = text.split()
+    fields: Dict[str, str] = {}
+    positional: List[str] = []
+    problems: List[str] = []
+    for token in tokens:
+        key, separator, value = token.partition("=")
+        if not separator:
+            positional.append(token)
+            continue
+        field = KEY_ALIASES.get(key.casefold())
+        if field is None:
+            problems.append(f"неизвестный параметр «{key}»")
+        elif field in fields:
+            problems.append(f"параметр «{key}» указан дважды")
+        else:
+            fields[field] = value
+
+    free_fields = [field for field in POSITIONAL_FIELDS if field not in fields]
+    if len(positional) > len(free_fields):
+        problems.append(f"лишние значения: {' '.join(positional[len(free_fields):])}")
+    fields.update(zip(free_fields, positional))
+    return resolve_quick_link(base_url, fields, catalog, problems)
+
+
+def resolve_quick_link(
+    base_url: str,
+    fields: Dict[str, str],
+    catalog: Optional["UTMManager"],
+    problems: Optional[List[str]] = None,
+    suggest: bool = True,
+) -> QuickLink:
+    """
+    Validate ``fields`` (keyed like :data:`KEY_ALIASES` values) into a :class:`QuickLink`.
+
+    Without a ``catalog`` the tag values are only checked for presence and used as given.
+    ``suggest`` adds close catalog matches to unknown values, which costs a scan of the catalog.
+    """
+    problems = list(problems or ())
+    tags: Dict[str, str] = {}
+    for kind in ("source", "medium", "campaign"):
+        value = fields.get(kind)
+        if not value:
+            problems.append(f"не указан utm_{kind}")
+            continue
+        if catalog is None:
+            tags[kind] = value
+            continue
+        known = catalog.find_value(kind, value)
+        if known is None:
+            problems.append(_unknown(kind, value, catalog) if suggest else f"utm_{kind} «{value}» нет в каталоге")
+        else:
+            tags[kind] = known
+
+    date = fields.get("date")
+    if date:
+        try:
+            date = _parse_date(date)
+        except ValueError:
+            problems.append(f"дата «{date}» не в формате YYYY-MM-DD")
+
+    if problems:
+        raise QuickLinkError(problems)
+    return QuickLink(
+        base_url=base_url,
+        utm_source=tags["source"],
+        utm_medium=tags["medium"],
+        utm_campaign=tags["campaign"],
+        date=date,
+        utm_content=fields.get("content") or None,
+    )
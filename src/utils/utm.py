@@ -1,14 +1,16 @@
 import datetime
+import hashlib
 import logging
 import re
 from typing import Optional
-from urllib.parse import urlparse
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
 
 
 logger = logging.getLogger(__name__)
 
 
 ACTION_PATTERN = re.compile(r"/actions/([^/]+)")
+DEFAULT_PORTS = {"http": 80, "https": 443}
 
 
 def extract_action_slug(url: str) -> str:
@@ -38,9 +40,57 @@ def build_utm_content_with_date(base_slug: str, date_str: Optional[str] = None)
         return base_slug
 
     try:
-        date_obj = datetime.datetime.strptime(date_str, "%Y-%m-%d")
+        # fromisoformat is several times cheaper than strptime for the usual YYYY-MM-DD.
+        if len(date_str) == 10:
+            date_obj = datetime.date.fromisoformat(date_str)
+        else:
+            date_obj = datetime.datetime.strptime(date_str, "%Y-%m-%d")
         formatted_date = date_obj.strftime("%d-%m")
     except ValueError:
         formatted_date = date_str.replace("-", "")
 
     return f"{base_slug}-{formatted_date}"
+
+
+def normalize_base_url(url: str) -> str:
+    """
+    Bring equivalent spellings of a URL to one form (case, default port, query order).
+
+    A URL whose host or port does not parse is kept as sent, without the whitespace.
+    """
+    url = url.strip()
+    try:
+        parsed = urlparse(url)
+        port = parsed.port
+    except ValueError:
+        return url
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"
+    userinfo, _, _ = parsed.netloc.rpartition("@")
+    netloc = f"{userinfo}@{host}" if userinfo else host
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, netloc, parsed.path or "/", parsed.params, query, parsed.fragment))
+
+
+def build_link_key(
+    base_url: str,
+    utm_source: Optional[str],
+    utm_medium: Optional[str],
+    utm_campaign: Optional[str],
+    utm_content: Optional[str],
+) -> str:
+    """
+    Content-addressed key of a generated link: same URL and tags give the same key.
+    """
+    parts = (
+        normalize_base_url(base_url),
+        utm_source or "",
+        utm_medium or "",
+        utm_campaign or "",
+        utm_content or "",
+    )
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
@@ -0,0 +1,40 @@
+import os
+
+os.environ.setdefault("BOT_TOKEN", "1:test")
+os.environ.setdefault("BOT_ACCESS_PASSWORD", "test")
+
+from src.services.database import DatabaseManager
+
+
+def _two_processes(tmp_path):
+    # Two managers on one file stand for two worker processes; the listener
+    # plays the receiver's relay.
+    writer = DatabaseManager(str(tmp_path / "bot.sqlite3"))
+    reader = DatabaseManager(str(tmp_path / "bot.sqlite3"))
+    writer.add_change_listener(reader.invalidate_user)
+    return writer, reader
+
+
+def test_history_written_elsewhere_is_not_served_from_cache(tmp_path):
+    writer, reader = _two_processes(tmp_path)
+    reader.add_history(7, "https://a.example/", "https://a.example/?utm_source=vk", "s", link_key="a")
+    assert len(reader.get_history(7)) == 1
+
+    writer.add_history(7, "https://b.example/", "https://b.example/?utm_source=vk", "s", link_key="b")
+    assert len(reader.get_history(7)) == 2
+
+    writer.delete_user(7)
+    assert reader.get_history(7) == []
+
+
+def test_presets_written_elsewhere_are_not_served_from_cache(tmp_path):
+    writer, reader = _two_processes(tmp_path)
+    writer.save_preset(7, "ТГ", "telegram", "zakup", "kazan")
+    preset = reader.list_presets(7)[0]
+
+    writer.set_default_preset(7, preset.id)
+    assert reader.get_default_preset(7) == preset._replace(is_default=True)
+
+    writer.delete_user(7)
+    assert reader.list_presets(7) == ()
+    assert reader.get_default_preset(7) is None
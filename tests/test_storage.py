@@ -0,0 +1,25 @@
+import os
+
+os.environ.setdefault("BOT_TOKEN", "1:test")
+os.environ.setdefault("BOT_ACCESS_PASSWORD", "test")
+
+from src.services.database import DatabaseManager
+from src.state.storage import PersistentUserDict
+
+
+def test_conversation_store_caches_a_bounded_number_of_users(tmp_path):
+    database = DatabaseManager(str(tmp_path / "bot.sqlite3"))
+    store = PersistentUserDict(database, "pending_action", ttl=3600, cache_size=2)
+    for user_id in range(5):
+        store[user_id] = {"action": "x", "n": user_id}
+    assert len(store._cache) == 2
+
+    # Evicted users are read back from SQLite on demand.
+    assert store.get(0) == {"action": "x", "n": 0}
+    assert store.pop(1) == {"action": "x", "n": 1}
+    assert 1 not in store
+    assert len(store._cache) == 2
+
+    restarted = PersistentUserDict(database, "pending_action", ttl=3600, cache_size=2)
+    assert sorted(restarted) == [0, 2, 3, 4]
+    assert restarted.update(4, step=2) == {"action": "x", "n": 4, "step": 2}